@@ -0,0 +1,964 @@
+#!/usr/bin/env python3
+"""
+Script de teste: as versões vetorizadas/otimizadas devem reproduzir as
+implementações originais (linha a linha, iterrows, deepcopy...) que elas
+substituíram. Cada teste traz a implementação de referência e compara.
+"""
+import importlib
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append('/app')
+
+INICIO = pd.Timestamp("2025-01-02 08:00")
+
+
+def _pendencias(n: int = 12, seed: int = 0) -> pd.DataFrame:
+    """Pendências técnicas com TE fracionário/NaN/negativo e coordenadas distintas."""
+    rng = np.random.default_rng(seed)
+    te = np.round(rng.random(n) * 60, 3)
+    te[1], te[2] = np.nan, -5.0
+    return pd.DataFrame(
+        {
+            "tipo_serv": "técnico",
+            "numos": np.arange(101, 101 + n),
+            "datasol": INICIO - pd.to_timedelta(rng.integers(1, 72, n), unit="h"),
+            "dt_ref": INICIO.normalize(),
+            "TE": te,
+            "TD": 10.0,
+            "EUSD": np.round(rng.random(n) * 500, 2),
+            "latitude": -8.70 - 0.01 * np.arange(n),
+            "longitude": -63.80 - 0.007 * np.arange(n),
+        }
+    )
+
+
+def _equipes() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "nome": ["EQ1", "EQ2", "EQ3"],
+            "dt_ref": INICIO.normalize(),
+            "inicio_turno": INICIO,
+            "fim_turno": [INICIO + pd.Timedelta(hours=8, seconds=0.7), INICIO + pd.Timedelta(hours=6), pd.NaT],
+            "base_lon": [-63.90, np.nan, -63.85],
+            "base_lat": [-8.70, np.nan, -8.75],
+            "dthpausa_ini": [INICIO + pd.Timedelta(hours=4), pd.NaT, INICIO + pd.Timedelta(hours=3)],
+            "dthpausa_fim": [INICIO + pd.Timedelta(hours=5), pd.NaT, INICIO + pd.Timedelta(hours=4)],
+        }
+    )
+
+
+def _resolver_v4(eq: pd.DataFrame, resposta, cfg=None, pend: pd.DataFrame = None, co: pd.DataFrame = None):
+    """_solve_group_vroom_single com um VROOM falso: `resposta(vehicles, jobs)` → dict."""
+    from v2.backlog import Backlog
+    from v4.config import V4Config
+
+    pend = _pendencias() if pend is None else pend
+    v4_main = importlib.import_module("v4.main")
+    payloads = []
+
+    class VroomFalso:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def route_multi(self, vehicles, jobs):
+            payloads.append((vehicles, jobs))
+            return resposta(vehicles, jobs)
+
+    original = v4_main.VroomClient
+    v4_main.VroomClient = VroomFalso
+    try:
+        backlog = Backlog(pend, pend.iloc[0:0] if co is None else co)
+        df, _ = v4_main._solve_group_vroom_single(eq, backlog, cfg or V4Config(limite_por_equipe=4))
+    finally:
+        v4_main.VroomClient = original
+    return df, payloads[0]
+
+
+def _rota(v_id: int, jobs, t0: int = 0) -> dict:
+    """Rota VROOM com os jobs na ordem: 900 s, 700 s de deslocamento e 9 km por perna."""
+    passos = [{"type": "start", "arrival": t0, "duration": 0, "distance": 0}]
+    for k, j in enumerate(jobs, 1):
+        passos.append({"type": "job", "job": j["id"], "arrival": t0 + 900 * k, "duration": 700 * k,
+                       "distance": 9000 * k, "service": j["service"]})
+    passos.append({"type": "end", "arrival": t0 + 900 * (len(jobs) + 1), "duration": 700 * (len(jobs) + 1),
+                   "distance": 9000 * (len(jobs) + 1)})
+    return {"vehicle": v_id, "steps": passos, "arrival": passos[-1]["arrival"],
+            "distance": passos[-1]["distance"], "duration": passos[-1]["duration"]}
+
+
+def _resposta_rotas(vehicles, jobs):
+    """Veículo 1: 3 jobs (um sem arrival); veículo 2: 2 jobs; veículo 3 sem rota."""
+    r1, r2 = _rota(vehicles[0]["id"], jobs[0:3], 60), _rota(vehicles[1]["id"], jobs[3:5])
+    del r1["steps"][2]["arrival"]
+    return {"code": 0, "routes": [r1, r2], "unassigned": []}
+
+
+def test_payload_colunar():
+    """[user-033] jobs/vehicles colunares == laços iterrows originais"""
+    from v2.utils import _dedup_ids, _service_seconds_from_row, gerar_jobs_com_ids
+    from v4.config import V4Config
+
+    # referência: gerar_jobs_com_ids original (com numos repetido → _dedup_ids)
+    pend = _pendencias()
+    pend.loc[5, "numos"] = pend.loc[4, "numos"]
+    ids_ref = _dedup_ids(pend["numos"].fillna(-1).astype("int64").tolist())
+    jobs_ref = [
+        {"id": int(jid), "location": [float(r["longitude"]), float(r["latitude"])],
+         "service": int(_service_seconds_from_row(r))}
+        for jid, (_, r) in zip(ids_ref, pend.iterrows())
+    ]
+    jobs, df = gerar_jobs_com_ids(pend)
+    assert jobs == jobs_ref and df["job_id_vroom"].tolist() == ids_ref
+
+    # V4: payload capturado × laços originais de _solve_group_vroom_single
+    cfg = V4Config(limite_por_equipe=4)
+    eq = _equipes()
+    _, (vehicles, jobs) = _resolver_v4(eq, lambda v, j: {"code": 0, "routes": [], "unassigned": []}, cfg)
+
+    servico_ref = {
+        (float(r["longitude"]), float(r["latitude"])): max(int((0.0 if pd.isna(r["TE"]) else float(r["TE"])) * 60), 0)
+        for _, r in _pendencias().iterrows()
+    }
+    assert jobs and [j["id"] for j in jobs] == list(range(1, len(jobs) + 1))
+    for j in jobs:
+        assert j["service"] == servico_ref[tuple(j["location"])] and j["delivery"] == [1], j
+
+    veic_ref = []
+    for v_id, (_, e) in enumerate(eq.iterrows(), start=1):
+        lon, lat = e["base_lon"], e["base_lat"]
+        if pd.isna(lon) or pd.isna(lat):
+            lon, lat = cfg.base_lon, cfg.base_lat
+        ini, fim = pd.to_datetime(e["inicio_turno"]), pd.to_datetime(e["fim_turno"])
+        horizon = 8 * 3600 if pd.isna(ini) or pd.isna(fim) else max(int((fim - ini).total_seconds()), 0)
+        veic_ref.append({"id": v_id, "start": [float(lon), float(lat)], "end": [float(lon), float(lat)],
+                         "time_window": [0, horizon], "capacity": [cfg.limite_por_equipe]})
+    campos = ("id", "start", "end", "time_window", "capacity")
+    assert [{k: v[k] for k in campos} for v in vehicles] == veic_ref
+    print("✅ Payload colunar equivalente ao iterrows")
+    return True
+
+
+def test_decodificacao_colunar():
+    """[user-034] rotas decodificadas + merge das equipes == dicts job_to_* originais"""
+    from v4.config import V4Config
+
+    cfg = V4Config(limite_por_equipe=4)
+    eq, pend = _equipes(), _pendencias()
+    df, (vehicles, jobs) = _resolver_v4(eq, _resposta_rotas, cfg, pend)
+    resp = _resposta_rotas(vehicles, jobs)
+
+    # referência: laço original sobre routes/steps com dicts por job
+    group_ini = INICIO
+    veh_id_to_nome = dict(zip(range(1, len(eq) + 1), eq["nome"].astype(str)))
+    job_to_equipe, job_to_arrival, job_to_fim_turno = {}, {}, {}
+    for route in resp["routes"]:
+        equipe_nome = veh_id_to_nome.get(route.get("vehicle"), "N/D")
+        end_dt = group_ini + pd.to_timedelta(int(route["arrival"]), unit="s")
+        for st in route["steps"]:
+            if st.get("type") == "job" and st.get("arrival") is not None:
+                jid = int(st["job"])
+                job_to_equipe[jid] = equipe_nome
+                job_to_arrival[jid] = group_ini + pd.to_timedelta(int(st["arrival"]), unit="s")
+                job_to_fim_turno[jid] = end_dt
+
+    equipe_to_info = {}
+    for _, e in eq.iterrows():
+        equipe_to_info[str(e["nome"])] = {
+            "inicio_turno": pd.to_datetime(e["inicio_turno"]),
+            "fim_turno": pd.to_datetime(e["fim_turno"]),
+            "dthpausa_ini": pd.to_datetime(e.get("dthpausa_ini")),
+            "dthpausa_fim": pd.to_datetime(e.get("dthpausa_fim")),
+            "base_lon": e["base_lon"] if pd.notna(e["base_lon"]) else cfg.base_lon,
+            "base_lat": e["base_lat"] if pd.notna(e["base_lat"]) else cfg.base_lat,
+        }
+
+    numos_por_local = {(float(r["longitude"]), float(r["latitude"])): int(r["numos"]) for _, r in pend.iterrows()}
+    te_por_numos = dict(zip(pend["numos"].astype(int), pd.to_numeric(pend["TE"]).fillna(0.0)))
+    ref = {}
+    for j in jobs:
+        if j["id"] in job_to_equipe:
+            numos, eqp = numos_por_local[tuple(j["location"])], job_to_equipe[j["id"]]
+            chegada = job_to_arrival[j["id"]]
+            ref[numos] = {
+                "equipe": eqp,
+                "dth_chegada_estimada": chegada,
+                "dth_final_estimada": chegada + pd.to_timedelta(te_por_numos[numos], unit="m"),
+                "fim_turno_estimado": job_to_fim_turno[j["id"]],
+                "chegada_base": job_to_fim_turno[j["id"]],
+                **equipe_to_info[eqp],
+            }
+
+    assert len(ref) == 4 and sorted(df["numos"].astype(int)) == sorted(ref)
+    for _, r in df.iterrows():
+        for col, esperado in ref[int(r["numos"])].items():
+            atual = r[col]
+            assert (pd.isna(atual) and pd.isna(esperado)) or atual == esperado, (col, atual, esperado)
+    print("✅ Decodificação colunar equivalente aos dicts por job")
+    return True
+
+
+def _resposta_sem_trechos(vehicles, jobs):
+    """Como _resposta_rotas, mas sem distance/duration nos steps (só o total da rota)."""
+    resp = _resposta_rotas(vehicles, jobs)
+    for r in resp["routes"]:
+        r["steps"][2]["arrival"] = 1800
+        for st in r["steps"]:
+            st.pop("distance", None), st.pop("duration", None)
+    return resp
+
+
+def test_trechos_por_perna():
+    """[user-035] km/min por perna somam o total da rota; sem trechos, divisão igual original"""
+    import v3.optimization as opt
+
+    def completa(vehicles, jobs):
+        resp = _resposta_rotas(vehicles, jobs)
+        resp["routes"][0]["steps"][2]["arrival"] = 1800
+        return resp
+
+    eq = _equipes()
+    for resposta, por_perna in ((completa, True), (_resposta_sem_trechos, False)):
+        df, (vehicles, jobs) = _resolver_v4(eq, resposta)
+        resp = resposta(vehicles, jobs)
+        for route in resp["routes"]:
+            nome = eq["nome"].iloc[route["vehicle"] - 1]
+            da_rota = df[df["equipe"] == nome].sort_values("dth_chegada_estimada")
+            n = sum(st["type"] == "job" for st in route["steps"])
+            # referência: divisão igual do total da rota entre os jobs
+            km_ref, min_ref = route["distance"] / n / 1000.0, route["duration"] / n / 60.0
+            assert len(da_rota) == n
+            assert np.isclose(da_rota["distancia_vroom"].sum(), km_ref * n)
+            assert np.isclose(da_rota["duracao_vroom"].sum(), min_ref * n)
+            if por_perna:
+                # cada job leva a própria perna (9 km / 700 s); a volta fica no último
+                assert np.allclose(da_rota["distancia_vroom"].to_numpy()[:-1], 9.0)
+                assert np.isclose(da_rota["distancia_vroom"].iloc[-1], 18.0)
+            else:
+                assert np.allclose(da_rota["distancia_vroom"], km_ref)
+                assert np.allclose(da_rota["duracao_vroom"], min_ref)
+
+    # V3: antes cada linha recebia o total da rota (m/s); a soma por perna bate com ele
+    class VroomV3:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def route(self, vehicle, jobs):
+            return {"code": 0, "routes": [_rota(vehicle["id"], jobs)], "unassigned": []}
+
+    class OSRMFalso:
+        base_url = "http://osrm-teste:5000"
+
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def nearest_or_none(self, lon, lat):
+            return None
+
+    originais = opt.VroomClient, opt.OSRMClient
+    opt.VroomClient, opt.OSRMClient = VroomV3, OSRMFalso
+    try:
+        equipe = _equipes().iloc[0].copy()
+        equipe["fim_turno"] = INICIO + pd.Timedelta(hours=8)
+        mh = opt.MetaHeuristicaV3(equipe, limite_por_equipe=3, pool=_pendencias(3), solver_local_max_jobs=0)
+        out = mh.resequenciar(mh.pool_base)
+    finally:
+        opt.VroomClient, opt.OSRMClient = originais
+    rota = out["resp"]
+    assert len(rota) == 3 and rota["eta_source"].eq("VROOM").all()
+    assert np.isclose(rota["distancia_vroom"].sum() * 1000.0, 9000 * 4)
+    assert np.isclose(rota["duracao_vroom"].sum() * 60.0, 700 * 4)
+    print("✅ Distância/duração por perna preservam os totais do VROOM")
+    return True
+
+
+def _comerciais() -> pd.DataFrame:
+    """Vencimentos: no turno, já vencido, além do turno, sem prazo e inalcançável (TE > prazo)."""
+    co = _pendencias(5, seed=1)
+    co["tipo_serv"] = "comercial"
+    co["numos"] = np.arange(201, 206)
+    co["TE"] = [20.0, 20.0, 20.0, 20.0, 30.0]
+    co["longitude"] = co["longitude"] + 0.003
+    co["dataven"] = [INICIO + pd.Timedelta(hours=2, seconds=30), INICIO - pd.Timedelta(hours=1),
+                     INICIO + pd.Timedelta(hours=20), pd.NaT, INICIO + pd.Timedelta(minutes=10)]
+    return co
+
+
+def test_pausa_e_prazo_nativos():
+    """[user-036] breaks/time_windows do payload decodificam para a mesma pausa e vencimento"""
+    import v3.optimization as opt
+
+    eq, co = _equipes(), _comerciais()
+    _, (vehicles, jobs) = _resolver_v4(eq, lambda v, j: {"code": 0, "routes": [], "unassigned": []}, co=co)
+
+    # pausa: início fixo + duração == dthpausa_ini/fim (a que o _apply_pause aplicava)
+    for v, (_, e) in zip(vehicles, eq.iterrows()):
+        if pd.isna(e["dthpausa_ini"]):
+            assert "breaks" not in v
+            continue
+        (brk,) = v["breaks"]
+        ini = INICIO + pd.Timedelta(seconds=brk["time_windows"][0][0])
+        assert brk["time_windows"][0][0] == brk["time_windows"][0][1]
+        assert (ini, ini + pd.Timedelta(seconds=brk["service"])) == (e["dthpausa_ini"], e["dthpausa_fim"])
+
+    # prazo: término (fim da janela + serviço) no dataven (truncado em s); demais sem janela
+    por_local = {(float(r["longitude"]), float(r["latitude"])): r for _, r in co.iterrows()}
+    vistos = set()
+    for j in jobs:
+        r = por_local.get(tuple(j["location"]))
+        if r is None:
+            assert "time_windows" not in j  # técnicos não têm vencimento
+            continue
+        vistos.add(int(r["numos"]))
+        if int(r["numos"]) == 201:
+            (tw,) = j["time_windows"]
+            assert tw[0] == 0
+            assert INICIO + pd.Timedelta(seconds=tw[1] + j["service"]) == r["dataven"].floor("s")
+        else:
+            assert "time_windows" not in j, (r["numos"], j)
+    assert vistos == set(range(201, 206))
+
+    # step "break" na resposta não altera os jobs decodificados (chegadas já vêm com a pausa)
+    from v2.vroom_response import decodificar_rotas
+
+    resp = {"routes": [_rota(1, jobs[:3])]}
+    sem_break = decodificar_rotas(resp)
+    resp["routes"][0]["steps"].insert(2, {"type": "break", "id": 1, "arrival": 1000, "duration": 700,
+                                          "distance": 9000, "service": 3600})
+    assert decodificar_rotas(resp).equals(sem_break)
+
+    # V3: mesmo break/janela no veículo único da meta-heurística
+    enviados = []
+
+    class VroomV3:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def route(self, vehicle, jobs):
+            enviados.append((vehicle, jobs))
+            return {"code": 0, "routes": [_rota(vehicle["id"], jobs)], "unassigned": []}
+
+    class OSRMFalso:
+        base_url = "http://osrm-teste:5000"
+
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def nearest_or_none(self, lon, lat):
+            return None
+
+    originais = opt.VroomClient, opt.OSRMClient
+    opt.VroomClient, opt.OSRMClient = VroomV3, OSRMFalso
+    try:
+        equipe = eq.iloc[0].copy()
+        equipe["fim_turno"] = INICIO + pd.Timedelta(hours=8)
+        mh = opt.MetaHeuristicaV3(equipe, limite_por_equipe=5, pool=co, solver_local_max_jobs=0)
+        mh.resequenciar(mh.pool_base)
+    finally:
+        opt.VroomClient, opt.OSRMClient = originais
+    vehicle, jobs_v3 = enviados[0]
+    assert vehicle["breaks"] == vehicles[0]["breaks"]
+    janelas = {j["id"]: j.get("time_windows") for j in jobs_v3}
+    assert janelas.pop(201) == [[0, 2 * 3600 + 30 - 20 * 60]] and not any(janelas.values())
+    print("✅ Pausa e vencimento nativos equivalentes aos originais")
+    return True
+
+
+def _backlog_v3():
+    """Técnicas/comerciais com dtypes compactos, empates, NaT em datas/dt_ref e EUSD ausente."""
+    from v2.data_loader import _compact_dtypes
+
+    rng = np.random.default_rng(7)
+
+    def parte(n, tipo, inicio):
+        df = _pendencias(n, seed=inicio)
+        df["numos"] = np.arange(inicio, inicio + n)
+        df["datasol"] = INICIO - pd.to_timedelta(rng.integers(-3, 6, n), unit="h")  # empates e futuras
+        df.loc[df.index[::7], "datasol"] = pd.NaT
+        df.loc[df.index[3::9], "dt_ref"] = pd.NaT
+        df["EUSD"] = rng.choice([0.0, 50.0, 50.0, 120.0, np.nan], n)
+        df["EUSD_FIO_B"] = np.nan
+        if tipo == "comercial":
+            df.insert(3, "dataven", INICIO + pd.to_timedelta(rng.integers(1, 4, n), unit="D"))
+            df.loc[df.index[::5], "dataven"] = pd.NaT
+        return _compact_dtypes(df, tipo)
+
+    return parte(30, "técnico", 1000), parte(20, "comercial", 5000)
+
+
+def _pool_original(tec, com, turno_ini, limite):
+    """Pool do V3 antes do BacklogV3: concat + dropna(dt_ref) + datasol < turno + sort_values/head."""
+    pool = pd.concat([tec, com], ignore_index=True).dropna(subset=["dt_ref"]).reset_index(drop=True)
+    pool = pool[pd.to_datetime(pool["datasol"], errors="coerce") < turno_ini].reset_index(drop=True)
+    max_pool = min(limite * 4, len(pool))
+    if len(pool) > max_pool:
+        pool = pool.copy()
+        pool["__is_com"] = (pool["tipo_serv"] == "comercial").astype(int)
+        pool["__datasol"] = pd.to_datetime(pool["datasol"], errors="coerce")
+        pool["__dataven"] = pd.to_datetime(pool.get("dataven", pd.NaT), errors="coerce")
+        eusd_col = pool.get("EUSD", pool.get("eusd", pool.get("EUSD_FIO_B", 0)))
+        pool["__eusd"] = pd.to_numeric(eusd_col, errors="coerce").fillna(0.0)
+        pool = pool.sort_values(
+            by=["__is_com", "__dataven", "__datasol", "__eusd"], ascending=[False, True, True, False]
+        ).head(max_pool)
+    return pool["numos"].astype("int64").tolist()
+
+
+def test_pool_por_indices():
+    """[user-040] pool da equipe por índices/lexsort == cópia + sort_values por equipe"""
+    import v3.optimization as opt
+    from v2.utils import remover_numos
+
+    tec, com = _backlog_v3()
+    backlog = opt.BacklogV3(tec, com)
+    ref_tec, ref_com = tec, com
+    for turno, limite, atendidos in (
+        (INICIO, 3, [1001, 5002, 5004]),          # pré-filtro ativo (pool > limite * 4)
+        (INICIO + pd.Timedelta(hours=1), 7, []),  # pool inteiro, sem pré-filtro
+        (INICIO - pd.Timedelta(hours=1), 2, []),
+    ):
+        esperado = _pool_original(ref_tec, ref_com, turno, limite)
+        assert backlog.pool_equipe(turno, limite)["numos"].tolist() == esperado, (turno, limite)
+        backlog.remover(atendidos)
+        ref_tec, ref_com = remover_numos(ref_tec, atendidos), remover_numos(ref_com, atendidos)
+
+    # a meta-heurística vê o mesmo pool pré-filtrado com pool= e com pend_tec/pend_com
+    class Parar(Exception):
+        pass
+
+    vistos = []
+
+    def ag(self, pool, k=10, **kw):
+        vistos.append(pool["numos"].tolist())
+        raise Parar
+
+    originais = opt.MetaHeuristicaV3._ag, opt.VroomClient, opt.OSRMClient
+    opt.MetaHeuristicaV3._ag = ag
+    opt.VroomClient = opt.OSRMClient = lambda *a, **kw: None
+    try:
+        equipe = _equipes().iloc[0]
+        for mh in (
+            opt.MetaHeuristicaV3(equipe, tec, com, limite_por_equipe=2),
+            opt.MetaHeuristicaV3(equipe, limite_por_equipe=2, pool=opt.BacklogV3(tec, com).pool_equipe(INICIO, 2)),
+        ):
+            try:
+                mh.otimizar_para_equipe()
+            except Parar:
+                pass
+    finally:
+        opt.MetaHeuristicaV3._ag, opt.VroomClient, opt.OSRMClient = originais
+    assert len(vistos) == 2 and vistos[0] == vistos[1] == _pool_original(tec, com, INICIO, 2)
+    print("✅ Pool por índices equivalente às cópias por equipe")
+    return True
+
+
+def test_perfil_memoria_nao_altera():
+    """[user-040] --perfil-memoria (tracemalloc) só loga: a saída do V3 é a mesma"""
+    import tempfile
+    import tracemalloc
+    import pyarrow.parquet as pq
+    import v3.optimization as opt
+    from v2.result_writer import ResultDatasetWriter
+    from v3.main import simular_v3
+
+    class VroomV3:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def route(self, vehicle, jobs):
+            return {"code": 0, "routes": [_rota(vehicle["id"], jobs)], "unassigned": []}
+
+    class OSRMFalso:
+        base_url = "http://osrm-teste:5000"
+
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def nearest_or_none(self, lon, lat):
+            return None
+
+    eq = _equipes().iloc[:2].copy()
+    eq.loc[1, ["base_lon", "base_lat"]] = [-63.88, -8.73]
+    tec, com = _backlog_v3()
+    saidas = []
+    mh = opt.MetaHeuristicaV3
+    originais = opt.VroomClient, opt.OSRMClient, mh._ag, mh._sa, mh._aco
+    opt.VroomClient, opt.OSRMClient = VroomV3, OSRMFalso
+    # AG/SA/ACO determinísticos: o que se compara é a simulação com/sem tracemalloc
+    mh._ag = lambda self, pool, k=10, **kw: list(range(k))
+    mh._sa = lambda self, pool, sol, **kw: sol
+    mh._aco = lambda self, pool, sol, k=None, **kw: pool.iloc[sol].copy()
+    try:
+        for perfil in (False, True):
+            with tempfile.TemporaryDirectory() as tmp:
+                if perfil:
+                    tracemalloc.start()
+                try:
+                    simular_v3(eq, tec, com, limite_por_equipe=3, writer=ResultDatasetWriter(tmp))
+                finally:
+                    if perfil:
+                        tracemalloc.stop()
+                saidas.append(pq.read_table(tmp).to_pandas())
+    finally:
+        opt.VroomClient, opt.OSRMClient, mh._ag, mh._sa, mh._aco = originais
+    assert len(saidas[0]) == 6 and saidas[0].equals(saidas[1])
+    print("✅ Perfil de memória não altera a saída")
+    return True
+
+
+class OSRMSnap:
+    """/nearest falso: desloca o ponto 0,001° a leste (falha em `FALHA`) e conta as consultas."""
+
+    FALHA = (-63.85, -8.75)
+    base_url, profile, timeout = "http://osrm-teste:5000", "car", 5
+    consultas = 0
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def nearest_or_none(self, lon, lat):
+        OSRMSnap.consultas += 1
+        if (round(lon, 4), round(lat, 4)) == OSRMSnap.FALHA:  # tolera coordenadas float32
+            return None
+        return round(lon + 0.001, 6), float(lat)
+
+    def nearest(self, lon, lat):
+        """Comportamento original: ponto snapado ou o próprio ponto se falhar."""
+        return self.nearest_or_none(lon, lat) or (float(lon), float(lat))
+
+
+def test_cache_snap_bases():
+    """[user-041] bases snapadas pelo cache == osrm.nearest por equipe, com menos /nearest"""
+    import tempfile
+    from pathlib import Path
+    import v3.optimization as opt
+    from v2.snap_cache import CacheSnap
+
+    eq = pd.concat([_equipes()] * 3, ignore_index=True)  # 9 equipes, 2 bases + base global
+
+    # referência: cada MetaHeuristicaV3 chamava osrm.nearest na própria base
+    OSRMSnap.consultas = 0
+    brutas = []
+    for _, e in eq.iterrows():
+        lon, lat = e["base_lon"], e["base_lat"]
+        if pd.isna(lon) or pd.isna(lat):
+            lon, lat = opt.config.BASE_LON, opt.config.BASE_LAT
+        brutas.append((float(lon), float(lat)))
+    ref = [OSRMSnap().nearest(lon, lat) for lon, lat in brutas]
+    assert OSRMSnap.consultas == len(eq)
+
+    cache = CacheSnap()
+    originais = opt.OSRMClient, opt.VroomClient, opt.cache_snap
+    opt.OSRMClient, opt.VroomClient, opt.cache_snap = OSRMSnap, OSRMSnap, lambda: cache
+    OSRMSnap.consultas = 0
+    try:
+        assert opt.snap_bases(eq) == 3
+        bases = [
+            (mh.base_lon, mh.base_lat)
+            for mh in (opt.MetaHeuristicaV3(e, pool=_pendencias(3)) for _, e in eq.iterrows())
+        ]
+    finally:
+        opt.OSRMClient, opt.VroomClient, opt.cache_snap = originais
+    assert bases == ref
+    # 3 bases no lote; só a base que falhou volta a ser consultada (snaps ruins não ficam no cache)
+    assert OSRMSnap.consultas == 3 + 3, OSRMSnap.consultas
+
+    # persistência: o cache salvo e recarregado responde igual, sem /nearest
+    with tempfile.TemporaryDirectory() as tmp:
+        cache.salvar(Path(tmp) / "snap.arrow")
+        recarregado = CacheSnap()
+        assert recarregado.carregar(Path(tmp) / "snap.arrow") == 2
+    OSRMSnap.consultas = 0
+    boas = [i for i, p in enumerate(brutas) if p != OSRMSnap.FALHA]
+    assert [recarregado.snap(OSRMSnap(), *brutas[i]) for i in boas] == [bases[i] for i in boas]
+    assert OSRMSnap.consultas == 0
+    print("✅ Cache de snapping das bases equivalente ao /nearest por equipe")
+    return True
+
+
+def test_snap_jobs_em_lote():
+    """[user-042] snapping em lote das coordenadas == osrm.nearest linha a linha"""
+    from v2.data_loader import _compact_dtypes
+    from v2.snap_cache import CacheSnap, snapar_coordenadas
+
+    df = _pendencias(12)
+    df["EUSD_FIO_B"] = np.nan
+    df.loc[1:3, ["longitude", "latitude"]] = df.loc[0, ["longitude", "latitude"]].to_numpy()  # pontos repetidos
+    df.loc[7, ["longitude", "latitude"]] = OSRMSnap.FALHA
+    df = _compact_dtypes(df, "técnico")  # coordenadas float32, como na carga
+
+    # referência: um /nearest por linha (ponto original se falhar)
+    OSRMSnap.consultas = 0
+    ref = np.array([OSRMSnap().nearest(float(lon), float(lat)) for lon, lat in zip(df["longitude"], df["latitude"])])
+    ref = ref.astype(df["longitude"].dtype)
+    assert OSRMSnap.consultas == len(df)
+
+    OSRMSnap.consultas = 0
+    out = snapar_coordenadas(df, OSRMSnap(), CacheSnap())
+    assert OSRMSnap.consultas == len(df) - 3  # um por ponto distinto
+    assert np.array_equal(out["longitude"].to_numpy(), ref[:, 0]) and np.array_equal(out["latitude"].to_numpy(), ref[:, 1])
+    assert out["longitude"].dtype == df["longitude"].dtype
+    assert np.array_equal(out["longitude_bruta"].to_numpy(), df["longitude"].to_numpy())
+    assert out["snapado"].tolist() == [i != 7 for i in range(len(df))]
+    assert "snapado" not in df.columns  # entrada intacta
+
+    # OSRM de volta: só o ponto que falhou é consultado de novo
+    falha, OSRMSnap.FALHA, OSRMSnap.consultas = OSRMSnap.FALHA, None, 0
+    try:
+        out = snapar_coordenadas(out, OSRMSnap(), CacheSnap())
+    finally:
+        OSRMSnap.FALHA = falha
+    assert OSRMSnap.consultas == 1 and out["snapado"].all()
+    assert np.isclose(out["longitude"].iloc[7], falha[0] + 0.001)
+    print("✅ Snapping em lote equivalente ao /nearest por linha")
+    return True
+
+
+def _roteirizacao() -> dict:
+    """
+    Definições de utils/roteirizacao.py (imports, constantes, funções e classes)
+    sem o script do módulo, que lê data/*.parquet e roteiriza na importação.
+    Os testes trocam `chamar_vroom` no namespace devolvido.
+    """
+    import ast
+    from pathlib import Path
+
+    caminho = Path(__file__).resolve().parent / "utils" / "roteirizacao.py"
+    arvore = ast.parse(caminho.read_text(encoding="utf-8"))
+    defs = (ast.Import, ast.ImportFrom, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+    arvore.body = [
+        no for no in arvore.body
+        if isinstance(no, defs)
+        or (isinstance(no, ast.Assign) and all(isinstance(t, ast.Name) and t.id.isupper() for t in no.targets))
+    ]
+    ns = {"__name__": "roteirizacao"}
+    exec(compile(arvore, str(caminho), "exec"), ns)
+    return ns
+
+
+def _servicos_roteirizacao():
+    """Técnicos/comerciais no layout de utils/roteirizacao.py, vroom_input de 1 veículo e job_id -> NUMOS."""
+    dia = pd.Timestamp("2025-01-02")
+    tecnicos = pd.DataFrame(
+        {
+            "NUMOS": [1, 2, 3, 4, 2],  # NUMOS 2 repetido: vale a primeira linha
+            "EUSD": [120.0, 450.0, 80.0, 300.0, 999.0],
+            "DH_INICIO": dia + pd.to_timedelta([6, 7, 5, 3, 1], unit="h"),
+        }
+    )
+    comerciais = pd.DataFrame(
+        {
+            "NUMOS": [3, 10, 11, 12, 10],  # NUMOS 3 também técnico; 10 repetido
+            "EUSD": [50.0, 200.0, 75.0, 310.0, 1.0],
+            "DATA_SOL": dia - pd.to_timedelta([2, 3, 1, 4, 9], unit="D"),
+            "DATA_VENC": dia + pd.to_timedelta([2, -1, 4, -2, 5], unit="D"),
+        }
+    )
+    job_id_to_numos = {1: 1, 2: 2, 3: 3, 4: 4, 5: 10, 6: 11, 7: 12, 8: 99}  # NUMOS 99 sem serviço
+    jobs = [
+        {"id": j, "description": f"os_{n}", "location": [-63.80 - 0.01 * j, -8.70 - 0.004 * j], "service": 600 * (1 + j % 3)}
+        for j, n in job_id_to_numos.items()
+    ]
+    vroom_input = {"vehicles": [{"id": 1, "start": [-63.9, -8.7], "end": [-63.9, -8.7]}], "jobs": jobs}
+    return tecnicos, comerciais, job_id_to_numos, vroom_input
+
+
+class VroomOrdem:
+    """chamar_vroom falso: atende os jobs na ordem recebida (30 min entre chegadas) e conta as chamadas."""
+
+    T0 = int(pd.Timestamp("2025-01-02 08:00").timestamp())
+
+    def __init__(self, extras=()):
+        self.extras = list(extras)  # steps adicionais (ex.: jobs fora do mapeamento)
+        self.chamadas = 0
+
+    def __call__(self, vroom_input):
+        self.chamadas += 1
+        t, custo = self.T0, 0
+        passos = [{"type": "start", "arrival": t}]
+        for k, job in enumerate(vroom_input["jobs"]):
+            t += 1800
+            passos.append({"type": "job", "job": job["id"], "arrival": t, "service": job["service"]})
+            t += job["service"]
+            custo += (k + 1) * job["id"] * 37 % 101  # depende da ordem
+        passos += self.extras + [{"type": "end", "arrival": t + 1800}]
+        return {"summary": {"cost": custo}, "routes": [{"vehicle": 1, "steps": passos}]}
+
+
+def test_avaliacao_memorizada():
+    """[user-043] meta-heurística com cache LRU == sem cache (mesma semente), com menos chamadas ao VROOM"""
+    import random
+
+    ns = _roteirizacao()
+    tec, com, mapa, entrada = _servicos_roteirizacao()
+    execucoes = []
+    for max_cache in (0, 5, ns["MAX_CACHE_AVALIACOES"]):  # 0 = referência sem cache; 5 força despejos
+        ns["chamar_vroom"] = vroom = VroomOrdem()
+        random.seed(43)
+        mh = ns["MetaHeuristica"](entrada, tec, com, mapa, num_iter=12, max_cache=max_cache)
+        melhor = mh.otimizacao_hibrida()
+        execucoes.append((melhor, mh.melhor_custo, vroom.chamadas, mh.chamadas_evitadas, random.random()))
+
+    (ref, custo_ref, chamadas_ref, evitadas_ref, rng_ref) = execucoes[0]
+    assert evitadas_ref == 0 and chamadas_ref == 12 * 30  # 10 avaliações + 10 × (vizinho + indivíduo)
+    for melhor, custo, chamadas, evitadas, rng in execucoes[1:]:
+        assert melhor == ref and custo == custo_ref
+        assert rng == rng_ref  # mesma sequência aleatória consumida
+        assert chamadas + evitadas == chamadas_ref and chamadas < chamadas_ref
+    assert execucoes[2][2] < execucoes[1][2]  # cache maior, menos chamadas
+    print("✅ Avaliação memorizada equivalente à avaliação sem cache")
+    return True
+
+
+def _custo_por_passo(ns, resposta, tecnicos, comerciais, job_id_to_numos):
+    """Referência: laço original de MetaHeuristica.avaliar_solucao (uma busca por step)."""
+    from datetime import datetime
+
+    custo = resposta["summary"]["cost"]
+    for route in resposta["routes"]:
+        for step in route["steps"]:
+            if step.get("type") != "job":
+                continue
+            numos = job_id_to_numos.get(step["job"])
+            if numos is None:
+                continue
+            if numos in tecnicos["NUMOS"].values:
+                tipo, df_servico = "tecnico", tecnicos
+            elif numos in comerciais["NUMOS"].values:
+                tipo, df_servico = "comercial", comerciais
+            else:
+                continue
+            linha = df_servico[df_servico["NUMOS"] == numos].iloc[0]
+            if tipo == "tecnico":
+                linha = linha.copy()
+                linha["DH_FINAL"] = datetime.fromtimestamp(step["arrival"] + step["service"])
+                penal = ns["calcular_penalizacao"](linha, tipo)
+            else:
+                prazo_regulatorio = (linha["DATA_VENC"] - linha["DATA_SOL"]).total_seconds() / (3600 * 24)
+                prazo_verificado = (datetime.fromtimestamp(step["arrival"]) - linha["DATA_SOL"]).total_seconds() / (3600 * 24)
+                penal = ns["calcular_penalizacao"](linha, tipo, prazo_verificado, prazo_regulatorio)
+            custo += penal
+    return custo
+
+
+def test_penalizacoes_em_lote():
+    """[user-044] penalizações em lote == laço original por step (tipos, duplicados, jobs desconhecidos)"""
+    ns = _roteirizacao()
+    tec, com, mapa, entrada = _servicos_roteirizacao()
+    sol_11 = int(com.loc[2, "DATA_SOL"].timestamp())
+    extras = [
+        {"type": "job", "job": 42, "arrival": VroomOrdem.T0, "service": 300},  # job fora do mapeamento
+        {"type": "job", "job": 6, "arrival": sol_11, "service": 300},  # prazo verificado 0 → só a base
+        {"type": "break", "id": 1, "arrival": VroomOrdem.T0, "service": 3600},
+    ]
+    vroom = VroomOrdem(extras)
+    mh = ns["MetaHeuristica"](entrada, tec, com, mapa)
+    rng = np.random.default_rng(44)
+    for _ in range(20):
+        perm = rng.permutation(len(entrada["jobs"])).astype(np.int32)
+        resposta = vroom(mh.payload(perm))
+        ns["chamar_vroom"] = lambda _payload: resposta
+        ref = _custo_por_passo(ns, resposta, tec, com, mapa)
+        assert np.isclose(mh._avaliar_no_vroom(mh.payload(perm)), ref, rtol=1e-12, atol=0), perm
+
+    # cada tipo de penalização separadamente
+    tabela = ns["indexar_servicos"](tec, com, mapa)
+    assert tabela["tipo"].tolist() == [0, 1, 1, 1, 1, 2, 2, 2, 0]  # NUMOS 3 é técnico; 99 sem serviço
+    assert tabela["eusd"][2] == 450.0 and tabela["eusd"][5] == 200.0  # primeira linha dos duplicados
+    passos = [p for p in vroom(entrada)["routes"][0]["steps"] if p["type"] == "job"]
+    lote = ns["penalizacoes_lote"](
+        tabela, [p["job"] for p in passos], [p["arrival"] for p in passos], [p["service"] for p in passos]
+    )
+    conhecidos = [p for p in passos if p["job"] in mapa and mapa[p["job"]] != 99]
+    assert len(lote) == len(conhecidos) == 8
+    for p, penal in zip(conhecidos, lote):
+        um = {"summary": {"cost": 0}, "routes": [{"steps": [p]}]}
+        assert np.isclose(penal, _custo_por_passo(ns, um, tec, com, mapa), rtol=1e-12, atol=0), p
+    assert lote[-1] == 120.0  # comercial atendido na própria solicitação
+    print("✅ Penalizações em lote equivalentes ao laço por step")
+    return True
+
+
+def _meta_heuristica_dicts(ns):
+    """Referência: indivíduos como payloads completos (deepcopy) e cache pela impressão digital dos ids."""
+    import copy
+    import math
+    import random
+
+    class MetaHeuristicaDicts(ns["MetaHeuristica"]):
+        def avaliar_solucao(self, solucao):
+            chave = (
+                tuple(v["id"] for v in solucao.get("vehicles", [])),
+                tuple(j["id"] for j in solucao.get("jobs", [])),
+            )
+            if chave in self._custos:
+                self._custos.move_to_end(chave)
+                self.chamadas_evitadas += 1
+                return self._custos[chave]
+            custo = self._avaliar_no_vroom(solucao)
+            self._custos[chave] = custo
+            if len(self._custos) > self.max_cache:
+                self._custos.popitem(last=False)
+            return custo
+
+        def gerar_vizinho(self, solucao):
+            nova_solucao = copy.deepcopy(solucao)
+            if len(nova_solucao["jobs"]) > 1:
+                i, j = random.sample(range(len(nova_solucao["jobs"])), 2)
+                nova_solucao["jobs"][i], nova_solucao["jobs"][j] = nova_solucao["jobs"][j], nova_solucao["jobs"][i]
+            return nova_solucao
+
+        def otimizacao_hibrida(self):
+            feromonios = {job["id"]: 1.0 for job in self.vroom_input["jobs"]}
+            populacao = [copy.deepcopy(self.vroom_input) for _ in range(10)]
+            for _ in range(self.num_iter):
+                custos = [self.avaliar_solucao(ind) for ind in populacao]
+                melhor_idx = np.argmin(custos)
+                if custos[melhor_idx] < self.melhor_custo:
+                    self.melhor_custo = custos[melhor_idx]
+                    self.melhor_solucao = populacao[melhor_idx]
+                for ind in populacao:
+                    vizinho = self.gerar_vizinho(ind)
+                    custo_viz = self.avaliar_solucao(vizinho)
+                    custo_ind = self.avaliar_solucao(ind)
+                    if custo_viz < custo_ind or random.random() < math.exp((custo_ind - custo_viz) / 100):
+                        ind = vizinho
+                for job_id in feromonios:
+                    feromonios[job_id] *= 0.9
+                nova_pop = []
+                for _ in range(len(populacao)):
+                    pai1, pai2 = random.sample(populacao, 2)
+                    filho = pai1.copy()
+                    if random.random() < 0.1:
+                        filho = self.gerar_vizinho(filho)
+                    nova_pop.append(filho)
+                populacao = nova_pop
+            return self.melhor_solucao
+
+    return MetaHeuristicaDicts
+
+
+def test_individuos_permutacao():
+    """[user-045] indivíduos como permutações == payloads com deepcopy (mesma semente, mesmo custo e chamadas)"""
+    import copy
+    import random
+
+    ns = _roteirizacao()
+    tec, com, mapa, entrada = _servicos_roteirizacao()
+    original = copy.deepcopy(entrada)
+    execucoes = []
+    for classe in (_meta_heuristica_dicts(ns), ns["MetaHeuristica"]):
+        for semente in (45, 7):
+            ns["chamar_vroom"] = vroom = VroomOrdem()
+            random.seed(semente)
+            mh = classe(entrada, tec, com, mapa, num_iter=15)
+            melhor = mh.otimizacao_hibrida()
+            execucoes.append((melhor, mh.melhor_custo, vroom.chamadas, mh.chamadas_evitadas, random.random()))
+    assert execucoes[:2] == execucoes[2:]
+    assert execucoes[0][0] != original and execucoes[0][0]["vehicles"] == original["vehicles"]
+    assert entrada == original  # jobs compartilhados, mas o vroom_input não é alterado
+    print("✅ Indivíduos como permutações equivalentes aos payloads copiados")
+    return True
+
+
+def _penalidade_por_linha(ns, df, conclusao):
+    """Referência: calcular_penalizacao OS a OS no layout normalizado (datasol, dataven, EUSD)."""
+    out = []
+    for (_, r), fim in zip(df.iterrows(), conclusao):
+        linha = pd.Series({"EUSD": r["EUSD"], "DH_INICIO": r["datasol"], "DH_FINAL": fim})
+        if r["tipo_serv"] == "comercial":
+            regulatorio = (r["dataven"] - r["datasol"]).total_seconds() / (3600 * 24)
+            verificado = (fim - r["datasol"]).total_seconds() / (3600 * 24)
+            out.append(ns["calcular_penalizacao"](linha, "comercial", verificado, regulatorio))
+        else:
+            out.append(ns["calcular_penalizacao"](linha, "tecnico"))
+    return np.array(out, dtype=np.float64)
+
+
+def test_custo_regulatorio_vetorizado():
+    """[user-046] penalidade vetorizada == calcular_penalizacao OS a OS (e desvios documentados)"""
+    from v2.custo_regulatorio import penalidade, penalidade_evitada
+    from v2.data_loader import _compact_dtypes
+
+    ns = _roteirizacao()
+    rng = np.random.default_rng(46)
+    te = _pendencias(12)
+    co = _pendencias(10, seed=2)
+    co["numos"] = np.arange(301, 311)
+    co["dataven"] = co["datasol"] + pd.to_timedelta(rng.integers(1, 6, len(co)), unit="D")
+    df = pd.concat(
+        [_compact_dtypes(te.assign(EUSD_FIO_B=np.nan), "técnico"),
+         _compact_dtypes(co.assign(EUSD_FIO_B=np.nan), "comercial")],
+        ignore_index=True,
+    )  # layout do V4: tipo_serv categórico
+    fim = INICIO + pd.to_timedelta(rng.integers(0, 120 * 60, len(df)), unit="min")
+
+    ref = _penalidade_por_linha(ns, df, fim)
+    out = penalidade(df, fim)
+    comercial = (df["tipo_serv"] == "comercial").to_numpy()
+    violado = comercial & (fim - df["datasol"] > df["dataven"] - df["datasol"]).to_numpy()
+    assert violado.any() and (comercial & ~violado).any()
+    # técnico e comercial com prazo violado: mesmas fórmulas
+    assert np.allclose(out[~comercial | violado], ref[~comercial | violado], rtol=1e-12, atol=0)
+    # desvio intencional: no prazo não há compensação (o protótipo cobrava a base de 120)
+    assert (out[comercial & ~violado] == 0).all() and (ref[comercial & ~violado] == 120).all()
+
+    # instante único == o mesmo instante repetido por OS
+    assert np.array_equal(penalidade(df, INICIO), penalidade(df, [INICIO] * len(df)))
+
+    # penalidade evitada: diferença das referências entre adiar 1 dia e concluir agora
+    amanha = fim + pd.Timedelta(days=1)
+    violado_amanha = comercial & (amanha - df["datasol"] > df["dataven"] - df["datasol"]).to_numpy()
+    adiado = np.where(comercial & ~violado_amanha, 0.0, _penalidade_por_linha(ns, df, amanha))
+    agora = np.where(comercial & ~violado, 0.0, ref)
+    assert np.allclose(penalidade_evitada(df, fim), adiado - agora, rtol=1e-9, atol=1e-9)
+
+    # entradas que o protótipo não tratava: conclusão antes de datasol, EUSD e datasol ausentes → 0
+    ruins = df.iloc[[0, 1, 12]].copy()
+    ruins["EUSD"] = [300.0, np.nan, 100.0]
+    ruins["datasol"] = [INICIO + pd.Timedelta(days=1), INICIO - pd.Timedelta(days=1), pd.NaT]
+    assert _penalidade_por_linha(ns, ruins.iloc[:1], [INICIO])[0] < 0
+    assert (penalidade(ruins, INICIO) == 0).all()
+    print("✅ Custo regulatório vetorizado equivalente a calcular_penalizacao")
+    return True
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("🧪 TESTES DE EQUIVALÊNCIA COM AS IMPLEMENTAÇÕES ORIGINAIS")
+    print("=" * 60)
+
+    all_ok = True
+
+    print("\n1️⃣ Payload VROOM...")
+    all_ok &= test_payload_colunar()
+
+    print("\n2️⃣ Resposta VROOM...")
+    all_ok &= test_decodificacao_colunar()
+    all_ok &= test_trechos_por_perna()
+
+    print("\n3️⃣ Pausa e vencimento no VROOM...")
+    all_ok &= test_pausa_e_prazo_nativos()
+
+    print("\n4️⃣ Backlog do V3...")
+    all_ok &= test_pool_por_indices()
+    all_ok &= test_perfil_memoria_nao_altera()
+
+    print("\n5️⃣ Snapping...")
+    all_ok &= test_cache_snap_bases()
+    all_ok &= test_snap_jobs_em_lote()
+
+    print("\n6️⃣ Meta-heurística (utils/roteirizacao)...")
+    all_ok &= test_avaliacao_memorizada()
+    all_ok &= test_penalizacoes_em_lote()
+    all_ok &= test_individuos_permutacao()
+
+    print("\n7️⃣ Custo regulatório...")
+    all_ok &= test_custo_regulatorio_vetorizado()
+
+    print("\n" + "=" * 60)
+    print("✅ TODOS OS TESTES PASSARAM!" if all_ok else "❌ ALGUNS TESTES FALHARAM")
+    print("=" * 60)
+    sys.exit(0 if all_ok else 1)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Script de teste para o dataset de resultados particionado por dia
+"""
+import sys
+import tempfile
+
+import pandas as pd
+import pyarrow.compute as pc
+
+sys.path.append('/app')
+
+
+def _atribuicoes(dia: str, n: int) -> pd.DataFrame:
+    ini = pd.Timestamp(f"{dia} 07:00")
+    return pd.DataFrame(
+        {
+            "tipo_serv": ["técnico"] * n,
+            "numos": [1000 + i for i in range(n)],
+            "equipe": ["PVLPL46"] * n,
+            "inicio_turno": [ini] * n,
+            "dth_chegada_estimada": [ini + pd.Timedelta(minutes=30 * i) for i in range(n)],
+            "eta_source": ["VROOM"] * n,
+            "job_id_vroom": list(range(1, n + 1)),
+            "coluna_desconhecida": list(range(n)),
+        }
+    )
+
+
+def test_write_and_scan():
+    """Cada dia vira uma partição com schema fixo; leitura filtra por dia"""
+    from v2.result_writer import ResultDatasetWriter, RESULT_SCHEMA, abrir_dataset_resultados, contagem_valores
+
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = ResultDatasetWriter(tmp, compression="snappy", row_group_size=2)
+        out_file, table = writer.write_day("2025-01-01", [_atribuicoes("2025-01-01", 3)])
+        writer.write_day("2025-01-02", [_atribuicoes("2025-01-02", 2), _atribuicoes("2025-01-02", 1)])
+
+        assert out_file.parent.name == "dia=2025-01-01"
+        assert table.schema == RESULT_SCHEMA
+        assert table.num_rows == 3
+        assert table.column("dataven").null_count == 3
+        assert table.column("job_id_vroom").to_pylist() == [1, 2, 3]
+        assert "coluna_desconhecida" not in table.column_names
+        assert contagem_valores(table, "eta_source") == {"VROOM": 3}
+
+        ds = abrir_dataset_resultados(tmp)
+        assert ds.count_rows() == 6
+        dia2 = ds.to_table(filter=pc.field("dia") == "2025-01-02")
+        assert dia2.num_rows == 3
+
+        # reescrever um dia substitui só a partição dele
+        writer.write_day("2025-01-01", _atribuicoes("2025-01-01", 1))
+        assert abrir_dataset_resultados(tmp).count_rows() == 4
+
+    print("✅ Dataset particionado OK")
+
+
+def test_numos_nao_numericos():
+    """numos não canônicos não colidem e voltam ao texto original na gravação"""
+    from v2.data_loader import _encode_numos, tabela_numos
+    from v2.result_writer import ResultDatasetWriter
+
+    df = pd.DataFrame({"numos": ["123", "123.5", "00123", "A-17"]})
+    ids, side = _encode_numos(df["numos"])
+    assert ids[0] == 123 and len(set(ids.tolist())) == 4
+    assert set(side.values()) == {"123.5", "00123", "A-17"}
+
+    df["numos"] = ids
+    df.attrs["numos_side"] = {str(k): v for k, v in side.items()}
+    with tempfile.TemporaryDirectory() as tmp:
+        _, table = ResultDatasetWriter(tmp).write_day("2025-01-01", df, tabela_numos(df))
+    assert table.column("numos_original").to_pylist() == ["123", "123.5", "00123", "A-17"]
+    print("✅ numos não numéricos OK")
+
+
+def test_colunas_arrow_concatenadas():
+    """Colunas de texto em pyarrow vindas de concat (várias partes) são gravadas normalmente"""
+    from v2.result_writer import ResultDatasetWriter, to_record_batch
+
+    partes = [_atribuicoes("2025-01-01", n) for n in (2, 3)]
+    for p in partes:
+        for col in ("equipe", "eta_source"):
+            p[col] = p[col].astype("string[pyarrow]")
+    df = pd.concat(partes, ignore_index=True)
+
+    batch = to_record_batch(df)
+    assert batch.num_rows == 5
+    assert batch.column(batch.schema.get_field_index("equipe")).to_pylist() == ["PVLPL46"] * 5
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _, table = ResultDatasetWriter(tmp).write_day("2025-01-01", partes)
+        assert table.num_rows == 5
+    print("✅ Colunas pyarrow concatenadas")
+    return True
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("🧪 TESTE DO DATASET DE RESULTADOS")
+    print("=" * 60)
+    test_write_and_scan()
+    test_numos_nao_numericos()
+    test_colunas_arrow_concatenadas()
+    print("=" * 60)
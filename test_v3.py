@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Script de teste do V3 (backlog, pré-filtro e otimização paralela) sem VROOM/OSRM
+"""
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+sys.path.append('/app')
+
+
+class VroomFalso:
+    """Sequencia os jobs na ordem recebida (10 min entre paradas) e conta as chamadas."""
+
+    chamadas = 0
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def route(self, vehicle, jobs):
+        VroomFalso.chamadas += 1
+        t, passos = 0, [{"type": "start", "arrival": 0, "duration": 0, "distance": 0}]
+        for j in jobs:
+            t += 600
+            passos.append({"type": "job", "job": j["id"], "id": j["id"], "arrival": t, "duration": t,
+                           "distance": t * 10, "service": j.get("service", 0)})
+            t += j.get("service", 0)
+        passos.append({"type": "end", "arrival": t + 600, "duration": t + 600, "distance": (t + 600) * 10})
+        return {"code": 0, "unassigned": [], "routes": [{"vehicle": vehicle["id"], "steps": passos}]}
+
+
+class OSRMFalso:
+    base_url = "http://osrm-teste:5000"
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def nearest_or_none(self, lon, lat):
+        return None
+
+
+def _pendencias(n: int, tipo: str = "técnico", inicio: int = 1000) -> pd.DataFrame:
+    from v2.data_loader import _compact_dtypes
+
+    ds = pd.Timestamp("2025-01-01 06:00") - pd.to_timedelta(np.arange(n), unit="h")
+    df = pd.DataFrame(
+        {
+            "tipo_serv": tipo,
+            "numos": np.arange(inicio, inicio + n).astype(str),
+            "datasol": ds,
+            "datater_trab": ds + pd.Timedelta(hours=5),
+            "TD": 10.0,
+            "TE": 30.0,
+            "latitude": -8.75 + 0.001 * np.arange(n),
+            "longitude": -63.88,
+            "dt_ref": ds.normalize(),
+            "EUSD": 100.0 * np.arange(n),
+            "EUSD_FIO_B": np.nan,
+        }
+    )
+    if tipo == "comercial":
+        df.insert(3, "dataven", ds + pd.Timedelta(hours=30))
+    return _compact_dtypes(df, tipo)
+
+
+def _equipe(nome: str) -> pd.Series:
+    ini = pd.Timestamp("2025-01-01 07:00")
+    return pd.Series(
+        {
+            "nome": nome, "dt_ref": ini.normalize(), "inicio_turno": ini, "fim_turno": ini + pd.Timedelta(hours=9),
+            "dthpausa_ini": ini + pd.Timedelta(hours=4), "dthpausa_fim": ini + pd.Timedelta(hours=5),
+            "base_lon": -63.90, "base_lat": -8.70,
+        }
+    )
+
+
+def test_conflito_paralelo_resequencia():
+    """Equipe que perde OS no paralelo só re-sequencia: 1 chamada VROOM, sem AG/SA/ACO"""
+    import v3.optimization as opt
+    from v3.main import _otimizar_rodada_paralela
+
+    mh = opt.MetaHeuristicaV3
+    originais = opt.VroomClient, opt.OSRMClient, mh._ag, mh.otimizar_para_equipe
+    chamadas_ag, otimizacoes = [], []
+    opt.VroomClient, opt.OSRMClient = VroomFalso, OSRMFalso
+    mh._ag = lambda self, pool, k=10, **kw: chamadas_ag.append(k) or list(range(k))
+    mh.otimizar_para_equipe = lambda self: otimizacoes.append(self) or originais[3](self)
+    VroomFalso.chamadas = 0
+    try:
+        df_co = _pendencias(0, "comercial", 5000)
+        backlog = opt.BacklogV3(_pendencias(6), df_co)
+        # mesmas bases/turnos: as duas escolhem as mesmas OS e a EQ1 perde o conflito
+        candidatas = [(_equipe("EQ0"), 2), (_equipe("EQ1"), 2)]
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            resultados = _otimizar_rodada_paralela(executor, candidatas, backlog)
+    finally:
+        opt.VroomClient, opt.OSRMClient, mh._ag, mh.otimizar_para_equipe = originais
+
+    # AG/SA/ACO só na otimização inicial de cada equipe
+    assert len(otimizacoes) == len(chamadas_ag) == 2, (otimizacoes, chamadas_ag)
+    assert VroomFalso.chamadas == 3, VroomFalso.chamadas  # 2 rotas + 1 re-sequenciamento
+    eq0, eq1 = (set(r["numos"].astype("int64")) for r in resultados)
+    assert len(eq0) == len(eq1) == 2 and not eq0 & eq1
+    assert resultados[1]["eta_source"].eq("VROOM").all()
+    print("✅ Conflito no paralelo re-sequencia só a equipe perdedora")
+    return True
+
+
+def test_solver_local_usa_osrm_configurado():
+    """Rotas pequenas no solver local usam o OSRM da meta-heurística, não o padrão"""
+    import v3.optimization as opt
+    from v2.solver_local import SolverLocal
+
+    urls = []
+    originais = opt.OSRMClient, opt.solver_local
+    opt.OSRMClient = OSRMFalso
+    opt.solver_local = lambda osrm_url=None: urls.append(osrm_url) or SolverLocal()
+    try:
+        mh = opt.MetaHeuristicaV3(_equipe("EQ0"), limite_por_equipe=3, pool=_pendencias(3), solver_local_max_jobs=5)
+        rota = mh.resequenciar(mh.pool_base)["resp"]
+    finally:
+        opt.OSRMClient, opt.solver_local = originais
+
+    assert urls == [OSRMFalso.base_url]
+    assert len(rota) == 3 and rota["eta_source"].eq("LOCAL").all()
+    print("✅ Solver local com o OSRM configurado")
+    return True
+
+
+def test_janela_mantem_backlog():
+    """Janela de datas corta só o fim: OS abertas antes do início continuam como backlog"""
+    import tempfile
+    from pathlib import Path
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import v2.data_loader as dl
+
+    ts = pd.to_datetime(["2024-12-20 10:00", "2025-01-05 08:00", "2025-02-10 09:00"])
+    variantes = {
+        "timestamp[ns]": pa.array(ts.values),
+        "timestamp[ms]": pa.array(ts.values.astype("datetime64[ms]")),
+        "timestamp com fuso": pa.array(ts.tz_localize("America/Porto_Velho")),
+        "date32": pa.array(ts.date),
+        "texto": pa.array(ts.strftime("%d/%m/%Y %H:%M")),  # fora do ISO: sem filtro no parquet
+    }
+    originais = dl.DATA_DIRS
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            dl.DATA_DIRS = (Path(tmp),)
+            for nome, datas in variantes.items():
+                pq.write_table(
+                    pa.table({"NUMOS": ["1", "2", "3"], "DH_INICIO": datas, "LATITUDE": [-8.7] * 3,
+                              "LONGITUDE": [-63.9] * 3, "TE": [30.0] * 3, "TD": [10.0] * 3}),
+                    Path(tmp) / "atendTec.parquet",
+                )
+                df = dl._prep_tecnicos("2025-01-01", "2025-01-31")
+                assert df["numos"].tolist() == [1, 2], (nome, df["numos"].tolist())
+                assert len(dl._prep_tecnicos()) == 3, nome
+    finally:
+        dl.DATA_DIRS = originais
+    print("✅ Janela de datas mantém o backlog anterior")
+    return True
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("🧪 TESTES V3")
+    print("=" * 60)
+
+    all_ok = True
+
+    print("\n1️⃣ Testando otimização paralela...")
+    all_ok &= test_conflito_paralelo_resequencia()
+
+    print("\n2️⃣ Testando solver local...")
+    all_ok &= test_solver_local_usa_osrm_configurado()
+
+    print("\n3️⃣ Testando janela de datas na carga...")
+    all_ok &= test_janela_mantem_backlog()
+
+    print("\n" + "=" * 60)
+    print("✅ TODOS OS TESTES PASSARAM!" if all_ok else "❌ ALGUNS TESTES FALHARAM")
+    print("=" * 60)
+    sys.exit(0 if all_ok else 1)
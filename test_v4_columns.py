@@ -14,9 +14,9 @@ def test_v4_output():
     results_v3 = Path("/app/results_v3")
     results_v4 = Path("/app/results_v4")
     
-    # Pegar primeiro arquivo de cada
-    v3_files = list(results_v3.glob("*.parquet"))
-    v4_files = list(results_v4.glob("*.parquet"))
+    # Pegar primeiro arquivo de cada (dataset particionado: dia=AAAA-MM-DD/part-0.parquet)
+    v3_files = sorted(results_v3.rglob("*.parquet"))
+    v4_files = sorted(results_v4.rglob("*.parquet"))
     
     if not v3_files:
         print("❌ Nenhum arquivo V3 encontrado")
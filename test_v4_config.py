@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Script de teste para a configuração em tempo de execução do V4
+"""
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.append('/app')
+
+
+def test_precedencia():
+    """padrão < YAML < ambiente < argumentos"""
+    from v4.config import V4Config, MAX_EQUIPES_POR_SUBGRUPO
+
+    with tempfile.TemporaryDirectory() as tmp:
+        arq = Path(tmp) / "v4.yml"
+        arq.write_text("MAX_JOBS_ABSOLUTO: 200\nfator_pool: 4\nvroom_url: http://vroom:3000\n")
+
+        cfg = V4Config.carregar(
+            arq,
+            env={"ROTAS_FATOR_POOL": "5"},
+            limite_por_equipe=10,
+            vroom_url=None,
+        )
+
+    assert cfg.max_jobs_absoluto == 200
+    assert cfg.fator_pool == 5
+    assert cfg.limite_por_equipe == 10
+    assert cfg.vroom_url == "http://vroom:3000"
+    assert cfg.max_equipes_por_subgrupo == MAX_EQUIPES_POR_SUBGRUPO
+
+    # variantes não alteram a configuração original
+    outra = cfg.com(limite_por_equipe=3)
+    assert outra.limite_por_equipe == 3 and cfg.limite_por_equipe == 10
+
+    try:
+        V4Config.carregar(env={}, max_jobs=1)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("parâmetro desconhecido deveria falhar")
+
+    assert V4Config.carregar(env={"ROTAS_OBJETIVO": "penalidade"}).objetivo == "penalidade"
+    try:
+        cfg.com(objetivo="custo")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("objetivo desconhecido deveria falhar")
+
+    assert V4Config.carregar(env={"ROTAS_HORIZONTE_DIAS": "2"}).horizonte_dias == 2
+    try:
+        cfg.com(horizonte_dias=0)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("horizonte_dias < 1 deveria falhar")
+
+    print("✅ Configuração V4 OK")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("🧪 TESTE DA CONFIGURAÇÃO V4")
+    print("=" * 60)
+    test_precedencia()
+    print("=" * 60)
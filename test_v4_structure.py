@@ -22,7 +22,7 @@ def test_imports():
         return False
     
     try:
-        from v4.main import _score_job, _ensure_result_schema
+        from v4.main import _score_job, _scores_jobs
         print("✅ Imports de funções do main OK")
     except Exception as e:
         print(f"❌ Erro nas funções do main: {e}")
@@ -47,6 +47,47 @@ def test_vroom_client():
         print(f"❌ Erro no VroomClient: {e}")
         return False
 
+def test_vroom_async_limite():
+    """AsyncVroomClient respeita definir_limite_concorrencia (uso de biblioteca)"""
+    import asyncio
+    import json
+    import threading
+    from v2.vroom_client import AsyncVroomClient, definir_limite_concorrencia
+
+    em_voo = {"agora": 0, "max": 0}
+
+    class Resposta:
+        def __init__(self, dados):
+            self.dados = dados
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return self.dados
+
+    class ClienteFalso:
+        async def request(self, method, url, content=None, **kwargs):
+            em_voo["agora"] += 1
+            em_voo["max"] = max(em_voo["max"], em_voo["agora"])
+            await asyncio.sleep(0.01)
+            em_voo["agora"] -= 1
+            return Resposta({"code": 0, "jobs": len(json.loads(content)["jobs"])})
+
+    async def rodar():
+        async with AsyncVroomClient(max_concorrencia=4, client=ClienteFalso()) as vc:
+            return await vc.route_multi_many([([{"id": 1}], [{"id": j}] * n) for j, n in enumerate([1, 2, 3, 4, 5, 6])])
+
+    definir_limite_concorrencia(threading.BoundedSemaphore(2))
+    try:
+        respostas = asyncio.run(rodar())
+    finally:
+        definir_limite_concorrencia()
+    assert [r["jobs"] for r in respostas] == [1, 2, 3, 4, 5, 6]
+    assert em_voo["max"] == 2, em_voo
+    print("✅ AsyncVroomClient respeita o limite de concorrência")
+    return True
+
 def test_capacity_payload():
     """Testa se o payload com capacidade está correto"""
     try:
@@ -77,6 +118,345 @@ def test_capacity_payload():
         print(f"❌ Erro na estrutura do payload: {e}")
         return False
 
+def test_scores_vetorizados():
+    """_scores_jobs (pool inteiro) deve reproduzir _score_job linha a linha"""
+    import numpy as np
+    import pandas as pd
+    from v4.main import _score_job, _scores_jobs
+
+    turno = pd.Timestamp("2025-01-02 08:00")
+    pool = pd.DataFrame(
+        {
+            "tipo_serv": ["comercial", "técnico", "comercial", "outro"],
+            "datasol": pd.to_datetime(["2024-12-30 10:00", "2025-01-01 22:15", None, "2025-01-02 09:00"]),
+            "dataven": pd.to_datetime(["2025-01-03 10:00", None, "2024-12-31 00:00", None]),
+            "EUSD": [143.5, 0.0, 12.0, None],
+            "prioridade": [2, 1, 0, 3],
+        }
+    )
+    esperado = pool.apply(lambda r: _score_job(r, turno), axis=1).to_numpy()
+    assert np.allclose(_scores_jobs(pool, turno), esperado, rtol=0, atol=1e-12)
+    print("✅ Score vetorizado OK")
+    return True
+
+def test_despacho_insercao():
+    """Uma OS chegada no meio do turno entra entre as paradas ainda não executadas"""
+    import pandas as pd
+    from v2.despacho import DespachoIntradia, INSERCAO
+    from v2.matriz import MatrizDeslocamento
+
+    ini = pd.Timestamp("2025-01-01 08:00")
+    eq = pd.DataFrame({"nome": ["EQ1"], "inicio_turno": [ini], "fim_turno": [ini + pd.Timedelta(hours=8)]})
+    rota = pd.DataFrame(
+        {
+            "equipe": ["EQ1", "EQ1"],
+            "numos": [1, 2],
+            "longitude": [-63.80, -63.70],
+            "latitude": [-8.70, -8.70],
+            "TE": [30.0, 30.0],
+            "dth_chegada_estimada": [ini + pd.Timedelta(minutes=20), ini + pd.Timedelta(minutes=90)],
+        }
+    )
+    despacho = DespachoIntradia(ini, MatrizDeslocamento(), capacidade=5)
+    despacho.adicionar_grupo(eq, rota, [-63.90], [-8.70])
+
+    os_nova = {"numos": 3, "longitude": -63.75, "latitude": -8.70, "TE": 10.0,
+               "datasol": ini + pd.Timedelta(minutes=30), "dataven": pd.NaT}
+    assert despacho.evento(os_nova) == INSERCAO
+    assert despacho.rotas[0].numos == [1, 3, 2]
+
+    (saida,) = despacho.resultado()
+    saida = saida.set_index("numos")
+    assert saida.loc[1, "eta_source"] == "VROOM"
+    assert saida.loc[3, "eta_source"] == INSERCAO
+    assert saida.loc[3, "dth_chegada_estimada"] > os_nova["datasol"]
+    assert saida.loc[2, "dth_chegada_estimada"] > saida.loc[3, "dth_final_estimada"]
+    print("✅ Despacho intradiário OK")
+    return True
+
+def test_matriz_blocos_osrm():
+    """Extensões da matriz respeitam o limite do /table e refazem pontos após falha"""
+    import numpy as np
+    from v2.matriz import MAX_TABELA, MatrizDeslocamento, haversine_m
+
+    class OSRMFalso:
+        def __init__(self):
+            self.falhar = False
+
+        def table(self, coords, sources=None, destinations=None):
+            if self.falhar:
+                raise RuntimeError("OSRM fora do ar")
+            c = np.asarray(coords)
+            s = list(range(len(c)) if sources is None else sources)
+            d = list(range(len(c)) if destinations is None else destinations)
+            assert len(s) * len(d) <= MAX_TABELA ** 2
+            h = 2 * haversine_m(c[s, 0][:, None], c[s, 1][:, None], c[d, 0][None, :], c[d, 1][None, :])
+            return {"durations": h.tolist(), "distances": h.tolist()}
+
+    rng = np.random.default_rng(0)
+    pontos = list(zip(-63.9 + rng.random(130) * 0.2, -8.7 + rng.random(130) * 0.2))
+    osrm = OSRMFalso()
+    matriz = MatrizDeslocamento(osrm)
+    matriz.indices(pontos[:110])
+    osrm.falhar = True
+    matriz.indices(pontos[110:120])  # fica na haversine
+    osrm.falhar = False
+    matriz.indices(pontos[120:])     # refaz também os pontos da falha
+
+    c = np.asarray(matriz.pontos())
+    esperado = 2 * haversine_m(c[:, 0][:, None], c[:, 1][:, None], c[None, :, 0], c[None, :, 1])
+    assert matriz.osrm is osrm and np.allclose(matriz.dist, esperado)
+    print("✅ Matriz em blocos OK")
+    return True
+
+
+def test_matriz_cresce_em_blocos():
+    """Pontos um a um realocam a matriz poucas vezes e dão o mesmo resultado que de uma vez"""
+    import numpy as np
+    from v2.matriz import MatrizDeslocamento
+
+    rng = np.random.default_rng(1)
+    pontos = list(zip(-63.9 + rng.random(300) * 0.2, -8.7 + rng.random(300) * 0.2))
+    inteira = MatrizDeslocamento()
+    inteira.indices(pontos)
+
+    matriz, buffers = MatrizDeslocamento(), set()
+    for p in pontos:
+        matriz.indice(*p)
+        buffers.add(id(matriz._buf_dur))
+    assert matriz.dur.shape == (300, 300) and len(buffers) <= 4, len(buffers)  # 64 → 128 → 256 → 512
+    assert np.allclose(matriz.dur, inteira.dur) and np.allclose(matriz.dist, inteira.dist)
+    print("✅ Matriz cresce em blocos")
+    return True
+
+
+def test_backlog_compartilhado_chave():
+    """Backlog publicado só é reaproveitado com a mesma chave (janela/origem)"""
+    import tempfile
+    import pandas as pd
+    from v2.shared_backlog import abrir_backlog, backlog_publicado, publicar_backlog
+
+    df = pd.DataFrame({"numos": [1, 2], "TE": [10.0, 20.0]})
+    with tempfile.TemporaryDirectory() as tmp:
+        assert not backlog_publicado(tmp)
+        publicar_backlog(tmp, df, df, df, chave="jan")
+        assert backlog_publicado(tmp, "jan") and not backlog_publicado(tmp, "fev")
+        publicar_backlog(tmp, df, df.head(1), df, chave="fev")
+        assert backlog_publicado(tmp, "fev") and not backlog_publicado(tmp, "jan")
+        assert len(abrir_backlog(tmp)[1]) == 1
+    print("✅ Chave do backlog compartilhado OK")
+    return True
+
+
+def test_carregar_dados_reaproveita_publicacao():
+    """Publicação de carregar_dados (v4.main e v4.sweep) é reaproveitada só com a mesma janela"""
+    import importlib
+    import tempfile
+    import pandas as pd
+
+    v4_main = importlib.import_module("v4.main")
+    cargas = []
+    df = pd.DataFrame({"numos": [1, 2], "TE": [10.0, 20.0]})
+    originais = v4_main.prepare_equipes_v3, v4_main.prepare_pendencias_v3
+    v4_main.prepare_equipes_v3 = lambda ini, fim, usar_cache=True: cargas.append((ini, fim)) or df
+    v4_main.prepare_pendencias_v3 = lambda ini, fim, **kw: (df, df)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            v4_main.carregar_dados("2025-01-01", "2025-01-31", backlog_dir=tmp)  # sweep publica
+            v4_main.carregar_dados("2025-01-01", "2025-01-31", backlog_dir=tmp)  # main reaproveita
+            v4_main.carregar_dados("2025-02-01", "2025-02-28", backlog_dir=tmp)  # outra janela: republica
+    finally:
+        v4_main.prepare_equipes_v3, v4_main.prepare_pendencias_v3 = originais
+    assert cargas == [("2025-01-01", "2025-01-31"), ("2025-02-01", "2025-02-28")]
+    print("✅ Publicação do backlog reaproveitada entre execuções")
+    return True
+
+
+def test_warm_start_seed():
+    """Rota planejada para a equipe do dia seguinte chega como steps no payload dela"""
+    import importlib
+    import pandas as pd
+    from v2.backlog import Backlog
+    from v2.warm_start import RotasAnteriores
+    from v4.config import V4Config
+
+    payloads = []
+
+    class VroomFalso:
+        """Atribui os jobs em ordem ao último veículo (a equipe do dia seguinte, se houver)."""
+
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def route_multi(self, vehicles, jobs):
+            payloads.append(vehicles)
+            steps = [{"type": "start", "arrival": 0, "duration": 0, "distance": 0}]
+            steps += [
+                {"type": "job", "job": j["id"], "arrival": 600 * k, "duration": 600 * k, "distance": 5000 * k}
+                for k, j in enumerate(jobs, 1)
+            ]
+            return {"code": 0, "routes": [{"vehicle": vehicles[-1]["id"], "steps": steps}], "unassigned": []}
+
+    ini = pd.Timestamp("2025-01-01 08:00")
+    equipes = pd.DataFrame(
+        {
+            "nome": ["EQ1", "EQ1"],
+            "dt_ref": [ini.normalize(), ini.normalize() + pd.Timedelta(days=1)],
+            "inicio_turno": [ini, ini + pd.Timedelta(days=1)],
+            "fim_turno": [ini + pd.Timedelta(hours=8), ini + pd.Timedelta(days=1, hours=8)],
+        }
+    )
+    pend = pd.DataFrame(
+        {
+            "tipo_serv": "técnico",
+            "numos": [11, 12, 13],
+            "datasol": ini - pd.Timedelta(hours=1),
+            "dt_ref": ini.normalize(),
+            "TE": 30.0,
+            "latitude": [-8.70, -8.71, -8.72],
+            "longitude": [-63.80, -63.81, -63.82],
+        }
+    )
+    backlog = Backlog(pend, pend.iloc[0:0])
+    cfg = V4Config(warm_start=True, horizonte_dias=2)
+    rotas = RotasAnteriores()
+
+    v4_main = importlib.import_module("v4.main")  # v4.main (o pacote reexporta a função main)
+    original = v4_main.VroomClient
+    v4_main.VroomClient = VroomFalso
+    try:
+        # dia D: tudo vai para a equipe de D+1 (descartado), mas a rota fica registrada
+        _, atribuidos = v4_main._solve_group_vroom(equipes.iloc[[0]], backlog, cfg, rotas, equipes.iloc[[1]])
+        assert not atribuidos and len(rotas) == 1
+        # dia D+1: a rota planejada vira o seed do veículo
+        v4_main._solve_group_vroom(equipes.iloc[[1]], backlog, cfg, rotas, None)
+    finally:
+        v4_main.VroomClient = original
+
+    assert "steps" not in payloads[0][0]
+    seed = payloads[1][0].get("steps")
+    assert seed is not None and [s["type"] for s in seed] == ["start", "job", "job", "job", "end"]
+    print("✅ Warm start OK")
+    return True
+
+
+def test_warm_start_descarte():
+    """Rotas de dias passados saem do registro; seeds só usam jobs do payload atual"""
+    import pandas as pd
+    from v2.warm_start import RotasAnteriores
+
+    d1 = pd.Timestamp("2025-01-02")
+    rotas = RotasAnteriores()
+    rotas.registrar(
+        pd.DataFrame({"equipe": ["EQ1", "EQ1", "EQ2"], "numos": [11, 12, 13], "dth_chegada_estimada": [1, 2, 1]}),
+        dia=d1 + pd.Timedelta(hours=8),
+    )
+    # no próprio dia a rota ainda vale, só com os jobs pendentes (12 já saiu)
+    assert rotas.descartar_ate(d1) == 0 and len(rotas) == 2
+    assert rotas.steps(["EQ1"], {11: 1}) == [[{"type": "start"}, {"type": "job", "id": 1}, {"type": "end"}]]
+
+    # EQ1 planejada de novo para o dia seguinte; EQ2 saiu da escala e sua rota expira
+    rotas.registrar(pd.DataFrame({"equipe": ["EQ1"], "numos": [14], "dth_chegada_estimada": [1]}), dia=d1 + pd.Timedelta(days=1))
+    assert rotas.descartar_ate(d1 + pd.Timedelta(days=1)) == 1 and len(rotas) == 1
+    assert rotas.steps(["EQ2"], {13: 1}) == [None]
+    assert rotas.steps(["EQ1"], {11: 1, 14: 2})[0][1] == {"type": "job", "id": 2}
+    print("✅ Rotas do warm start expiram por dia")
+    return True
+
+
+def test_horizonte_subgrupos_por_nome():
+    """Em sub-grupos, cada equipe do dia seguinte acompanha a equipe de mesmo nome"""
+    import importlib
+    import pandas as pd
+    from v4.config import V4Config
+
+    v4_main = importlib.import_module("v4.main")
+    chamadas = []
+    original = v4_main._solve_group_vroom_single
+    v4_main._solve_group_vroom_single = lambda sub, backlog, cfg, rotas, prox: (
+        chamadas.append((sub["nome"].tolist(), sorted(prox["nome"]))) or (pd.DataFrame(), set())
+    )
+    ini = pd.Timestamp("2025-01-01 08:00")
+    hoje = pd.DataFrame({"nome": ["A", "B", "C", "D"], "inicio_turno": ini})
+    amanha = pd.DataFrame({"nome": ["D", "C", "B", "A", "E"], "inicio_turno": ini + pd.Timedelta(days=1)})
+    try:
+        v4_main._solve_group_vroom(hoje, None, V4Config(max_equipes_por_subgrupo=2), None, amanha)
+    finally:
+        v4_main._solve_group_vroom_single = original
+    assert chamadas == [(["A", "B"], ["A", "B", "E"]), (["C", "D"], ["C", "D"])], chamadas
+    print("✅ Horizonte por nome nos sub-grupos OK")
+    return True
+
+
+def test_solver_local():
+    """Solver local respeita capacity/break e devolve o formato de decodificar_rotas"""
+    from v2.solver_local import SolverLocal
+    from v2.vroom_payload import breaks_pausa, jobs_payload, vehicles_payload
+    from v2.vroom_response import decodificar_rotas
+
+    jobs = jobs_payload([1, 2, 3, 4], [-63.80, -63.70, -63.75, -63.60], [-8.70] * 4, [1800] * 4, delivery=[1] * 4)
+    vehicles = vehicles_payload(
+        [1, 2], [-63.90, -63.90], [-8.70, -8.70], [28800, 28800],
+        capacity=[3, 3], breaks=breaks_pausa([3600, 3600], [7200, 7200], 28800),
+    )
+    resp = SolverLocal().route_multi(vehicles, jobs)
+    assert resp["code"] == 0 and not resp["unassigned"]
+
+    passos = decodificar_rotas(resp)
+    assert sorted(passos["job"].tolist()) == [1, 2, 3, 4]
+    assert passos.groupby("vehicle").size().max() <= 3
+    for rota in resp["routes"]:
+        (pausa,) = [s for s in rota["steps"] if s["type"] == "break"]
+        for s in rota["steps"]:
+            if s["type"] == "job":
+                assert s["arrival"] + s["service"] <= pausa["arrival"] or s["arrival"] >= pausa["arrival"] + pausa["service"]
+    print("✅ Solver local OK")
+    return True
+
+
+def test_solver_local_sem_osrm():
+    """OSRM fora do ar: solver local cai na haversine e não repete o /table a cada solve"""
+    from v2.solver_local import SolverLocal
+    from v2.vroom_payload import jobs_payload
+
+    class OSRMForaDoAr:
+        chamadas = 0
+
+        def table(self, coords, sources=None, destinations=None):
+            OSRMForaDoAr.chamadas += 1
+            raise ConnectionError("OSRM fora do ar")
+
+    veiculo = {"id": 1, "start": [-63.90, -8.70], "end": [-63.90, -8.70], "time_window": [0, 28800]}
+    solver, referencia = SolverLocal(OSRMForaDoAr()), SolverLocal()
+    for n in range(3):
+        jobs = jobs_payload([1, 2], [-63.80 + 0.01 * n, -63.70], [-8.70, -8.75], [600, 600])
+        assert solver.route(veiculo, jobs) == referencia.route(veiculo, jobs)
+    assert OSRMForaDoAr.chamadas == 1
+    print("✅ Solver local sem OSRM OK")
+    return True
+
+
+def test_solver_local_janela_pausa():
+    """Pausa do solver local começa dentro da janela do break (como no VROOM)"""
+    from v2.solver_local import SolverLocal
+    from v2.vroom_payload import jobs_payload
+
+    jobs = jobs_payload([1, 2], [-63.80, -63.81], [-8.70, -8.70], [4000, 600])
+    veiculo = {"id": 1, "start": [-63.90, -8.70], "end": [-63.90, -8.70], "time_window": [0, 28800],
+               "breaks": [{"id": 1, "time_windows": [[3600, 7200]], "service": 1800}]}
+    resp = SolverLocal().route(veiculo, jobs)
+    (pausa,) = [s for s in resp["routes"][0]["steps"] if s["type"] == "break"]
+    assert 3600 <= pausa["arrival"] <= 7200 and not resp["unassigned"]
+
+    # turno começa depois do início fixo da pausa: a pausa não pode ser cumprida
+    veiculo = dict(veiculo, time_window=[5000, 28800],
+                   breaks=[{"id": 1, "time_windows": [[3600, 3600]], "service": 1800}])
+    resp = SolverLocal().route(veiculo, jobs)
+    assert not resp["routes"] and len(resp["unassigned"]) == 2
+    print("✅ Janela da pausa no solver local OK")
+    return True
+
+
 if __name__ == "__main__":
     print("=" * 60)
     print("🧪 TESTE DE ESTRUTURA V4")
@@ -89,11 +469,32 @@ if __name__ == "__main__":
     
     print("\n2️⃣ Testando VroomClient...")
     all_ok &= test_vroom_client()
+    all_ok &= test_vroom_async_limite()
     
     print("\n3️⃣ Testando estrutura de payload...")
     all_ok &= test_capacity_payload()
     
-    print("\n4️⃣ Testando configurações...")
+    print("\n4️⃣ Testando score vetorizado...")
+    all_ok &= test_scores_vetorizados()
+
+    print("\n5️⃣ Testando despacho intradiário...")
+    all_ok &= test_despacho_insercao()
+    all_ok &= test_matriz_blocos_osrm()
+    all_ok &= test_matriz_cresce_em_blocos()
+    all_ok &= test_backlog_compartilhado_chave()
+    all_ok &= test_carregar_dados_reaproveita_publicacao()
+
+    print("\n6️⃣ Testando warm start...")
+    all_ok &= test_warm_start_seed()
+    all_ok &= test_warm_start_descarte()
+    all_ok &= test_horizonte_subgrupos_por_nome()
+
+    print("\n7️⃣ Testando solver local...")
+    all_ok &= test_solver_local()
+    all_ok &= test_solver_local_janela_pausa()
+    all_ok &= test_solver_local_sem_osrm()
+
+    print("\n8️⃣ Testando configurações...")
     try:
         from v4 import config as v4_config
         print(f"✅ MAX_JOBS_ABSOLUTO: {v4_config.MAX_JOBS_ABSOLUTO}")
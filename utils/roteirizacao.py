@@ -1,16 +1,19 @@
 import pandas as pd
 import requests
 import json
-import copy
+from collections import OrderedDict
+from contextlib import nullcontext
 from datetime import datetime, timedelta
 import math
 import random
 import numpy as np
+from dateutil import tz
 
 # Configurações do servidor VROOM e OSRM
 VROOM_URL = "http://localhost:3000"  # URL do seu servidor VROOM local
 OSRM_URL = "http://localhost:5000"   # URL do seu servidor OSRM local (para distâncias/tempos se necessário)
 MAX_JOBS = 50
+MAX_CACHE_AVALIACOES = 4096  # avaliações (respostas VROOM) memorizadas por equipe
 
 # Carregar os dataframes (assumindo que você tem os arquivos CSV ou os dataframes já carregados)
 # Substitua pelos seus caminhos ou carregue diretamente
@@ -106,6 +109,84 @@ def calcular_penalizacao(linha, tipo_servico, prazo_verificado=None, prazo_regul
             return 120 + 34 * eusd * log_term
         return 120  # Penalização base se não houver prazo
 
+# Penalizações em lote: tabela por job montada uma vez por equipe
+def indexar_servicos(tecnicos, comerciais, job_id_to_numos):
+    """
+    Tabela job_id -> dados de penalização (arrays indexados pelo job_id):
+    tipo (1 = técnico, 2 = comercial, 0 = sem serviço), EUSD, DH_INICIO,
+    DATA_SOL e DATA_VENC (datetime64). Como na busca original, o NUMOS é
+    procurado primeiro nos técnicos e vale a primeira linha encontrada.
+    """
+    n = max(job_id_to_numos, default=0) + 1
+    tabela = {
+        'tipo': np.zeros(n, dtype=np.int8),
+        'eusd': np.full(n, np.nan),
+        'inicio': np.full(n, np.datetime64('NaT'), dtype='datetime64[ns]'),
+        'sol': np.full(n, np.datetime64('NaT'), dtype='datetime64[ns]'),
+        'venc': np.full(n, np.datetime64('NaT'), dtype='datetime64[ns]'),
+    }
+    job_ids = np.fromiter(job_id_to_numos.keys(), dtype=np.int64, count=len(job_id_to_numos))
+    numos = pd.Series(list(job_id_to_numos.values()), dtype=object)
+
+    pos_tec = _primeira_posicao(tecnicos['NUMOS'], numos)
+    pos_com = _primeira_posicao(comerciais['NUMOS'], numos)
+
+    eh_tec = pos_tec >= 0
+    eh_com = ~eh_tec & (pos_com >= 0)
+    jt, pt = job_ids[eh_tec], pos_tec[eh_tec]
+    jc, pc = job_ids[eh_com], pos_com[eh_com]
+
+    tabela['tipo'][jt] = 1
+    tabela['tipo'][jc] = 2
+    tabela['eusd'][jt] = pd.to_numeric(tecnicos['EUSD'], errors='coerce').to_numpy(dtype=np.float64)[pt]
+    tabela['eusd'][jc] = pd.to_numeric(comerciais['EUSD'], errors='coerce').to_numpy(dtype=np.float64)[pc]
+    tabela['inicio'][jt] = pd.to_datetime(tecnicos['DH_INICIO']).to_numpy(dtype='datetime64[ns]')[pt]
+    tabela['sol'][jc] = pd.to_datetime(comerciais['DATA_SOL']).to_numpy(dtype='datetime64[ns]')[pc]
+    tabela['venc'][jc] = pd.to_datetime(comerciais['DATA_VENC']).to_numpy(dtype='datetime64[ns]')[pc]
+    return tabela
+
+def _primeira_posicao(coluna, valores):
+    """Posição da primeira ocorrência de cada valor em `coluna` (-1 se ausente)."""
+    primeiras = pd.Series(np.arange(len(coluna)), index=coluna.to_numpy()).groupby(level=0).first()
+    return primeiras.reindex(valores.to_numpy()).fillna(-1).to_numpy(dtype=np.int64)
+
+def penalizacoes_lote(tabela, job_ids, arrivals, services):
+    """
+    Penalizações (mesmas fórmulas de calcular_penalizacao) de todos os steps de
+    uma resposta VROOM de uma vez; steps sem serviço conhecido ficam fora.
+    - técnico: duração (DH_INICIO → arrival + service, em horas) × EUSD/730 × 34
+    - comercial: 120 + 34 × EUSD × log(prazo_verificado / prazo_regulatorio)
+      quando o prazo verificado excede o regulatório (senão 120)
+    """
+    job_ids = np.asarray(job_ids, dtype=np.int64)
+    manter = (job_ids >= 0) & (job_ids < len(tabela['tipo']))
+    manter[manter] = tabela['tipo'][job_ids[manter]] > 0
+    job_ids = job_ids[manter]
+    arrivals = np.asarray(arrivals, dtype=np.int64)[manter]
+    services = np.asarray(services, dtype=np.int64)[manter]
+    tipo = tabela['tipo'][job_ids]
+    eusd = tabela['eusd'][job_ids]
+
+    # timestamps → horário local ingênuo (equivale a datetime.fromtimestamp)
+    def _local(ts):
+        return (pd.to_datetime(ts, unit='s', utc=True).tz_convert(tz.tzlocal())
+                .tz_localize(None).to_numpy(dtype='datetime64[ns]'))
+
+    dia = np.timedelta64(86400, 's')
+    duracao_h = (_local(arrivals + services) - tabela['inicio'][job_ids]) / np.timedelta64(3600, 's')
+    penal_tec = duracao_h * (eusd / 730) * 34
+
+    sol = tabela['sol'][job_ids]
+    prazo_reg = (tabela['venc'][job_ids] - sol) / dia
+    prazo_ver = (_local(arrivals) - sol) / dia
+    with np.errstate(divide='ignore', invalid='ignore'):
+        excede = prazo_ver > prazo_reg
+        log_term = np.where(excede, np.log(np.where(excede, prazo_ver / prazo_reg, 1.0)), 0.0)
+    com_prazo = (prazo_reg != 0) & (prazo_ver != 0)
+    penal_com = np.where(com_prazo, 120 + 34 * eusd * log_term, 120.0)
+
+    return np.where(tipo == 1, penal_tec, penal_com)
+
 # Função para filtrar serviços por data e equipe
 def filtrar_servicos(df_tecnicos, df_comerciais, equipe, data_ref):
     # Converter data_ref para date para comparação consistente
@@ -243,83 +324,109 @@ def chamar_vroom(vroom_input):
         print(f"VROOM retornou {resp.status_code} para {url}. Corpo:\n{body}\n")
         return None
 
+async def chamar_vroom_async(vroom_input, client, semaforo=None):
+    """
+    Variante assíncrona de chamar_vroom: `client` é um httpx.AsyncClient
+    compartilhado e `semaforo` (asyncio) limita as requisições em voo.
+    Mesmo contrato: devolve o JSON ou None em caso de erro.
+    """
+    headers = {'Content-Type': 'application/json'}
+    url = VROOM_URL.rstrip("/") + "/"
+    try:
+        async with semaforo or nullcontext():
+            resp = await client.post(url, json=vroom_input, headers=headers, timeout=60)
+    except Exception as e:
+        print(f"Erro de requisição ao VROOM ({url}): {e}")
+        return None
+
+    if resp.status_code == 200:
+        try:
+            return resp.json()
+        except Exception as e:
+            print(f"Resposta JSON inválida do VROOM ({url}): {e}")
+            return None
+    print(f"VROOM retornou {resp.status_code} para {url}. Corpo:\n{resp.text}\n")
+    return None
+
 # Implementação básica de metaheurística híbrida (GA + SA + ACO simplificada)
 # Isso é uma versão simplificada; em produção, use bibliotecas como DEAP para GA, etc.
+# Indivíduos são permutações (np.int32) das posições dos jobs de vroom_input_base;
+# os dicts dos jobs são compartilhados e o payload só é montado para ir ao VROOM.
 class MetaHeuristica:
-    def __init__(self, vroom_input_base, tecnicos, comerciais, job_id_to_numos, num_iter=100):
+    def __init__(self, vroom_input_base, tecnicos, comerciais, job_id_to_numos, num_iter=100,
+                 max_cache=MAX_CACHE_AVALIACOES):
         self.vroom_input = vroom_input_base
+        self._jobs = tuple(vroom_input_base['jobs'])  # tabela imutável de jobs
         self.tecnicos = tecnicos
         self.comerciais = comerciais
         self.job_id_to_numos = job_id_to_numos
+        self._tabela = indexar_servicos(tecnicos, comerciais, job_id_to_numos)
         self.num_iter = num_iter
         self.melhor_solucao = None
+        self.melhor_permutacao = None
         self.melhor_custo = float('inf')
-    
-    def avaliar_solucao(self, solucao):
+        # cache LRU permutação -> custo (o VROOM é determinístico para o mesmo payload;
+        # veículos e demais campos são fixos por equipe, só a ordem dos jobs varia)
+        self.max_cache = max_cache
+        self._custos = OrderedDict()
+        self.chamadas_vroom = 0
+        self.chamadas_evitadas = 0
+
+    def payload(self, perm):
+        """Payload VROOM do indivíduo (jobs na ordem da permutação, sem cópias)."""
+        solucao = dict(self.vroom_input)
+        solucao['jobs'] = [self._jobs[i] for i in perm]
+        return solucao
+
+    def avaliar_solucao(self, perm):
+        """Custo do indivíduo; permutações já avaliadas não voltam ao VROOM."""
+        chave = perm.tobytes()
+        if chave in self._custos:
+            self._custos.move_to_end(chave)
+            self.chamadas_evitadas += 1
+            return self._custos[chave]
+        custo = self._avaliar_no_vroom(self.payload(perm))
+        self._custos[chave] = custo
+        if len(self._custos) > self.max_cache:
+            self._custos.popitem(last=False)
+        return custo
+
+    def _avaliar_no_vroom(self, solucao):
         # Simular custo baseado na resposta do VROOM (tempo total, penalizações)
+        self.chamadas_vroom += 1
         resposta = chamar_vroom(solucao)
         if resposta:
             custo = resposta['summary']['cost']  # Custo total do VROOM
-            # Adicionar penalizações personalizadas
-            for route in resposta['routes']:
-                for step in route['steps']:
-                    if step.get('type') == 'job':
-                        job_id = step['job']
-                        arrival_ts = step['arrival']
-                        service_ts = step['service']
-                        
-                        # Usar mapeamento para obter NUMOS
-                        numos = self.job_id_to_numos.get(job_id)
-                        if numos is None:
-                            continue
-                        
-                        # Identificar tipo
-                        if numos in self.tecnicos['NUMOS'].values:
-                            tipo = 'tecnico'
-                            df_servico = self.tecnicos
-                        elif numos in self.comerciais['NUMOS'].values:
-                            tipo = 'comercial'
-                            df_servico = self.comerciais
-                        else:
-                            continue
-                        
-                        # Buscar linha do serviço
-                        linha = df_servico[df_servico['NUMOS'] == numos]
-                        if not linha.empty:
-                            linha = linha.iloc[0]
-                            
-                            # Para técnico, atualizar DH_FINAL com arrival + service
-                            if tipo == 'tecnico':
-                                linha = linha.copy()
-                                linha['DH_FINAL'] = datetime.fromtimestamp(arrival_ts + service_ts)
-                            
-                            # Para comercial, calcular prazo_verificado (tempo até execução em dias)
-                            if tipo == 'comercial':
-                                prazo_regulatorio = (linha['DATA_VENC'] - linha['DATA_SOL']).total_seconds() / (3600 * 24)  # Dias
-                                prazo_verificado = (datetime.fromtimestamp(arrival_ts) - linha['DATA_SOL']).total_seconds() / (3600 * 24)
-                                penal = calcular_penalizacao(linha, tipo, prazo_verificado, prazo_regulatorio)
-                            else:
-                                penal = calcular_penalizacao(linha, tipo)
-                            
-                            custo += penal
+            # Adicionar penalizações personalizadas (todas as etapas de uma vez)
+            steps = [step for route in resposta['routes'] for step in route['steps']
+                     if step.get('type') == 'job']
+            if steps:
+                penal = penalizacoes_lote(
+                    self._tabela,
+                    [step['job'] for step in steps],
+                    [step['arrival'] for step in steps],
+                    [step['service'] for step in steps],
+                )
+                custo = sum(penal.tolist(), custo)  # soma na ordem das etapas
             return custo
         return float('inf')
     
-    def gerar_vizinho(self, solucao):
-        # Modificar ordem de jobs ou time windows (simplificado)
-        nova_solucao = copy.deepcopy(solucao)
+    def gerar_vizinho(self, perm):
+        # Modificar ordem de jobs (simplificado): nova permutação, a original não muda
+        nova = perm.copy()
         # Exemplo: trocar dois jobs
-        if len(nova_solucao['jobs']) > 1:
-            i, j = random.sample(range(len(nova_solucao['jobs'])), 2)
-            nova_solucao['jobs'][i], nova_solucao['jobs'][j] = nova_solucao['jobs'][j], nova_solucao['jobs'][i]
-        return nova_solucao
+        if len(nova) > 1:
+            i, j = random.sample(range(len(nova)), 2)
+            nova[i], nova[j] = nova[j], nova[i]
+        return nova
     
     def otimizacao_hibrida(self):
         # Inicialização com ACO (feromônios simples)
-        feromonios = {job['id']: 1.0 for job in self.vroom_input['jobs']}
+        feromonios = {job['id']: 1.0 for job in self._jobs}
         
-        # GA: População inicial
-        populacao = [copy.deepcopy(self.vroom_input) for _ in range(10)]
+        # GA: População inicial (todos partem da ordem original; indivíduos são imutáveis)
+        inicial = np.arange(len(self._jobs), dtype=np.int32)
+        populacao = [inicial] * 10
         
         for _ in range(self.num_iter):
             # Avaliar população
@@ -327,13 +434,14 @@ class MetaHeuristica:
             melhor_idx = np.argmin(custos)
             if custos[melhor_idx] < self.melhor_custo:
                 self.melhor_custo = custos[melhor_idx]
-                self.melhor_solucao = populacao[melhor_idx]
+                self.melhor_permutacao = populacao[melhor_idx]
             
             # SA: Aceitar vizinhos
             for ind in populacao:
                 vizinho = self.gerar_vizinho(ind)
                 custo_viz = self.avaliar_solucao(vizinho)
-                if custo_viz < self.avaliar_solucao(ind) or random.random() < math.exp((self.avaliar_solucao(ind) - custo_viz) / 100):  # Temperatura simplificada
+                custo_ind = self.avaliar_solucao(ind)
+                if custo_viz < custo_ind or random.random() < math.exp((custo_ind - custo_viz) / 100):  # Temperatura simplificada
                     ind = vizinho
             
             # ACO: Atualizar feromônios (simplificado)
@@ -345,12 +453,14 @@ class MetaHeuristica:
             nova_pop = []
             for _ in range(len(populacao)):
                 pai1, pai2 = random.sample(populacao, 2)
-                filho = pai1.copy()  # Cruzamento simples
+                filho = pai1  # Cruzamento simples (gerar_vizinho não altera o pai)
                 if random.random() < 0.1:  # Mutação
                     filho = self.gerar_vizinho(filho)
                 nova_pop.append(filho)
             populacao = nova_pop
         
+        if self.melhor_permutacao is not None:
+            self.melhor_solucao = self.payload(self.melhor_permutacao)
         return self.melhor_solucao
 
 # Loop principal: para cada equipe, para cada data
@@ -371,6 +481,8 @@ for idx, equipe in df_equipes.iterrows():
     # Usar metaheurística para otimizar
     meta = MetaHeuristica(vroom_input, tecnicos, comerciais, job_id_to_numos, num_iter=50)
     melhor_input = meta.otimizacao_hibrida()
+    print(f"Equipe {equipe['equipe']}: {meta.chamadas_vroom} chamadas ao VROOM, "
+          f"{meta.chamadas_evitadas} evitadas pelo cache de avaliações")
     
     # Obter solução final
     solucao = chamar_vroom(melhor_input)
@@ -0,0 +1,78 @@
+# v2/async_http.py
+"""
+Base dos clientes assíncronos (VROOM/OSRM) sobre httpx.AsyncClient.
+
+Um único AsyncClient (pool de conexões keep-alive) é compartilhado pelas
+requisições do cliente e um asyncio.BoundedSemaphore limita quantas ficam em
+voo ao mesmo tempo, para que fan-outs (problemas VROOM independentes,
+snapping de bases) sobreponham a espera de rede sem sobrecarregar
+os serviços. httpx é dependência opcional, exigida só ao usar estes clientes.
+
+Uso:
+    async with AsyncVroomClient(max_concorrencia=4) as vc:
+        respostas = await asyncio.gather(*(vc.route_multi(v, j) for v, j in problemas))
+"""
+import asyncio
+from contextlib import nullcontext
+from typing import Optional
+
+try:  # dependência opcional
+    import httpx
+except ImportError:  # pragma: no cover - depende do ambiente
+    httpx = None
+
+
+def exigir_httpx():
+    if httpx is None:
+        raise ImportError("httpx é necessário para os clientes assíncronos (pip install httpx)")
+    return httpx
+
+
+class ClienteAssincrono:
+    """AsyncClient compartilhado + semáforo de requisições simultâneas."""
+
+    def __init__(self, timeout: float = 30, max_concorrencia: int = 4, client=None):
+        if client is None:
+            exigir_httpx()
+        self.timeout = timeout
+        self.max_concorrencia = max(int(max_concorrencia), 1)
+        self._client = client
+        self._client_proprio = client is None
+        self._sem: Optional[asyncio.BoundedSemaphore] = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_concorrencia),
+            )
+        return self._client
+
+    @property
+    def semaforo(self) -> asyncio.BoundedSemaphore:
+        # criado no loop em uso (não no __init__, que pode rodar fora dele)
+        if self._sem is None:
+            self._sem = asyncio.BoundedSemaphore(self.max_concorrencia)
+        return self._sem
+
+    def _limites(self):
+        """Limites adquiridos por requisição além do semáforo da instância."""
+        return nullcontext()
+
+    async def _request(self, method: str, url: str, **kwargs):
+        async with self.semaforo, self._limites():
+            resp = await self.client.request(method, url, **kwargs)
+        resp.raise_for_status()
+        return resp.json()
+
+    async def aclose(self) -> None:
+        if self._client is not None and self._client_proprio:
+            await self._client.aclose()
+        self._client = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
@@ -0,0 +1,112 @@
+# v2/backlog.py
+"""
+Backlog de pendências (técnicas + comerciais) sobre frames somente-leitura.
+
+Em vez de filtrar/copiar os DataFrames a cada atribuição, mantém uma máscara
+booleana de "ainda pendente" por frame. Os frames de origem nunca são
+alterados, então podem ser visões zero-copy de um arquivo Arrow mapeado em
+memória (ver v2.shared_backlog) e compartilhados entre processos; só as
+linhas elegíveis de cada grupo são materializadas.
+"""
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class _Parte:
+    __slots__ = ("df", "numos", "datasol", "dt_ref", "pendente")
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        n = len(df)
+        if "numos" in df.columns:
+            self.numos = df["numos"].to_numpy(dtype=np.int64)
+        else:
+            self.numos = np.zeros(n, dtype=np.int64)
+        self.datasol = pd.to_datetime(df["datasol"], errors="coerce").to_numpy() if n else np.array([], "datetime64[ns]")
+        if "dt_ref" in df.columns and n:
+            self.dt_ref = pd.to_datetime(df["dt_ref"], errors="coerce").dt.normalize().to_numpy()
+        else:
+            self.dt_ref = np.full(n, np.datetime64("NaT"), dtype="datetime64[ns]")
+        self.pendente = np.ones(n, dtype=bool)
+
+    def mascara(self, ate: pd.Timestamp) -> np.ndarray:
+        """Pendentes com datasol <= ate (NaT nunca é elegível)."""
+        return self.pendente & (self.datasol <= np.datetime64(pd.Timestamp(ate)))
+
+
+class Backlog:
+    """
+    Pendências técnicas/comerciais com controle de atendimento por máscara.
+
+    - elegiveis(ate): pendências com datasol <= ate (DataFrame materializado)
+    - chegadas(de, ate): pendências que chegam em (de, ate], em ordem
+    - remover(numos): marca as OS como atendidas
+    - contar(ate, dia): contagens novas/backlog por tipo (para logs)
+    """
+
+    def __init__(self, df_te: pd.DataFrame, df_co: pd.DataFrame):
+        self.tec = _Parte(df_te)
+        self.com = _Parte(df_co)
+
+    def _partes(self):
+        return (self.tec, self.com)
+
+    def indices_elegiveis(self, ate: pd.Timestamp) -> Tuple[np.ndarray, np.ndarray]:
+        """Posições (iloc) elegíveis em cada frame, sem materializar linhas."""
+        return tuple(np.flatnonzero(p.mascara(ate)) for p in self._partes())
+
+    def elegiveis(self, ate: pd.Timestamp) -> pd.DataFrame:
+        parts = [
+            p.df.iloc[idx]
+            for p, idx in zip(self._partes(), self.indices_elegiveis(ate))
+            if len(idx)
+        ]
+        if not parts:
+            return pd.DataFrame()
+        return pd.concat(parts, ignore_index=True)
+
+    def chegadas(self, de: pd.Timestamp, ate: pd.Timestamp) -> pd.DataFrame:
+        """Pendências com de < datasol <= ate, em ordem de datasol (eventos de chegada)."""
+        de = np.datetime64(pd.Timestamp(de))
+        parts = [
+            p.df.iloc[np.flatnonzero(p.mascara(ate) & (p.datasol > de))]
+            for p in self._partes()
+        ]
+        parts = [df for df in parts if len(df)]
+        if not parts:
+            return pd.DataFrame()
+        df = pd.concat(parts, ignore_index=True)
+        return df.sort_values("datasol", kind="stable", ignore_index=True)
+
+    def remover(self, numos: Iterable) -> None:
+        ids = np.fromiter((int(n) for n in numos), dtype=np.int64)
+        if ids.size == 0:
+            return
+        for p in self._partes():
+            if len(p.numos):
+                p.pendente &= ~np.isin(p.numos, ids)
+
+    def contar(self, ate: pd.Timestamp, dia: pd.Timestamp = None) -> Dict[str, int]:
+        """
+        Contagens de pendências elegíveis em `ate`:
+        tec/com (total) e, se `dia` for dado, tec_new/com_new (dt_ref == dia)
+        e tec_backlog/com_backlog (dt_ref < dia).
+        """
+        out: Dict[str, int] = {}
+        for nome, p in (("tec", self.tec), ("com", self.com)):
+            m = p.mascara(ate)
+            out[nome] = int(m.sum())
+            if dia is not None:
+                d = np.datetime64(pd.Timestamp(dia))
+                out[f"{nome}_new"] = int((m & (p.dt_ref == d)).sum())
+                out[f"{nome}_backlog"] = int((m & (p.dt_ref < d)).sum())
+        return out
+
+    def total_pendente(self) -> int:
+        return int(sum(p.pendente.sum() for p in self._partes()))
+
+    def pendentes(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Frames (técnico, comercial) só com as OS ainda não atendidas."""
+        return tuple(p.df[p.pendente] for p in self._partes())
@@ -0,0 +1,183 @@
+# v2/cache.py
+"""
+Cache do dataset normalizado dos loaders (pendências/equipes).
+
+O resultado de _prep_tecnicos/_prep_comercial/prepare_equipes_v3 é gravado em
+Arrow IPC (formato "file", sem compressão → pode ser aberto via memory-map) e
+reaproveitado enquanto os parquets de origem não mudarem. A chave combina:
+- nome lógico do frame (ex.: pend_tec)
+- parâmetros do loader (ex.: janela de datas)
+- mtime/tamanho de cada arquivo de origem
+- CACHE_VERSION (incrementar ao mudar a normalização)
+"""
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from v2 import config
+
+
+# Incrementar quando o layout/tipos do dataset normalizado mudarem
+CACHE_VERSION = 5
+
+
+def _find_source(name: str) -> Optional[Path]:
+    from v2.data_loader import DATA_DIRS
+
+    for base in DATA_DIRS:
+        p = base / name
+        if p.exists():
+            return p
+    return None
+
+
+def _params_tag(params: dict) -> str:
+    parts = []
+    for k in sorted(params):
+        v = params[k]
+        if v is None:
+            continue
+        if hasattr(v, "isoformat"):
+            v = pd.Timestamp(v).date().isoformat()
+        parts.append(f"{k}={v}")
+    return "_".join(parts) or "all"
+
+
+def cache_key(sources: Sequence[str], **params) -> str:
+    """Hash curto dos arquivos de origem (caminho, mtime, tamanho) e parâmetros."""
+    stats = []
+    for name in sources:
+        p = _find_source(name)
+        if p is None:
+            stats.append([name, None, None])
+            continue
+        st = p.stat()
+        stats.append([str(p.resolve()), st.st_mtime_ns, st.st_size])
+    raw = json.dumps(
+        {"v": CACHE_VERSION, "src": stats, "params": _params_tag(params)},
+        sort_keys=True,
+    )
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+# Metadado de campo: colunas datetime64 gravadas como int64 (NaT = int64 mínimo),
+# para que a leitura via memory-map seja zero-copy mesmo com NaT.
+_DT_META = b"pandas_datetime"
+
+
+def _to_arrow(df: pd.DataFrame) -> pa.Table:
+    """
+    Converte o frame normalizado para Arrow de forma "mmap-friendly":
+    floats mantêm NaN como valor (sem bitmap de nulos) e datetimes viram int64,
+    ambos lidos depois sem cópia.
+    """
+    arrays, fields = [], []
+    for c in df.columns:
+        s = df[c]
+        meta = None
+        if pd.api.types.is_float_dtype(s.dtype):
+            arr = pa.array(s.to_numpy(), from_pandas=False)
+        elif pd.api.types.is_datetime64_dtype(s.dtype):
+            values = s.to_numpy()
+            arr = pa.array(values.view(np.int64), type=pa.int64())
+            meta = {_DT_META: str(values.dtype).encode()}
+        else:
+            arr = pa.array(s, from_pandas=True)
+        arrays.append(arr)
+        fields.append(pa.field(str(c), arr.type, metadata=meta))
+
+    metadata = {}
+    if df.attrs:
+        metadata[b"pandas_attrs"] = json.dumps(df.attrs).encode("utf-8")
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields, metadata=metadata or None))
+
+
+def _from_arrow(table: pa.Table) -> pd.DataFrame:
+    """Inverso de _to_arrow; colunas numéricas/datetime apontam para o buffer Arrow."""
+    cols = {}
+    for field, col in zip(table.schema, table.columns):
+        meta = field.metadata or {}
+        if _DT_META in meta:
+            values = col.to_numpy() if col.num_chunks == 1 else np.concatenate([c.to_numpy() for c in col.chunks])
+            cols[field.name] = values.view(meta[_DT_META].decode())
+        elif pa.types.is_integer(field.type) or pa.types.is_floating(field.type):
+            cols[field.name] = col.to_numpy()
+        else:
+            cols[field.name] = col.to_pandas()
+    df = pd.DataFrame(cols, copy=False)
+    raw_attrs = (table.schema.metadata or {}).get(b"pandas_attrs")
+    if raw_attrs:
+        df.attrs.update(json.loads(raw_attrs))
+    return df
+
+
+def write_ipc(df: pd.DataFrame, path: Path) -> None:
+    """
+    Grava um DataFrame em Arrow IPC (escrita atômica via arquivo temporário).
+    O temporário tem nome único, então processos que reconstroem a mesma
+    chave ao mesmo tempo (ex.: workers do sweep) não escrevem no mesmo
+    arquivo; o último os.replace vence e os leitores nunca veem arquivo parcial.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    table = _to_arrow(df)
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f"{path.name}.", suffix=".tmp", delete=False) as f:
+        tmp = Path(f.name)
+    try:
+        with pa.OSFile(str(tmp), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def read_ipc(path: Path) -> pd.DataFrame:
+    """
+    Lê um arquivo Arrow IPC via memory-map. Colunas numéricas e datetime são
+    visões somente-leitura das páginas do arquivo (compartilhadas entre processos
+    pelo page cache do SO); texto/categóricas são materializadas.
+    """
+    source = pa.memory_map(str(path), "r")
+    table = pa.ipc.open_file(source).read_all()
+    return _from_arrow(table)
+
+
+def cached_frame(
+    name: str,
+    sources: Sequence[str],
+    builder: Callable[[], pd.DataFrame],
+    usar_cache: bool = True,
+    cache_dir: Optional[Path] = None,
+    **params,
+) -> pd.DataFrame:
+    """
+    Retorna o frame normalizado `name`, do cache se válido; senão chama `builder`
+    e grava o resultado. Versões antigas do mesmo frame/parâmetros são removidas.
+    """
+    if not usar_cache:
+        return builder()
+
+    cache_dir = Path(cache_dir or config.CACHE_DIR)
+    prefix = f"{name}-{_params_tag(params)}"
+    path = cache_dir / f"{prefix}-{cache_key(sources, **params)}.arrow"
+
+    if path.exists():
+        try:
+            return read_ipc(path)
+        except Exception:
+            path.unlink(missing_ok=True)
+
+    df = builder()
+    for old in cache_dir.glob(f"{prefix}-*.arrow"):
+        if old != path:
+            old.unlink(missing_ok=True)
+    write_ipc(df, path)
+    return df
@@ -1,3 +1,7 @@
+import os
+from dataclasses import dataclass, fields, replace
+from typing import Any, ClassVar, Dict, Mapping, Optional
+
 # Coordenada fixa da base (lon, lat) — Porto Velho
 BASE_LON = -63.885464691387746
 BASE_LAT = -8.738508095069408
@@ -8,3 +12,98 @@ FORCE_FIXED_BASE = True
 # Endpoints locais (ajuste se necessário)
 VROOM_URL = "http://localhost:3000"       # vroom-docker
 OSRM_URL  = "http://localhost:5000"       # osrm-backend
+
+# Cache do dataset normalizado (Arrow IPC) gerado pelos loaders
+CACHE_DIR = "data/cache"
+
+
+# === CONFIGURAÇÃO EM TEMPO DE EXECUÇÃO ===
+# As constantes acima são os valores padrão. Para rodar simulações com limites
+# diferentes no mesmo processo (sweep, serviço), use um objeto de configuração
+# em vez de alterar o módulo:
+#     cfg = RuntimeConfig.carregar("conf/rotas.yml", vroom_url="http://vroom:3000")
+# Precedência: padrão < arquivo YAML < variáveis de ambiente (ROTAS_*) < argumentos.
+
+_VERDADEIRO = {"1", "true", "t", "sim", "s", "yes", "y", "on"}
+
+
+def _converter(valor: Any, padrao: Any) -> Any:
+    """Converte `valor` (texto do ambiente/YAML) para o tipo do valor padrão."""
+    if isinstance(padrao, bool):
+        if isinstance(valor, str):
+            return valor.strip().lower() in _VERDADEIRO
+        return bool(valor)
+    if isinstance(padrao, int):
+        return int(valor)
+    if isinstance(padrao, float):
+        return float(valor)
+    return str(valor)
+
+
+@dataclass(frozen=True)
+class RuntimeConfig:
+    """Configuração de serviços (VROOM/OSRM), base e cache."""
+
+    base_lon: float = BASE_LON
+    base_lat: float = BASE_LAT
+    force_fixed_base: bool = FORCE_FIXED_BASE
+    vroom_url: str = VROOM_URL
+    osrm_url: str = OSRM_URL
+    cache_dir: str = CACHE_DIR
+
+    ENV_PREFIX: ClassVar[str] = "ROTAS_"
+
+    @classmethod
+    def _campos(cls) -> Dict[str, Any]:
+        return {f.name: f.default for f in fields(cls)}
+
+    @classmethod
+    def _normalizar(cls, valores: Mapping[str, Any], origem: str) -> Dict[str, Any]:
+        campos = cls._campos()
+        out: Dict[str, Any] = {}
+        for chave, valor in valores.items():
+            nome = str(chave).strip().lower().replace("-", "_")
+            if nome not in campos:
+                raise ValueError(f"Parâmetro desconhecido em {origem}: {chave}")
+            if valor is None:
+                continue
+            out[nome] = _converter(valor, campos[nome])
+        return out
+
+    @classmethod
+    def do_yaml(cls, caminho) -> Dict[str, Any]:
+        """Lê um YAML plano (chave: valor; nomes em maiúsculas ou minúsculas)."""
+        try:
+            import yaml
+        except ImportError as e:
+            raise ImportError("PyYAML é necessário para ler a configuração em YAML (pip install pyyaml)") from e
+        with open(caminho, "r", encoding="utf-8") as fh:
+            dados = yaml.safe_load(fh) or {}
+        if not isinstance(dados, dict):
+            raise ValueError(f"Configuração inválida em {caminho}: esperado um mapeamento")
+        return cls._normalizar(dados, str(caminho))
+
+    @classmethod
+    def do_ambiente(cls, env: Optional[Mapping[str, str]] = None) -> Dict[str, Any]:
+        """Valores definidos em variáveis ROTAS_<PARAMETRO> (ex.: ROTAS_VROOM_URL)."""
+        env = os.environ if env is None else env
+        valores = {
+            nome: env[cls.ENV_PREFIX + nome.upper()]
+            for nome in cls._campos()
+            if cls.ENV_PREFIX + nome.upper() in env
+        }
+        return cls._normalizar(valores, "ambiente")
+
+    @classmethod
+    def carregar(cls, arquivo=None, env: Optional[Mapping[str, str]] = None, **overrides):
+        """Monta a configuração: padrão < `arquivo` YAML < ambiente < `overrides` (None = não informado)."""
+        valores: Dict[str, Any] = {}
+        if arquivo:
+            valores.update(cls.do_yaml(arquivo))
+        valores.update(cls.do_ambiente(env))
+        valores.update(cls._normalizar(overrides, "argumentos"))
+        return cls(**valores)
+
+    def com(self, **overrides):
+        """Cópia com os parâmetros informados alterados (None = mantém)."""
+        return replace(self, **self._normalizar(overrides, "argumentos"))
@@ -0,0 +1,78 @@
+# v2/custo_regulatorio.py
+"""
+Modelo de custo regulatório (compensações) vetorizado sobre um pool de OS.
+
+Fórmulas de utils/roteirizacao.calcular_penalizacao, aplicadas ao layout
+normalizado do V3/V4 (tipo_serv, datasol, dataven, EUSD):
+- técnico: duração da interrupção (datasol → conclusão, em horas) × EUSD/730 × 34
+- comercial: 120 + 34 × EUSD × log(prazo verificado / prazo regulatório),
+  devida só quando a conclusão passa do vencimento (prazos em dias desde datasol)
+
+`penalidade_evitada` compara a conclusão prevista com um adiamento (padrão:
+1 dia, a OS fica para o dia seguinte) e dá, por OS, quanto se deixa de pagar
+atendendo agora. É o valor usado pelo pré-filtro do V4 com
+objetivo="penalidade" e, quantizado (v2.vroom_payload.quantizar_prioridade),
+como `priority` dos jobs no VROOM.
+"""
+import numpy as np
+import pandas as pd
+
+HORAS_MES = 730            # EUSD mensal → por hora
+FATOR_COMPENSACAO = 34
+BASE_COMERCIAL = 120       # compensação mínima por prazo comercial violado
+
+ADIAMENTO_PADRAO = pd.Timedelta(days=1)
+
+_HORA = np.timedelta64(3600, "s")
+_DIA = np.timedelta64(86400, "s")
+
+
+def _datas(df: pd.DataFrame, col: str) -> np.ndarray:
+    if col not in df.columns:
+        return np.full(len(df), np.datetime64("NaT"), dtype="datetime64[ns]")
+    return pd.to_datetime(df[col], errors="coerce").to_numpy(dtype="datetime64[ns]")
+
+
+def eusd(df: pd.DataFrame) -> np.ndarray:
+    """EUSD por OS (EUSD, eusd ou EUSD_FIO_B; ausente/inválido → 0)."""
+    for col in ("EUSD", "eusd", "EUSD_FIO_B"):
+        if col in df.columns:
+            valores = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+            return np.where(np.isfinite(valores), valores, 0.0)
+    return np.zeros(len(df))
+
+
+def _instantes(conclusao, n: int) -> np.ndarray:
+    if np.ndim(conclusao) == 0:
+        return np.full(n, np.datetime64(pd.Timestamp(conclusao), "ns"))
+    return pd.to_datetime(pd.Series(conclusao), errors="coerce").to_numpy(dtype="datetime64[ns]")
+
+
+def penalidade(df: pd.DataFrame, conclusao) -> np.ndarray:
+    """
+    Compensação devida por OS de `df` se concluída em `conclusao` (instante
+    único ou um por OS). Sem datasol (ou sem conclusão) → 0.
+    """
+    n = len(df)
+    fim = _instantes(conclusao, n)
+    sol = _datas(df, "datasol")
+    valor = eusd(df)
+    comercial = (df["tipo_serv"] == "comercial").to_numpy(dtype=bool, na_value=False) if n else np.zeros(0, bool)
+
+    horas = np.maximum((fim - sol) / _HORA, 0.0)
+    tecnico = np.nan_to_num(horas) * (valor / HORAS_MES) * FATOR_COMPENSACAO
+
+    regulatorio = (_datas(df, "dataven") - sol) / _DIA
+    verificado = (fim - sol) / _DIA
+    with np.errstate(divide="ignore", invalid="ignore"):
+        violado = (regulatorio > 0) & (verificado > regulatorio)
+        razao = np.where(violado, verificado / regulatorio, 1.0)
+        comercial_v = np.where(violado, BASE_COMERCIAL + FATOR_COMPENSACAO * valor * np.log(razao), 0.0)
+
+    return np.where(comercial, comercial_v, tecnico)
+
+
+def penalidade_evitada(df: pd.DataFrame, conclusao, adiamento: pd.Timedelta = ADIAMENTO_PADRAO) -> np.ndarray:
+    """Compensação que se deixa de pagar concluindo em `conclusao` em vez de `conclusao + adiamento`."""
+    fim = _instantes(conclusao, len(df))
+    return penalidade(df, fim + np.timedelta64(pd.Timedelta(adiamento))) - penalidade(df, fim)
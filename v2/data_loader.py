@@ -1,20 +1,206 @@
 # v2/data_loader.py
+import hashlib
+from datetime import date, datetime
 from pathlib import Path
-from typing import Sequence
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 
 # Diretórios padrão para busca dos .parquet
 DATA_DIRS: Sequence[Path] = (Path("data"), Path("/data"), Path("."))
 
-
-def _read_parquet_any(name: str) -> pd.DataFrame:
+# Colunas de origem efetivamente usadas por _prep_tecnicos/_prep_comercial
+# (nomes em minúsculo; a projeção ignora as que não existirem no arquivo).
+TEC_COLUMNS = [
+    "numos", "dh_inicio", "datasol", "dh_final", "datater_trab",
+    "latitude", "longitude", "te", "td", "eusd", "eusd_fio_b",
+]
+COM_COLUMNS = [
+    "numos", "data_sol", "datasol", "data_venc", "data_vencimento", "dataven",
+    "datatertrab", "datater_trab", "latitude", "longitude", "te", "td",
+    "eusd", "eusd_fio_b",
+]
+
+# Tipos compactos do layout normalizado
+TIPO_SERV_DTYPE = pd.CategoricalDtype(["técnico", "comercial"])
+COORD_DTYPE = np.float32  # ~0,5 m de resolução em lon/lat
+TEMPO_DTYPE = np.float32  # TE/TD em minutos
+
+# numos que usam o próprio valor como id int64: inteiro não negativo em forma
+# canônica (sem sinal, zeros à esquerda ou casas decimais) que cabe em int64.
+# Os demais vão para a tabela lateral id -> texto (df.attrs["numos_side"]).
+_NUMOS_CANONICO = r"0|[1-9][0-9]{0,17}"
+
+# Coluna de data de solicitação (alternativas) usada no filtro por janela
+TEC_DATE_COLS = ("dh_inicio", "datasol")
+COM_DATE_COLS = ("data_sol", "datasol")
+
+# Filtro no formato (coluna, operador, valor); a coluna pode ser uma tupla de
+# alternativas — usa a primeira existente no arquivo (case-insensitive).
+Filter = Tuple[Union[str, Tuple[str, ...]], str, Any]
+
+
+def _filter_value(value: Any, arrow_type: pa.DataType) -> Any:
+    """Adapta o valor do filtro ao tipo físico da coluna no parquet."""
+    if pa.types.is_timestamp(arrow_type):
+        ts = pd.Timestamp(value)
+        if arrow_type.tz is not None and ts.tzinfo is None:
+            ts = ts.tz_localize(arrow_type.tz)  # janela no fuso da própria coluna
+        return ts.to_pydatetime()
+    if pa.types.is_date(arrow_type):
+        return pd.Timestamp(value).date()
+    return value
+
+
+def _pushdown(value: Any, arrow_type: pa.DataType) -> bool:
+    """
+    Só empurra para o parquet filtros de data sobre colunas timestamp/date:
+    em colunas texto a comparação seria lexicográfica (errada fora do ISO),
+    então a janela fica para depois da conversão (_filtrar_janela).
+    """
+    if isinstance(value, (pd.Timestamp, datetime, date)):
+        return pa.types.is_timestamp(arrow_type) or pa.types.is_date(arrow_type)
+    return True
+
+
+def _resolve_filters(filters: Optional[Sequence[Filter]], schema: pa.Schema) -> Optional[List[tuple]]:
+    if not filters:
+        return None
+    by_lower = {n.lower(): n for n in schema.names}
+    out = []
+    for col, op, value in filters:
+        alternativas = (col,) if isinstance(col, str) else tuple(col)
+        real = next((by_lower[c.lower()] for c in alternativas if c.lower() in by_lower), None)
+        if real is None or not _pushdown(value, schema.field(real).type):
+            continue
+        out.append((real, op, _filter_value(value, schema.field(real).type)))
+    return out or None
+
+
+def _window_filters(date_cols: Tuple[str, ...], data_ini=None, data_fim=None) -> List[Filter]:
+    """Filtros [data_ini, data_fim] (dias inteiros, fim inclusivo) sobre a coluna de data."""
+    filters: List[Filter] = []
+    if data_ini is not None:
+        filters.append((date_cols, ">=", pd.Timestamp(data_ini).normalize()))
+    if data_fim is not None:
+        filters.append((date_cols, "<", pd.Timestamp(data_fim).normalize() + pd.Timedelta(days=1)))
+    return filters
+
+
+def _filtrar_janela(df: pd.DataFrame, col: str, data_ini=None, data_fim=None) -> pd.DataFrame:
+    """
+    Mesma janela de _window_filters sobre `col` já convertida para datetime
+    (vale também quando o filtro não pôde ir para o parquet); NaT fica fora.
+    """
+    if data_ini is None and data_fim is None:
+        return df
+    datas = df[col]
+    tz = getattr(datas.dt, "tz", None)
+    manter = pd.Series(True, index=df.index)
+    for op, valor in ((">=", data_ini), ("<", data_fim)):
+        if valor is None:
+            continue
+        limite = pd.Timestamp(valor).normalize() + (pd.Timedelta(days=1) if op == "<" else pd.Timedelta(0))
+        if tz is not None:
+            limite = limite.tz_localize(tz)
+        manter &= (datas >= limite) if op == ">=" else (datas < limite)
+    return df[manter.to_numpy()]
+
+
+def _replace_inf_numeric(df: pd.DataFrame) -> pd.DataFrame:
+    """Converte inf/-inf para NA apenas nas colunas de ponto flutuante."""
+    for c in df.columns:
+        if pd.api.types.is_float_dtype(df[c].dtype):
+            values = df[c].to_numpy()
+            mask = np.isinf(values)
+            if mask.any():
+                df[c] = df[c].mask(mask)
+    return df
+
+
+def _numos_hash_id(valor: str) -> int:
+    """Id int64 negativo e estável (entre processos) para um numos não numérico."""
+    digest = hashlib.sha1(valor.encode("utf-8")).digest()
+    return -(int.from_bytes(digest[:8], "big") >> 1) - 1
+
+
+def _encode_numos(s: pd.Series) -> Tuple[np.ndarray, Dict[int, str]]:
+    """
+    Converte numos para int64. Inteiros canônicos ("123", 123, 123.0) viram o
+    próprio número; os demais ("00123", "123.5", "A-17", nulos) recebem um id
+    negativo estável e entram na tabela lateral, então valores distintos nunca
+    colidem no mesmo id.
+    """
+    ids = np.zeros(len(s), dtype=np.int64)
+    if pd.api.types.is_integer_dtype(s.dtype):
+        inteiros = s.astype("Int64")
+        ok = (inteiros.notna() & (inteiros >= 0)).to_numpy(dtype=bool, na_value=False)
+        ids[ok] = inteiros[ok].to_numpy(dtype=np.int64)
+    elif pd.api.types.is_float_dtype(s.dtype):
+        f = s.to_numpy(dtype=np.float64, na_value=np.nan)
+        with np.errstate(invalid="ignore"):
+            ok = np.isfinite(f) & (f >= 0) & (f == np.floor(f)) & (f < 1e18)
+        ids[ok] = f[ok].astype(np.int64)
+    else:
+        texto = s.astype("string")
+        ok = texto.str.fullmatch(_NUMOS_CANONICO).to_numpy(dtype=bool, na_value=False)
+        ids[ok] = texto[ok].astype("int64").to_numpy()
+
+    side: Dict[int, str] = {}
+    for pos in np.flatnonzero(~ok):
+        valor = str(s.iloc[pos])
+        ids[pos] = _numos_hash_id(valor)
+        side[int(ids[pos])] = valor
+    return ids, side
+
+
+def tabela_numos(*frames: pd.DataFrame) -> Dict[int, str]:
+    """Tabela lateral id -> numos original dos frames normalizados (df.attrs["numos_side"])."""
+    side: Dict[int, str] = {}
+    for df in frames:
+        side.update({int(k): v for k, v in (df.attrs.get("numos_side") or {}).items()})
+    return side
+
+
+def numos_original(ids, side: Dict[int, str]) -> List[str]:
+    """Converte ids int64 de volta para o numos original (texto), via tabela lateral `side`."""
+    return [side.get(int(i), str(int(i))) for i in ids]
+
+
+def _compact_dtypes(df: pd.DataFrame, tipo: str) -> pd.DataFrame:
+    """Aplica o layout compacto comum a técnicos e comerciais."""
+    ids, side = _encode_numos(df["numos"])
+    df["numos"] = ids
+    if side:
+        df.attrs["numos_side"] = {str(k): v for k, v in side.items()}
+    codigo = TIPO_SERV_DTYPE.categories.get_loc(tipo)
+    df["tipo_serv"] = pd.Categorical.from_codes(np.full(len(df), codigo, dtype=np.int8), dtype=TIPO_SERV_DTYPE)
+    for c in ("latitude", "longitude"):
+        df[c] = pd.to_numeric(df[c], errors="coerce").astype(COORD_DTYPE)
+    for c in ("TE", "TD"):
+        df[c] = df[c].astype(TEMPO_DTYPE)
+    for c in ("EUSD", "EUSD_FIO_B"):
+        df[c] = pd.to_numeric(df[c], errors="coerce").astype(np.float64)
+    return df
+
+
+def _read_parquet_any(
+    name: str,
+    columns: Optional[Sequence[str]] = None,
+    filters: Optional[Sequence[Filter]] = None,
+) -> pd.DataFrame:
     """
     Procura um arquivo parquet com o nome dado em data/, /data e .,
     carrega e normaliza valores infinitos para NA.
 
+    - columns: projeção (case-insensitive); colunas inexistentes são ignoradas.
+    - filters: predicados empurrados para o pyarrow (ver `Filter`), permitindo
+      ler só uma janela de datas sem materializar todo o histórico.
+
     Substitui o antigo uso de:
         with pd.option_context("mode.use_inf_as_na", True):
             pd.read_parquet(...)
@@ -23,18 +209,30 @@ def _read_parquet_any(name: str) -> pd.DataFrame:
     for base in DATA_DIRS:
         p = base / name
         if p.exists():
-            df = pd.read_parquet(p)
-            # converte inf/-inf para NA explicitamente
-            df.replace([np.inf, -np.inf], pd.NA, inplace=True)
-            return df
+            schema = pq.read_schema(p)
+            cols = None
+            if columns is not None:
+                by_lower = {n.lower(): n for n in schema.names}
+                cols = list(dict.fromkeys(by_lower[c.lower()] for c in columns if c.lower() in by_lower))
+            table = pq.read_table(p, columns=cols, filters=_resolve_filters(filters, schema))
+            # converte inf/-inf para NA explicitamente (só colunas numéricas)
+            return _replace_inf_numeric(table.to_pandas())
     raise FileNotFoundError(f"Não encontrei {name} em {', '.join(str(d) for d in DATA_DIRS)}")
 
 
-def _prep_tecnicos() -> pd.DataFrame:
+def _prep_tecnicos(data_ini=None, data_fim=None) -> pd.DataFrame:
     """
     Carrega e normaliza a base de serviços técnicos (atendTec.parquet) para o layout V3/V4.
+
+    data_fim (opcional) restringe a leitura às OS solicitadas até o fim da
+    janela. data_ini não corta nada: OS solicitadas antes da janela são o
+    backlog que a simulação herda no primeiro dia (e pontua pela idade).
     """
-    df = _read_parquet_any("atendTec.parquet").copy()
+    df = _read_parquet_any(
+        "atendTec.parquet",
+        columns=TEC_COLUMNS,
+        filters=_window_filters(TEC_DATE_COLS, data_fim=data_fim),
+    )
 
     # normaliza nomes de colunas
     df.columns = df.columns.str.lower()
@@ -64,15 +262,7 @@ def _prep_tecnicos() -> pd.DataFrame:
         df["datasol"] = pd.to_datetime(df.get("datasol"), errors="coerce")
 
     df["datater_trab"] = pd.to_datetime(df.get("datater_trab"), errors="coerce")
-
-    # TIPO: todos técnicos
-    df["tipo_serv"] = "técnico"
-
-    # numos como string consistente
-    if "numos" in df.columns:
-        df["numos"] = df["numos"].astype(str)
-    else:
-        df["numos"] = pd.NA
+    df = _filtrar_janela(df, "datasol", data_fim=data_fim)
 
     # TD/TE numéricos (minutos)
     df["TE"] = pd.to_numeric(df.get("te", df.get("TE", 0)), errors="coerce").fillna(0).astype(float)
@@ -108,14 +298,22 @@ def _prep_tecnicos() -> pd.DataFrame:
         if c not in df.columns:
             df[c] = pd.NA
 
-    return df[cols].copy()
+    df = df[cols].copy()
+    # TIPO: todos técnicos; numos int64, coordenadas/tempos float32
+    return _compact_dtypes(df, "técnico")
 
 
-def _prep_comercial() -> pd.DataFrame:
+def _prep_comercial(data_ini=None, data_fim=None) -> pd.DataFrame:
     """
     Carrega e normaliza a base de serviços comerciais (ServCom.parquet) para o layout V3/V4.
+
+    Janela como em _prep_tecnicos: só data_fim corta (o backlog anterior fica).
     """
-    df = _read_parquet_any("ServCom.parquet").copy()
+    df = _read_parquet_any(
+        "ServCom.parquet",
+        columns=COM_COLUMNS,
+        filters=_window_filters(COM_DATE_COLS, data_fim=data_fim),
+    )
 
     # normaliza nomes de colunas
     df.columns = df.columns.str.lower()
@@ -140,16 +338,10 @@ def _prep_comercial() -> pd.DataFrame:
     }
     df = df.rename(columns=rename_map)
 
-    df["tipo_serv"] = "comercial"
-
     df["datasol"] = pd.to_datetime(df.get("datasol"), errors="coerce")
     df["dataven"] = pd.to_datetime(df.get("dataven"), errors="coerce")
     df["datater_trab"] = pd.to_datetime(df.get("datater_trab"), errors="coerce")
-
-    if "numos" in df.columns:
-        df["numos"] = df["numos"].astype(str)
-    else:
-        df["numos"] = pd.NA
+    df = _filtrar_janela(df, "datasol", data_fim=data_fim)
 
     df["TE"] = pd.to_numeric(df.get("te", df.get("TE", 0)), errors="coerce").fillna(0).astype(float)
     df["TD"] = pd.to_numeric(df.get("td", df.get("TD", 0)), errors="coerce").fillna(0).astype(float)
@@ -182,4 +374,5 @@ def _prep_comercial() -> pd.DataFrame:
         if c not in df.columns:
             df[c] = pd.NA
 
-    return df[cols].copy()
\ No newline at end of file
+    df = df[cols].copy()
+    return _compact_dtypes(df, "comercial")
\ No newline at end of file
@@ -0,0 +1,366 @@
+# v2/despacho.py
+"""
+Despacho intradiário orientado a eventos.
+
+As rotas do dia (saída do VROOM por grupo de turno) ficam em memória como
+sequências de paradas por veículo, com tempos em segundos desde `origem`.
+Cada OS que chega durante o turno (datasol) é um evento:
+
+1. inserção mais barata: em cada rota ativa, testa as posições ainda não
+   executadas (depois da parada para onde o veículo já está indo), da de
+   menor acréscimo de deslocamento para a maior, e fica com a primeira que
+   respeita capacidade, fim do turno e prazos (OS no prazo continuam no
+   prazo). Só usa a matriz em cache (v2.matriz): um ponto novo por evento;
+2. se nenhuma inserção é viável, reotimiza no VROOM o que falta executar
+   das rotas ativas + a OS nova, cada veículo partindo de onde está; a
+   solução só é aceita se mantiver todas as OS já planejadas;
+3. senão a OS fica no backlog (próximo grupo/dia).
+
+resultado() devolve as atribuições do dia: rotas intocadas saem exatamente
+como vieram do VROOM; nas alteradas, as paradas a partir do ponto de
+alteração têm chegadas recalculadas (eta_source INSERCAO/REOTIMIZACAO) e
+os trechos da rota vêm da matriz.
+"""
+import bisect
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from v2.matriz import MatrizDeslocamento
+from v2.vroom_payload import jobs_payload, segundos_desde, service_seconds, vehicles_payload
+from v2.vroom_response import decodificar_rotas
+
+INSERCAO = "INSERCAO"
+REOTIMIZACAO = "REOTIMIZACAO"
+
+_EQUIPE_COLS = ["inicio_turno", "fim_turno", "dthpausa_ini", "dthpausa_fim", "dthaps_ini", "dthaps_fim_ajustado"]
+
+
+class _Rota:
+    """Paradas de um veículo (listas paralelas, em ordem de visita)."""
+
+    __slots__ = ("info", "base", "ini", "fim", "pausa", "cap", "retorno",
+                 "numos", "pos", "serv", "limite", "chegada", "eta", "alterada")
+
+    def __init__(self, info: Dict, base: int, ini: float, fim: float, pausa, cap: int):
+        self.info = info
+        self.base = base
+        self.ini, self.fim = ini, fim
+        self.pausa: Optional[Tuple[float, float]] = pausa
+        self.cap = cap
+        self.retorno = ini  # chegada de volta à base
+        self.numos: List[int] = []
+        self.pos: List[int] = []      # índice na matriz
+        self.serv: List[float] = []
+        self.limite: List[float] = []  # fim do serviço até (inf = sem prazo a respeitar)
+        self.chegada: List[float] = []
+        self.eta: List[str] = []
+        self.alterada: Optional[int] = None  # 1ª posição recalculada (None = rota original)
+
+    def partida(self, t: float) -> Tuple[int, float]:
+        """
+        (k, t0): primeira posição ainda alterável em `t` (o veículo já saiu
+        rumo às paradas < k) e o instante em que sai da parada k-1 (ou da base).
+        """
+        saidas = [self.ini] + [c + s for c, s in zip(self.chegada, self.serv)]
+        k = bisect.bisect_right(saidas, t, 0, len(self.pos))
+        return k, max(saidas[k], t)
+
+    def alterar(self, k: int, eta: str) -> None:
+        self.alterada = k if self.alterada is None else min(self.alterada, k)
+        self.eta[k:] = [eta] * (len(self.pos) - k)
+
+
+class DespachoIntradia:
+    """
+    Rotas do dia + eventos de chegada de OS (ver docstring do módulo).
+
+    - origem: instante zero dos tempos (início do primeiro turno do dia)
+    - matriz: MatrizDeslocamento compartilhada pelos eventos do dia
+    - vroom: cliente com route_multi (None = sem reotimização de fallback)
+    - capacidade: máximo de OS por equipe (capacity do V4)
+    """
+
+    def __init__(self, origem, matriz: MatrizDeslocamento, vroom=None, capacidade: int = 15):
+        self.origem = pd.Timestamp(origem)
+        self.matriz = matriz
+        self.vroom = vroom
+        self.capacidade = int(capacidade)
+        self.rotas: List[_Rota] = []
+        self._originais: List[pd.DataFrame] = []
+        self._novas: Dict[int, Dict] = {}
+        self.stats = {"eventos": 0, "insercoes": 0, "reotimizacoes": 0, "aguardando": 0, "tempo_s": 0.0}
+
+    def _s(self, instantes) -> np.ndarray:
+        return segundos_desde(instantes, self.origem)
+
+    # ---------------- rotas do VROOM ----------------
+    def adicionar_grupo(self, eq_group: pd.DataFrame, df_res: pd.DataFrame, base_lon, base_lat) -> None:
+        """Registra as equipes de um grupo (com ou sem OS atribuídas) e as rotas de `df_res`."""
+        n = len(eq_group)
+        sem_data = pd.Series(pd.NaT, index=eq_group.index)
+        ini = self._s(eq_group["inicio_turno"])
+        fim = self._s(eq_group["fim_turno"] if "fim_turno" in eq_group.columns else sem_data)
+        fim = np.where(np.isnan(fim), ini + 8 * 3600, fim)
+        p_ini = self._s(eq_group.get("dthpausa_ini", sem_data))
+        p_fim = self._s(eq_group.get("dthpausa_fim", sem_data))
+        bases = self.matriz.indices(list(zip(np.asarray(base_lon, dtype=float), np.asarray(base_lat, dtype=float))))
+
+        rotas: Dict[str, _Rota] = {}
+        for j, nome in enumerate(eq_group["nome"].astype(str).tolist()):
+            info = {"equipe": nome, "base_lon": float(base_lon[j]), "base_lat": float(base_lat[j])}
+            for col in _EQUIPE_COLS:
+                info[col] = pd.to_datetime(eq_group[col].iloc[j], errors="coerce") if col in eq_group.columns else pd.NaT
+            pausa = (p_ini[j], p_fim[j]) if np.isfinite(p_ini[j]) and np.isfinite(p_fim[j]) and p_fim[j] > p_ini[j] else None
+            rotas[nome] = _Rota(info, int(bases[j]), float(ini[j]), float(fim[j]), pausa, self.capacidade)
+
+        if df_res is not None and not df_res.empty:
+            self._originais.append(df_res)
+            df = df_res.sort_values(["equipe", "dth_chegada_estimada"], kind="stable")
+            pos = self.matriz.indices(list(zip(df["longitude"].to_numpy(float), df["latitude"].to_numpy(float))))
+            chegada = self._s(df["dth_chegada_estimada"])
+            serv = service_seconds(df["TE"]).astype(np.float64)
+            prazo = self._s(df["dataven"]) if "dataven" in df.columns else np.full(len(df), np.nan)
+            # só as OS hoje no prazo passam a ter o prazo como restrição
+            limite = np.where(np.isfinite(prazo) & (chegada + serv <= prazo), prazo, np.inf)
+            retorno = self._s(df["fim_turno_estimado"]) if "fim_turno_estimado" in df.columns else chegada + serv
+            for i, (nome, numos) in enumerate(zip(df["equipe"].astype(str).tolist(), df["numos"].tolist())):
+                r = rotas[nome]
+                r.numos.append(int(numos))
+                r.pos.append(int(pos[i]))
+                r.serv.append(float(serv[i]))
+                r.limite.append(float(limite[i]))
+                r.chegada.append(float(chegada[i]))
+                r.eta.append(str(df["eta_source"].iloc[i]) if "eta_source" in df.columns else "VROOM")
+                r.retorno = float(retorno[i]) if np.isfinite(retorno[i]) else r.retorno
+        self.rotas.extend(rotas.values())
+
+    # ---------------- agenda ----------------
+    def _agendar(self, r: _Rota, pos, serv, limite, k: int, t0: float, fim: float):
+        """
+        Chegadas em pos[k:] saindo em t0 da parada k-1 (ou da base), com a
+        pausa da equipe, e a chegada de volta à base; None se violar um
+        limite ou o `fim` do turno.
+
+        Aproximação: a pausa é sempre feita na parada anterior, antes da
+        perna de deslocamento (nunca no meio dela nem no destino). Se a perna
+        mais o serviço seguinte passariam do início da pausa, a equipe espera
+        até ele, pausa e só então sai; chegadas podem ficar um pouco mais
+        tarde do que com a pausa no caminho, o que é conservador para os limites.
+        """
+        dur = self.matriz.dur
+        atual = pos[k - 1] if k else r.base
+        c = t0
+        feita = r.pausa is None or t0 >= r.pausa[0]
+        chegadas = []
+        for j in range(k, len(pos)):
+            desl = dur[atual, pos[j]]
+            if not feita and c + desl + serv[j] > r.pausa[0]:
+                c = max(c, r.pausa[0]) + (r.pausa[1] - r.pausa[0])
+                feita = True
+            c += desl
+            if c + serv[j] > limite[j]:
+                return None
+            chegadas.append(c)
+            c += serv[j]
+            atual = pos[j]
+        desl = dur[atual, r.base]
+        if not feita and c + desl > r.pausa[0]:
+            c = max(c, r.pausa[0]) + (r.pausa[1] - r.pausa[0])
+        c += desl
+        if c > fim:
+            return None
+        return chegadas, c
+
+    def _inserir(self, x: int, serv_x: float, lim_x: float, t: float):
+        """Melhor inserção viável de x em `t`: (acréscimo, rota, posição, chegadas, retorno) ou None."""
+        dur = self.matriz.dur
+        melhor = None
+        for r in self.rotas:
+            if r.fim <= t or len(r.pos) >= r.cap:
+                continue
+            k, t0 = r.partida(t)
+            n = len(r.pos)
+            # limites efetivos: o que já está fora do plano (pela matriz) não veta a inserção
+            atual = self._agendar(r, r.pos, r.serv, [math.inf] * n, k, t0, math.inf)
+            lim = list(r.limite)
+            for j, c in enumerate(atual[0], k):
+                if c + r.serv[j] > lim[j]:
+                    lim[j] = math.inf
+            fim = max(r.fim, atual[1])
+
+            antes = np.asarray(([r.pos[k - 1]] if k else [r.base]) + r.pos[k:], dtype=np.int64)
+            depois = np.asarray(r.pos[k:] + [r.base], dtype=np.int64)
+            acrescimo = dur[antes, x] + dur[x, depois] - dur[antes, depois]
+            for p in np.argsort(acrescimo, kind="stable").tolist():
+                if melhor is not None and acrescimo[p] >= melhor[0]:
+                    break
+                i = k + p
+                agenda = self._agendar(
+                    r, r.pos[:i] + [x] + r.pos[i:], r.serv[:i] + [serv_x] + r.serv[i:],
+                    lim[:i] + [lim_x] + lim[i:], k, t0, fim,
+                )
+                if agenda is not None:
+                    melhor = (float(acrescimo[p]), r, i, agenda[0], agenda[1])
+                    break
+        return melhor
+
+    # ---------------- eventos ----------------
+    def evento(self, linha: Dict, quando=None) -> Optional[str]:
+        """
+        Tenta atender a OS `linha` (registro do backlog) chegada em `quando`
+        (padrão: datasol). Devolve INSERCAO, REOTIMIZACAO ou None (fica no backlog).
+        """
+        t_ini = time.perf_counter()
+        self.stats["eventos"] += 1
+        fonte = None
+        lon, lat = float(linha.get("longitude", math.nan)), float(linha.get("latitude", math.nan))
+        if math.isfinite(lon) and math.isfinite(lat):
+            t = float(self._s([linha["datasol"] if quando is None else quando])[0])
+            x = self.matriz.indice(lon, lat)
+            serv_x = float(service_seconds([linha.get("TE")])[0])
+            prazo = float(self._s([linha.get("dataven")])[0])
+            lim_x = prazo if math.isfinite(prazo) and prazo - serv_x >= t else math.inf
+
+            melhor = self._inserir(x, serv_x, lim_x, t)
+            if melhor is not None:
+                _, r, i, chegadas, retorno = melhor
+                k = r.partida(t)[0]
+                for lista, valor in ((r.numos, int(linha["numos"])), (r.pos, x), (r.serv, serv_x),
+                                     (r.limite, lim_x), (r.chegada, 0.0), (r.eta, INSERCAO)):
+                    lista.insert(i, valor)
+                r.chegada[k:] = chegadas
+                r.retorno = retorno
+                r.alterar(k, INSERCAO)
+                fonte = INSERCAO
+            elif self._reotimizar(int(linha["numos"]), x, serv_x, lim_x, t):
+                fonte = REOTIMIZACAO
+
+        if fonte is not None:
+            self._novas[int(linha["numos"])] = dict(linha)
+            self.stats["insercoes" if fonte == INSERCAO else "reotimizacoes"] += 1
+        else:
+            self.stats["aguardando"] += 1
+        self.stats["tempo_s"] += time.perf_counter() - t_ini
+        return fonte
+
+    def _reotimizar(self, numos_x: int, x: int, serv_x: float, lim_x: float, t: float) -> bool:
+        """Fallback: VROOM sobre o que falta das rotas ativas + x (aceito só sem OS descartadas)."""
+        if self.vroom is None:
+            return False
+        ativas = []
+        for r in self.rotas:
+            k, t0 = r.partida(t)
+            if r.fim > t0:
+                ativas.append((r, k, t0))
+        if not ativas:
+            return False
+
+        pontos = np.asarray(self.matriz.pontos(), dtype=np.float64)
+        origem = [r.pos[k - 1] if k else r.base for r, k, _ in ativas]
+        fim = np.array([r.fim for r, _, _ in ativas])
+        t0s = np.array([t0 for _, _, t0 in ativas])
+        pausas = [
+            [{"id": 1, "time_windows": [[int(r.pausa[0]), int(r.pausa[0])]], "service": int(r.pausa[1] - r.pausa[0])}]
+            if r.pausa is not None and t0 < r.pausa[0] and r.pausa[1] <= r.fim else None
+            for r, _, t0 in ativas
+        ]
+        bases = [r.base for r, _, _ in ativas]
+        vehicles = vehicles_payload(
+            np.arange(1, len(ativas) + 1),
+            pontos[origem, 0],
+            pontos[origem, 1],
+            np.floor(fim),
+            capacity=[r.cap - k for r, k, _ in ativas],
+            tw_inicio=np.ceil(t0s),
+            breaks=pausas,
+            lon_fim=pontos[bases, 0],
+            lat_fim=pontos[bases, 1],
+        )
+
+        # jobs: o que falta de cada rota + x (último id)
+        paradas = [(r.numos[j], r.pos[j], r.serv[j], r.limite[j]) for r, k, _ in ativas for j in range(k, len(r.pos))]
+        paradas.append((numos_x, x, serv_x, lim_x))
+        pos = [p[1] for p in paradas]
+        serv = np.array([p[2] for p in paradas])
+        limite = np.array([p[3] for p in paradas])
+        janelas = [[[0, int(lim - s)]] if math.isfinite(lim) and lim - s >= 0 else None for s, lim in zip(serv, limite)]
+        jobs = jobs_payload(
+            np.arange(1, len(paradas) + 1),
+            pontos[pos, 0],
+            pontos[pos, 1],
+            serv,
+            delivery=np.ones(len(paradas), dtype=np.int64),
+            time_windows=janelas,
+        )
+        try:
+            resp = self.vroom.route_multi(vehicles, jobs)
+        except Exception:
+            return False
+        if resp.get("unassigned"):
+            return False
+        passos = decodificar_rotas(resp)
+        if len(passos) != len(paradas):
+            return False
+
+        dur = self.matriz.dur
+        for v, (r, k, t0) in enumerate(ativas, 1):
+            rota = passos[passos["vehicle"].to_numpy() == v]
+            ids = (rota["job"].to_numpy() - 1).tolist()
+            del r.numos[k:], r.pos[k:], r.serv[k:], r.limite[k:], r.chegada[k:], r.eta[k:]
+            for jid, chegada in zip(ids, rota["arrival"].tolist()):
+                numos, p, s, lim = paradas[jid]
+                r.numos.append(numos)
+                r.pos.append(p)
+                r.serv.append(s)
+                r.limite.append(lim)
+                r.chegada.append(float(chegada))
+                r.eta.append(REOTIMIZACAO)
+            if len(rota):
+                r.retorno = float(rota["rota_arrival"].iloc[0])
+            else:
+                r.retorno = t0 + float(dur[origem[v - 1], r.base])
+            r.alterar(k, REOTIMIZACAO)
+        return True
+
+    # ---------------- saída ----------------
+    def resultado(self) -> List[pd.DataFrame]:
+        """Atribuições do dia: frames originais (rotas intocadas) + um frame com as rotas alteradas."""
+        alteradas = [r for r in self.rotas if r.alterada is not None]
+        if not alteradas:
+            return list(self._originais)
+
+        nomes = {r.info["equipe"] for r in alteradas}
+        frames = [df[~df["equipe"].astype(str).isin(nomes)] for df in self._originais]
+        originais = pd.concat(self._originais, ignore_index=True) if self._originais else pd.DataFrame()
+        por_numos = originais.set_index("numos", drop=False) if not originais.empty else None
+
+        registros = []
+        dur, dist = self.matriz.dur, self.matriz.dist
+        for r in alteradas:
+            trajeto = [r.base] + r.pos + [r.base]
+            perna_dist = dist[trajeto[:-1], trajeto[1:]]
+            perna_dur = dur[trajeto[:-1], trajeto[1:]]
+            for j, numos in enumerate(r.numos):
+                if numos in self._novas:
+                    reg = dict(self._novas[numos])
+                else:
+                    reg = por_numos.loc[numos].to_dict()
+                volta = j == len(r.numos) - 1
+                reg.update(r.info)
+                reg["numos"] = numos
+                reg["dth_chegada_estimada"] = self.origem + pd.Timedelta(seconds=r.chegada[j])
+                reg["fim_turno_estimado"] = self.origem + pd.Timedelta(seconds=r.retorno)
+                reg["chegada_base"] = reg["fim_turno_estimado"]
+                reg["distancia_vroom"] = (perna_dist[j] + (perna_dist[j + 1] if volta else 0.0)) / 1000.0
+                reg["duracao_vroom"] = (perna_dur[j] + (perna_dur[j + 1] if volta else 0.0)) / 60.0
+                reg["eta_source"] = r.eta[j]
+                registros.append(reg)
+
+        novo = pd.DataFrame(registros)
+        te = pd.to_numeric(novo["TE"], errors="coerce").fillna(0.0)
+        novo["dth_final_estimada"] = pd.to_datetime(novo["dth_chegada_estimada"]) + pd.to_timedelta(te.to_numpy(), unit="m")
+        return [df for df in frames if not df.empty] + [novo]
@@ -0,0 +1,175 @@
+# v2/matriz.py
+"""
+Matriz de deslocamento (durações em s, distâncias em m) com cache por ponto.
+
+Cada ponto distinto (chave em micrograus, como no cache de snapping) ganha
+um índice fixo; ao pedir pontos novos só as linhas/colunas que faltam vão ao
+OSRM e o resto é reaproveitado, então uma sequência de eventos sobre as
+mesmas rotas só consulta pontos novos. Os /table são divididos em blocos de
+até MAX_TABELA × MAX_TABELA (limite --max-table-size do osrm-routed), cada um
+só com as próprias coordenadas.
+
+As matrizes ficam em buffers com folga (capacidade dobrada quando enche, a
+partir de BLOCO_INICIAL): `dur`/`dist` são visões n × n desses buffers, e um
+ponto novo só copia a matriz inteira quando a capacidade estoura.
+
+Sem OSRM (ou perna sem rota) vale a haversine a velocidade constante. Se um
+/table falhar, os pontos afetados ficam na haversine (com aviso) e são
+pedidos de novo na próxima extensão.
+
+Uso:
+    matriz = MatrizDeslocamento(OSRMClient())
+    idx = matriz.indices([(lon, lat), ...])
+    matriz.dur[idx[0], idx[1]]   # segundos
+"""
+from typing import Dict, List, Sequence, Set, Tuple
+
+import numpy as np
+
+VEL_KMH_PADRAO = 30.0  # mesma velocidade do fallback haversine do V3
+MAX_TABELA = 100       # --max-table-size padrão do osrm-routed (sources × destinations <= 100²)
+BLOCO_INICIAL = 64     # capacidade inicial dos buffers da matriz (dobra ao encher)
+
+_ESCALA = 1_000_000  # micrograus (~0,1 m)
+_RAIO_TERRA_M = 6371000.0
+
+
+def chave_ponto(lon: float, lat: float) -> Tuple[int, int]:
+    return int(round(float(lon) * _ESCALA)), int(round(float(lat) * _ESCALA))
+
+
+def haversine_m(lon1, lat1, lon2, lat2) -> np.ndarray:
+    """Distância haversine em metros (com broadcasting NumPy)."""
+    lon1, lat1, lon2, lat2 = (np.radians(np.asarray(x, dtype=np.float64)) for x in (lon1, lat1, lon2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * _RAIO_TERRA_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def tabela_osrm(
+    osrm, coords: Sequence[Tuple[float, float]], linhas: Sequence[int], colunas: Sequence[int],
+    max_tabela: int = MAX_TABELA,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Durações e distâncias do bloco `linhas` × `colunas` (índices em `coords`)
+    via /table, em pedaços de até max_tabela × max_tabela. Perna sem rota →
+    NaN. Erros do OSRM são propagados.
+    """
+    linhas, colunas = list(linhas), list(colunas)
+    dur = np.full((len(linhas), len(colunas)), np.nan)
+    dist = np.full_like(dur, np.nan)
+    for r0 in range(0, len(linhas), max_tabela):
+        rs = linhas[r0 : r0 + max_tabela]
+        for c0 in range(0, len(colunas), max_tabela):
+            cs = colunas[c0 : c0 + max_tabela]
+            if rs == cs:  # bloco da diagonal: cada coordenada uma vez só
+                res = osrm.table([coords[i] for i in rs])
+            else:
+                res = osrm.table(
+                    [coords[i] for i in rs] + [coords[j] for j in cs],
+                    sources=range(len(rs)),
+                    destinations=range(len(rs), len(rs) + len(cs)),
+                )
+            for destino, chave in ((dur, "durations"), (dist, "distances")):
+                valores = np.asarray(res.get(chave) or [], dtype=np.float64)  # null → NaN
+                if valores.shape == (len(rs), len(cs)):
+                    destino[r0 : r0 + len(rs), c0 : c0 + len(cs)] = valores
+    return dur, dist
+
+
+class MatrizDeslocamento:
+    """Durações/distâncias entre os pontos já vistos, estendida sob demanda."""
+
+    def __init__(self, osrm=None, vel_kmh: float = VEL_KMH_PADRAO):
+        self.osrm = osrm
+        self.vel_ms = vel_kmh / 3.6
+        self._indice: Dict[Tuple[int, int], int] = {}
+        self._coords: List[Tuple[float, float]] = []
+        self._buf_dur = np.zeros((0, 0))
+        self._buf_dist = np.zeros((0, 0))
+        self.dur = self._buf_dur  # visões [:n, :n] dos buffers
+        self.dist = self._buf_dist
+        self.consultas = 0  # chamadas /table feitas por esta matriz
+        self._sem_osrm: Set[int] = set()  # pontos na haversine por falha do /table
+
+    def __len__(self) -> int:
+        return len(self._coords)
+
+    def indices(self, coords: Sequence[Tuple[float, float]]) -> np.ndarray:
+        """Índice de cada (lon, lat) na matriz, calculando antes as linhas/colunas dos pontos novos."""
+        out, novos = [], []
+        for lon, lat in coords:
+            chave = chave_ponto(lon, lat)
+            i = self._indice.get(chave)
+            if i is None:
+                i = self._indice[chave] = len(self._coords)
+                self._coords.append((float(lon), float(lat)))
+                novos.append(i)
+            out.append(i)
+        if novos:
+            self._estender(novos)
+        return np.asarray(out, dtype=np.int64)
+
+    def pontos(self) -> List[Tuple[float, float]]:
+        """(lon, lat) de cada índice."""
+        return list(self._coords)
+
+    def indice(self, lon: float, lat: float) -> int:
+        return int(self.indices([(lon, lat)])[0])
+
+    def _estender(self, novos: List[int]) -> None:
+        n, n0 = len(self._coords), self.dur.shape[0]
+        if n > self._buf_dur.shape[0]:
+            self._crescer(n, n0)
+        dur, dist = self._buf_dur[:n, :n], self._buf_dist[:n, :n]
+
+        pts = np.asarray(self._coords, dtype=np.float64)
+        hav = haversine_m(pts[novos, 0][:, None], pts[novos, 1][:, None], pts[None, :, 0], pts[None, :, 1])
+        dist[novos, :] = hav
+        dist[:, novos] = hav.T
+        dur[novos, :] = hav / self.vel_ms
+        dur[:, novos] = hav.T / self.vel_ms
+
+        if self.osrm is not None:
+            pendentes = sorted(self._sem_osrm.union(novos))
+            try:
+                self._do_osrm(dur, dist, pendentes, n0)
+                self._sem_osrm.clear()
+            except Exception as e:
+                # esses pontos seguem na haversine e são pedidos de novo na próxima extensão
+                if not self._sem_osrm:  # um aviso por queda (não por evento)
+                    print(f"⚠️  OSRM /table falhou ({type(e).__name__}); deslocamentos novos na haversine até o OSRM voltar", flush=True)
+                self._sem_osrm.update(pendentes)
+
+        np.fill_diagonal(dur, 0.0)
+        np.fill_diagonal(dist, 0.0)
+        self.dur, self.dist = dur, dist
+
+    def _crescer(self, n: int, n0: int) -> None:
+        """Realoca os buffers com capacidade >= n (dobrando), copiando só o bloco n0 × n0 em uso."""
+        cap = max(BLOCO_INICIAL, self._buf_dur.shape[0])
+        while cap < n:
+            cap *= 2
+        for nome in ("_buf_dur", "_buf_dist"):
+            buf = np.zeros((cap, cap))
+            buf[:n0, :n0] = getattr(self, nome)[:n0, :n0]
+            setattr(self, nome, buf)
+
+    def _do_osrm(self, dur: np.ndarray, dist: np.ndarray, novos: List[int], n0: int) -> None:
+        """Sobrescreve as linhas/colunas `novos` com o /table (pernas null ficam na haversine)."""
+        n = len(self._coords)
+        if n0 == 0:
+            blocos = [(list(range(n)), list(range(n)))]
+        else:
+            outros = sorted(set(range(n)).difference(novos))
+            blocos = [
+                (novos, list(range(n))),   # linhas dos pontos novos
+                (outros, novos),           # colunas dos pontos novos (demais linhas)
+            ]
+        # todos os blocos antes de gravar: falha no meio não deixa a matriz pela metade
+        blocos = [(ls, cs) for ls, cs in blocos if ls and cs]
+        resultados = [(ls, cs, tabela_osrm(self.osrm, self._coords, ls, cs)) for ls, cs in blocos]
+        self.consultas += sum(-(-len(ls) // MAX_TABELA) * -(-len(cs) // MAX_TABELA) for ls, cs in blocos)
+        for ls, cs, valores in resultados:
+            for destino, bloco in zip((dur, dist), valores):
+                atual = destino[np.ix_(ls, cs)]
+                destino[np.ix_(ls, cs)] = np.where(np.isfinite(bloco), bloco, atual)
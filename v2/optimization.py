@@ -357,6 +357,8 @@ def _osrm_eta_etd(osrm_client, df_jobs_tagged, inicio_turno_pvh, lon_e, lat_e, p
     coords.append((lon_e, lat_e))
 
     leg_durs, _ = osrm_client.route_legs_durations(coords)  # seg/perna
+    if np.isnan(leg_durs).any():
+        raise ValueError("OSRM sem rota para alguma perna")
     t_cursor = pd.to_datetime(inicio_turno_pvh, errors="coerce")
 
     leg_idx = 0
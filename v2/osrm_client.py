@@ -1,6 +1,59 @@
 # v2/osrm_client.py
+import asyncio
+import math
+
 import requests
 from v2 import config
+from v2.async_http import ClienteAssincrono
+
+
+def _legs_da_tabela(res, n):
+    """
+    Pernas consecutivas coords[i] -> coords[i+1] de uma resposta /table:
+    (legs_dur em segundos, legs_dist em metros). Pernas sem rota (null no
+    OSRM, ex.: ponto fora da malha) ficam NaN, para o chamador decidir o fallback.
+    """
+    dur = res.get("durations")
+    dist = res.get("distances")
+
+    legs_dur = []
+    legs_dist = []
+
+    if not dur or not dist:
+        return [math.nan] * (n - 1), [math.nan] * (n - 1)
+
+    for i in range(n - 1):
+        d_ij = None
+        if i < len(dur) and (i + 1) < len(dur[i]):
+            d_ij = dur[i][i + 1]
+        c_ij = None
+        if i < len(dist) and (i + 1) < len(dist[i]):
+            c_ij = dist[i][i + 1]
+
+        legs_dur.append(float(d_ij) if d_ij is not None else math.nan)
+        legs_dist.append(float(c_ij) if c_ij is not None else math.nan)
+
+    return legs_dur, legs_dist
+
+
+def _params_tabela(sources=None, destinations=None):
+    """Parâmetros do /table; sources/destinations (índices em coords) limitam linhas/colunas."""
+    params = {"annotations": "duration,distance"}
+    if sources is not None:
+        params["sources"] = ";".join(str(int(i)) for i in sources)
+    if destinations is not None:
+        params["destinations"] = ";".join(str(int(i)) for i in destinations)
+    return params
+
+
+def _local_snapado(data):
+    """(lon, lat) do primeiro waypoint de uma resposta /nearest, ou None."""
+    waypoints = data.get("waypoints") or []
+    if waypoints:
+        loc = waypoints[0].get("location")
+        if loc and len(loc) == 2:
+            return float(loc[0]), float(loc[1])
+    return None
 
 
 class OSRMClient:
@@ -13,13 +66,14 @@ class OSRMClient:
         # coords: [(lon,lat), ...] → "lon,lat;lon,lat;..."
         return ";".join([f"{lon},{lat}" for (lon, lat) in coords])
 
-    def table(self, coords):
+    def table(self, coords, sources=None, destinations=None):
         """
         Chama /table/v1/{profile}/{coords}?annotations=duration,distance
-        e retorna o JSON com durations/distances.
+        e retorna o JSON com durations/distances. Com `sources`/`destinations`
+        (índices em coords), só essas linhas/colunas são calculadas.
         """
         url = f"{self.base_url}/table/v1/{self.profile}/{self._format_coords(coords)}"
-        params = {"annotations": "duration,distance"}
+        params = _params_tabela(sources, destinations)
         r = requests.get(url, params=params, timeout=self.timeout)
         r.raise_for_status()
         return r.json()
@@ -30,46 +84,72 @@ class OSRMClient:
         - legs_dur: duração (segundos) de cada perna coords[i] -> coords[i+1]
         - legs_dist: distância (metros) de cada perna coords[i] -> coords[i+1]
         """
-        res = self.table(coords)
-        dur = res.get("durations")
-        dist = res.get("distances")
-        n = len(coords)
-
-        legs_dur = []
-        legs_dist = []
-
-        if not dur or not dist:
-            return [0.0] * (n - 1), [0.0] * (n - 1)
-
-        for i in range(n - 1):
-            d_ij = None
-            if i < len(dur) and (i + 1) < len(dur[i]):
-                d_ij = dur[i][i + 1]
-            c_ij = None
-            if i < len(dist) and (i + 1) < len(dist[i]):
-                c_ij = dist[i][i + 1]
+        return _legs_da_tabela(self.table(coords), len(coords))
 
-            legs_dur.append(float(d_ij) if d_ij is not None else 0.0)
-            legs_dist.append(float(c_ij) if c_ij is not None else 0.0)
-
-        return legs_dur, legs_dist
+    def nearest_or_none(self, lon: float, lat: float):
+        """Como nearest, mas devolve None se o OSRM falhar (não confunde com o original)."""
+        url = f"{self.base_url}/nearest/v1/{self.profile}/{lon},{lat}"
+        params = {"number": 1}
+        try:
+            r = requests.get(url, params=params, timeout=self.timeout)
+            r.raise_for_status()
+            return _local_snapado(r.json())
+        except Exception:
+            return None
 
     def nearest(self, lon: float, lat: float):
         """
         Usa o endpoint /nearest para "snapar" um ponto à via mais próxima.
         Retorna (lon_corrigido, lat_corrigida). Se falhar, devolve o original.
         """
+        snap = self.nearest_or_none(lon, lat)
+        if snap is not None:
+            return snap
+        return float(lon), float(lat)
+
+
+class AsyncOSRMClient(ClienteAssincrono):
+    """
+    Versão assíncrona (httpx) do OSRMClient, com no máximo
+    `max_concorrencia` requisições em voo por instância.
+    """
+
+    def __init__(self, base_url: str = None, profile: str = "driving", timeout: int = 30,
+                 max_concorrencia: int = 8, client=None):
+        super().__init__(timeout=timeout, max_concorrencia=max_concorrencia, client=client)
+        self.base_url = (base_url or config.OSRM_URL).rstrip("/")
+        self.profile = profile
+
+    _format_coords = OSRMClient._format_coords
+
+    async def table(self, coords, sources=None, destinations=None):
+        """Ver OSRMClient.table."""
+        url = f"{self.base_url}/table/v1/{self.profile}/{self._format_coords(coords)}"
+        return await self._request("GET", url, params=_params_tabela(sources, destinations))
+
+    async def route_legs_durations(self, coords):
+        """Ver OSRMClient.route_legs_durations."""
+        return _legs_da_tabela(await self.table(coords), len(coords))
+
+    async def nearest_or_none(self, lon: float, lat: float):
+        """Ver OSRMClient.nearest_or_none."""
         url = f"{self.base_url}/nearest/v1/{self.profile}/{lon},{lat}"
-        params = {"number": 1}
         try:
-            r = requests.get(url, params=params, timeout=self.timeout)
-            r.raise_for_status()
-            data = r.json()
-            waypoints = data.get("waypoints") or []
-            if waypoints:
-                loc = waypoints[0].get("location")
-                if loc and len(loc) == 2:
-                    return float(loc[0]), float(loc[1])
+            return _local_snapado(await self._request("GET", url, params={"number": 1}))
         except Exception:
-            pass
-        return float(lon), float(lat)
\ No newline at end of file
+            return None
+
+    async def nearest(self, lon: float, lat: float):
+        """Ver OSRMClient.nearest (se falhar, devolve o original)."""
+        snap = await self.nearest_or_none(lon, lat)
+        if snap is not None:
+            return snap
+        return float(lon), float(lat)
+
+    async def nearest_many(self, coords, original_se_falhar: bool = True):
+        """
+        Snapping de vários pontos [(lon, lat), ...] em paralelo, na mesma ordem
+        (com original_se_falhar=False, falhas ficam None).
+        """
+        metodo = self.nearest if original_se_falhar else self.nearest_or_none
+        return await asyncio.gather(*(metodo(lon, lat) for lon, lat in coords))
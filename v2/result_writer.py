@@ -0,0 +1,170 @@
+# v2/result_writer.py
+"""
+Escrita dos resultados de atribuição (V3/V4) como um único dataset Arrow
+particionado por dia (layout hive: <dir>/dia=AAAA-MM-DD/part-0.parquet).
+
+Cada dia simulado vira um RecordBatch com schema fixo, montado direto das
+colunas do DataFrame (sem reordenar/copiar o frame inteiro em pandas), e é
+gravado na sua partição. Reexecutar um dia sobrescreve apenas a partição dele.
+
+Leitura posterior com filtro empurrado para o parquet:
+    ds = abrir_dataset_resultados("results_v4")
+    ds.to_table(filter=pc.field("dia") >= "2025-01-01")
+"""
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as pads
+import pyarrow.parquet as pq
+
+from v2.data_loader import numos_original
+
+
+PARTITION_COL = "dia"
+
+_TS = pa.timestamp("ns")
+
+# Layout estável do resultado (mesma ordem de REQUIRED_COLS dos simuladores,
+# seguido das colunas extras que V3/V4 produzem). Colunas ausentes viram
+# nulos; colunas fora do schema não são gravadas.
+RESULT_SCHEMA = pa.schema(
+    [
+        ("tipo_serv", pa.string()),
+        ("numos", pa.int64()),
+        ("datasol", _TS),
+        ("dataven", _TS),
+        ("datater_trab", _TS),
+        ("TD", pa.float64()),
+        ("TE", pa.float64()),
+        ("equipe", pa.string()),
+        ("dthaps_ini", _TS),
+        ("dthaps_fim_ajustado", _TS),
+        ("inicio_turno", _TS),
+        ("fim_turno", _TS),
+        ("dthpausa_ini", _TS),
+        ("dthpausa_fim", _TS),
+        ("dth_chegada_estimada", _TS),
+        ("dth_final_estimada", _TS),
+        ("fim_turno_estimado", _TS),
+        ("eta_source", pa.string()),
+        ("base_lon", pa.float64()),
+        ("base_lat", pa.float64()),
+        ("chegada_base", _TS),
+        # extras
+        ("latitude", pa.float64()),
+        ("longitude", pa.float64()),
+        ("dt_ref", _TS),
+        ("EUSD", pa.float64()),
+        ("EUSD_FIO_B", pa.float64()),
+        ("distancia_vroom", pa.float64()),
+        ("duracao_vroom", pa.float64()),
+        ("job_id_vroom", pa.int64()),
+        ("numos_original", pa.string()),  # numos de origem (texto); ver v2.data_loader.tabela_numos
+    ]
+)
+
+
+def _coluna_arrow(df: pd.DataFrame, field: pa.Field) -> pa.Array:
+    """Converte uma coluna do DataFrame para o tipo do campo (nulos se ausente)."""
+    if field.name not in df.columns:
+        return pa.nulls(len(df), type=field.type)
+
+    s = df[field.name]
+    if pa.types.is_timestamp(field.type):
+        s = pd.to_datetime(s, errors="coerce")
+        if getattr(s.dt, "tz", None) is not None:
+            s = s.dt.tz_localize(None)
+        s = s.astype("datetime64[ns]")
+    elif pa.types.is_floating(field.type) or pa.types.is_integer(field.type):
+        s = pd.to_numeric(s, errors="coerce")
+    elif pa.types.is_string(field.type) and s.dtype == object:
+        s = s.where(s.isna(), s.astype(str))
+
+    arr = pa.array(s, from_pandas=True)
+    if isinstance(arr, pa.ChunkedArray):  # colunas pyarrow (ex.: str) após concat
+        arr = arr.combine_chunks()
+    if arr.type != field.type:
+        arr = arr.cast(field.type, safe=False)
+    return arr
+
+
+def to_record_batch(df: pd.DataFrame, schema: pa.Schema = RESULT_SCHEMA) -> pa.RecordBatch:
+    """Monta um RecordBatch com o schema fixo a partir das colunas do DataFrame."""
+    arrays = [_coluna_arrow(df, f) for f in schema]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def contagem_valores(tabela: pa.Table, coluna: str) -> Dict:
+    """{valor: ocorrências} de uma coluna da tabela gravada (ex.: eta_source nos logs de debug)."""
+    if coluna not in tabela.column_names:
+        return {}
+    return {d["values"]: d["counts"] for d in pc.value_counts(tabela.column(coluna)).to_pylist()}
+
+
+class ResultDatasetWriter:
+    """
+    Escreve cada dia de atribuições na sua partição do dataset de resultados.
+
+    - base_dir: raiz do dataset (ex.: results_v4)
+    - compression: codec do parquet (zstd, snappy, gzip, none...)
+    - row_group_size: máximo de linhas por row group
+    """
+
+    def __init__(
+        self,
+        base_dir: Union[str, Path],
+        compression: str = "zstd",
+        row_group_size: int = 64_000,
+        schema: pa.Schema = RESULT_SCHEMA,
+    ):
+        self.base_dir = Path(base_dir)
+        self.compression = compression
+        self.row_group_size = int(row_group_size)
+        self.schema = schema
+
+    def partition_path(self, dia) -> Path:
+        dia_str = pd.Timestamp(dia).date().isoformat()
+        return self.base_dir / f"{PARTITION_COL}={dia_str}"
+
+    def write_day(
+        self,
+        dia,
+        frames: Union[pd.DataFrame, Sequence[pd.DataFrame]],
+        numos_side: Optional[Dict[int, str]] = None,
+    ) -> Tuple[Path, pa.Table]:
+        """
+        Grava as atribuições de um dia (um ou vários DataFrames, um batch cada).
+        `numos_side` (tabela lateral id -> texto) preenche numos_original dos
+        numos não numéricos; os demais levam o próprio número.
+
+        Retorna o arquivo escrito e a tabela Arrow gravada (para logs/estatísticas).
+        """
+        if isinstance(frames, pd.DataFrame):
+            frames = [frames]
+        frames = [df for df in frames if not df.empty]
+        if "numos_original" in self.schema.names:
+            frames = [
+                df.assign(numos_original=numos_original(df["numos"], numos_side or {})) if "numos" in df.columns else df
+                for df in frames
+            ]
+        batches = [to_record_batch(df, self.schema) for df in frames]
+
+        part_dir = self.partition_path(dia)
+        part_dir.mkdir(parents=True, exist_ok=True)
+        out_file = part_dir / "part-0.parquet"
+
+        with pq.ParquetWriter(out_file, self.schema, compression=self.compression) as writer:
+            for batch in batches:
+                writer.write_batch(batch, row_group_size=self.row_group_size)
+        return out_file, pa.Table.from_batches(batches, schema=self.schema)
+
+
+def abrir_dataset_resultados(base_dir: Union[str, Path], schema: Optional[pa.Schema] = RESULT_SCHEMA):
+    """Abre o dataset particionado para leitura com filtro por `dia`."""
+    partitioning = pads.partitioning(pa.schema([(PARTITION_COL, pa.string())]), flavor="hive")
+    if schema is not None:
+        schema = schema.append(pa.field(PARTITION_COL, pa.string()))
+    return pads.dataset(str(base_dir), format="parquet", partitioning=partitioning, schema=schema)
@@ -0,0 +1,82 @@
+# v2/shared_backlog.py
+"""
+Backlog normalizado (equipes + pendências) publicado como arquivos Arrow IPC
+para ser aberto por vários processos de simulação via memory-map.
+
+Uso típico (experimentos em paralelo com --limite/config diferentes):
+    publicar_backlog("data/shared", df_eq, df_te, df_co)   # uma vez
+    df_eq, df_te, df_co = abrir_backlog("data/shared")     # em cada processo
+
+As colunas numéricas/datetime abertas são visões somente-leitura do arquivo
+mapeado: as páginas ficam no page cache do SO e são compartilhadas entre os
+processos, em vez de cada um manter a sua cópia pandas. Os simuladores não
+alteram esses frames (ver v2.backlog.Backlog).
+
+`chave` (ex.: v2.cache.cache_key da janela, snap e arquivos de origem) vai
+para o manifesto da publicação; backlog_publicado(origem, chave) só aceita a
+publicação feita com a mesma chave, então mudar a janela ou os parquets de
+origem força uma nova publicação em vez de simular dados antigos.
+"""
+import json
+import os
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+import pandas as pd
+
+from v2.cache import read_ipc, write_ipc
+
+
+_ARQUIVOS = {
+    "equipes": "equipes.arrow",
+    "tec": "pend_tec.arrow",
+    "com": "pend_com.arrow",
+}
+_MANIFESTO = "manifesto.json"
+
+
+def chave_publicada(origem: Union[str, Path]) -> Optional[str]:
+    """Chave gravada no manifesto da publicação em `origem` (None se não houver)."""
+    try:
+        return json.loads((Path(origem) / _MANIFESTO).read_text(encoding="utf-8")).get("chave")
+    except (OSError, ValueError):
+        return None
+
+
+def backlog_publicado(origem: Union[str, Path], chave: Optional[str] = None) -> bool:
+    """Há backlog completo em `origem` (e, com `chave`, publicado com essa chave)."""
+    origem = Path(origem)
+    if not all((origem / nome).exists() for nome in _ARQUIVOS.values()):
+        return False
+    return chave is None or chave_publicada(origem) == chave
+
+
+def publicar_backlog(
+    destino: Union[str, Path],
+    df_eq: pd.DataFrame,
+    df_te: pd.DataFrame,
+    df_co: pd.DataFrame,
+    chave: Optional[str] = None,
+) -> Path:
+    """
+    Grava equipes/pendências normalizadas em `destino` (Arrow IPC, sem
+    compressão) e, por último, o manifesto com `chave`.
+    """
+    destino = Path(destino)
+    (destino / _MANIFESTO).unlink(missing_ok=True)  # publicação incompleta não casa com nenhuma chave
+    write_ipc(df_eq, destino / _ARQUIVOS["equipes"])
+    write_ipc(df_te, destino / _ARQUIVOS["tec"])
+    write_ipc(df_co, destino / _ARQUIVOS["com"])
+    tmp = destino / f"{_MANIFESTO}.{os.getpid()}.tmp"
+    tmp.write_text(json.dumps({"chave": chave}), encoding="utf-8")
+    tmp.replace(destino / _MANIFESTO)
+    return destino
+
+
+def abrir_backlog(origem: Union[str, Path]) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Abre (memory-map) o backlog publicado em `origem`."""
+    origem = Path(origem)
+    df_eq = read_ipc(origem / _ARQUIVOS["equipes"])
+    df_te = read_ipc(origem / _ARQUIVOS["tec"])
+    df_co = read_ipc(origem / _ARQUIVOS["com"])  # tabela lateral de numos vem em df.attrs
+    return df_eq, df_te, df_co
@@ -0,0 +1,187 @@
+# v2/snap_cache.py
+"""
+Cache de snapping (/nearest do OSRM) por coordenada.
+
+As bases das equipes são poucas e se repetem a cada equipe/rodada/dia; cada
+ponto distinto é "snapado" uma única vez por processo (chave: lon/lat em
+micrograus) e, opcionalmente, persistido em Arrow IPC no CACHE_DIR para as
+próximas execuções. O arquivo é separado por servidor/perfil OSRM.
+
+Só snaps bem-sucedidos entram no cache: com o OSRM fora do ar o ponto
+original é usado sem ser gravado, e a próxima chamada tenta de novo.
+
+snapar_coordenadas() aplica o mesmo cache às coordenadas dos jobs no
+estágio de carga (ver v3.data_loader.prepare_pendencias_v3(snap=True)).
+
+Uso:
+    cache = cache_snap()
+    cache.snap_many(osrm, [(lon, lat), ...])   # pré-carga em lote
+    lon, lat = cache.snap(osrm, lon, lat)      # depois: sem /nearest
+"""
+import asyncio
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from v2 import config
+from v2.async_http import httpx
+from v2.cache import read_ipc, write_ipc
+
+_ESCALA = 1_000_000  # micrograus (~0,1 m)
+
+Chave = Tuple[int, int]
+
+
+def _chave(lon: float, lat: float) -> Chave:
+    return int(round(float(lon) * _ESCALA)), int(round(float(lat) * _ESCALA))
+
+
+def tag_osrm(osrm) -> str:
+    """Hash curto do servidor/perfil OSRM (snaps de servidores diferentes não se misturam)."""
+    return hashlib.sha1(f"{osrm.base_url}|{osrm.profile}".encode("utf-8")).hexdigest()[:12]
+
+
+def arquivo_snap(osrm, cache_dir: Optional[Path] = None) -> Path:
+    """Arquivo persistente do cache para o servidor/perfil de `osrm`."""
+    return Path(cache_dir or config.CACHE_DIR) / f"snap-{tag_osrm(osrm)}.arrow"
+
+
+class CacheSnap:
+    """Mapa (lon, lat) → ponto snapado, com pré-carga em lote e persistência opcional."""
+
+    def __init__(self):
+        self._pontos: Dict[Chave, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+        self.consultas = 0  # chamadas /nearest feitas por este cache
+
+    def __len__(self) -> int:
+        return len(self._pontos)
+
+    def get(self, lon: float, lat: float) -> Optional[Tuple[float, float]]:
+        return self._pontos.get(_chave(lon, lat))
+
+    def atualizar(self, pontos: Dict[Chave, Tuple[float, float]]) -> None:
+        with self._lock:
+            self._pontos.update(pontos)
+
+    def itens(self) -> Dict[Chave, Tuple[float, float]]:
+        with self._lock:
+            return dict(self._pontos)
+
+    def snap(self, osrm, lon: float, lat: float) -> Tuple[float, float]:
+        """Ponto snapado (do cache ou via osrm.nearest_or_none); o original se falhar."""
+        ponto = self.get(lon, lat)
+        if ponto is not None:
+            return ponto
+        self.consultas += 1
+        ponto = osrm.nearest_or_none(lon, lat)
+        if ponto is None:
+            return float(lon), float(lat)
+        self.atualizar({_chave(lon, lat): ponto})
+        return ponto
+
+    def snap_many(self, osrm, coords: Sequence[Tuple[float, float]]) -> List[Tuple[float, float]]:
+        """
+        Snapping de vários pontos (na ordem de `coords`): só os pontos distintos
+        ainda fora do cache vão ao OSRM, em paralelo (httpx) quando disponível.
+        """
+        faltando = list({_chave(lon, lat): (float(lon), float(lat)) for lon, lat in coords
+                         if self.get(lon, lat) is None}.values())
+        if faltando:
+            self.consultas += len(faltando)
+            snaps = _nearest_lote(osrm, faltando)
+            self.atualizar({_chave(*p): s for p, s in zip(faltando, snaps) if s is not None})
+        return [self.get(lon, lat) or (float(lon), float(lat)) for lon, lat in coords]
+
+    # ---------------- persistência ----------------
+    def carregar(self, arquivo: Path) -> int:
+        """Adiciona os pontos de `arquivo` (se existir e for legível); devolve quantos."""
+        arquivo = Path(arquivo)
+        if not arquivo.exists():
+            return 0
+        try:
+            df = read_ipc(arquivo)
+        except Exception:
+            return 0
+        chaves = zip(df["lon_key"].tolist(), df["lat_key"].tolist())
+        pontos = zip(df["lon"].tolist(), df["lat"].tolist())
+        self.atualizar(dict(zip(chaves, pontos)))
+        return len(df)
+
+    def salvar(self, arquivo: Path) -> None:
+        itens = self.itens()
+        chaves = np.array(list(itens.keys()), dtype=np.int64).reshape(-1, 2)
+        pontos = np.array(list(itens.values()), dtype=np.float64).reshape(-1, 2)
+        df = pd.DataFrame(
+            {"lon_key": chaves[:, 0], "lat_key": chaves[:, 1], "lon": pontos[:, 0], "lat": pontos[:, 1]}
+        )
+        write_ipc(df, Path(arquivo))
+
+
+def _nearest_lote(osrm, coords: List[Tuple[float, float]]) -> List[Optional[Tuple[float, float]]]:
+    """/nearest de vários pontos: concorrente via AsyncOSRMClient se possível, senão sequencial."""
+    em_loop = True
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        em_loop = False
+
+    if httpx is not None and len(coords) > 1 and not em_loop:
+        from v2.osrm_client import AsyncOSRMClient
+
+        async def _todos():
+            async with AsyncOSRMClient(base_url=osrm.base_url, profile=osrm.profile, timeout=osrm.timeout) as cli:
+                return await cli.nearest_many(coords, original_se_falhar=False)
+
+        return asyncio.run(_todos())
+    return [osrm.nearest_or_none(lon, lat) for lon, lat in coords]
+
+
+_CACHE = CacheSnap()
+
+
+def cache_snap() -> CacheSnap:
+    """Cache de snapping do processo."""
+    return _CACHE
+
+
+def snapar_coordenadas(df: pd.DataFrame, osrm, cache: Optional[CacheSnap] = None) -> pd.DataFrame:
+    """
+    Troca longitude/latitude de `df` pelo ponto snapado de cada coordenada
+    distinta (um /nearest por ponto distinto ainda fora do cache). As originais
+    ficam em longitude_bruta/latitude_bruta e `snapado` marca as linhas
+    snapadas; linhas já snapadas não são reprocessadas, então chamar de novo
+    só re-tenta as que falharam.
+    """
+    cache = cache or cache_snap()
+    df = df.copy(deep=False)
+    if "snapado" not in df.columns:
+        df["longitude_bruta"] = df["longitude"]
+        df["latitude_bruta"] = df["latitude"]
+        df["snapado"] = np.zeros(len(df), dtype=bool)
+
+    snapado = df["snapado"].to_numpy(dtype=bool).copy()
+    pend = ~snapado
+    if not pend.any():
+        return df
+
+    brutas = np.column_stack(
+        [df["longitude_bruta"].to_numpy(dtype=np.float64), df["latitude_bruta"].to_numpy(dtype=np.float64)]
+    )[pend]
+    distintas, inv = np.unique(brutas, axis=0, return_inverse=True)
+    inv = inv.reshape(-1)
+    pontos = distintas.tolist()
+    snaps = np.asarray(cache.snap_many(osrm, pontos), dtype=np.float64).reshape(-1, 2)
+    ok = np.array([cache.get(lon, lat) is not None for lon, lat in pontos], dtype=bool)
+
+    for i, col in enumerate(("longitude", "latitude")):
+        valores = df[col].to_numpy(dtype=np.float64).copy()
+        valores[pend] = snaps[inv, i]
+        df[col] = valores.astype(df[col].dtype)
+    snapado[pend] = ok[inv]
+    df["snapado"] = snapado
+    return df
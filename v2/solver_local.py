@@ -0,0 +1,314 @@
+# v2/solver_local.py
+"""
+Roteirizador em processo para problemas pequenos (atalho antes do VROOM).
+
+Com poucos jobs (grupos pequenos do V4, últimas rodadas do V3) a ida e
+volta HTTP ao VROOM domina o tempo. SolverLocal recebe o mesmo payload
+(vehicles/jobs de v2.vroom_payload) e devolve uma resposta no formato do
+VROOM (routes[].steps[] com arrival/duration/distance acumulados,
+unassigned), então os chamadores decodificam com v2.vroom_response sem
+mudança:
+
+1. inserção mais barata: a cada passo entra o job (de maior priority
+   pendente) cuja melhor posição viável acrescenta menos deslocamento;
+2. 2-opt em cada rota (inversão de trechos) enquanto reduzir o deslocamento.
+
+Restrições: capacity x delivery, time_window do veículo (fim da rota), time_windows
+do job (início do serviço dentro da 1ª janela; espera se chegar antes) e
+break com início dentro da sua janela (breaks_pausa usa [i, i]: início
+fixo). A matriz de deslocamentos de cada chamada cobre só os pontos dela
+(m × m, m = 2 × veículos + jobs) e sai de um cache de pares (origem,
+destino) do processo, limitado a MAX_PARES; faltando algum par, um /table
+em blocos (v2.matriz.tabela_osrm) sobre esses m pontos preenche o cache.
+O OSRM não é obrigatório: sem ele vale a haversine; com ele fora do ar
+também (um aviso por queda), sem novas tentativas por RETENTAR_OSRM_S,
+para que cada solve não espere o timeout do /table.
+
+Uso:
+    if len(jobs) <= max_jobs_local:
+        resp = solver_local(osrm_url).route_multi(vehicles, jobs)
+"""
+import math
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from v2.matriz import VEL_KMH_PADRAO, chave_ponto, haversine_m, tabela_osrm
+from v2.osrm_client import OSRMClient
+
+MAX_PARES = 200_000  # pares (origem, destino) em cache; acima disso o cache recomeça
+RETENTAR_OSRM_S = 60.0  # após uma falha do /table, só haversine por esse tempo
+
+
+class _Problema:
+    """Arrays do payload indexados por veículo/job (tempos em s, base do payload)."""
+
+    def __init__(self, vehicles: Sequence[Dict], jobs: Sequence[Dict], idx: np.ndarray):
+        nv = len(vehicles)
+        self.ini = idx[:nv]
+        self.fim = idx[nv : 2 * nv]
+        self.loc = idx[2 * nv :]
+        tw = [v.get("time_window") or [0, math.inf] for v in vehicles]
+        self.v_ini = [float(a) for a, _ in tw]
+        self.v_fim = [float(b) for _, b in tw]
+        self.cap = [float((v.get("capacity") or [math.inf])[0]) for v in vehicles]
+        self.pausa = []
+        for v in vehicles:
+            brk = (v.get("breaks") or [None])[0]
+            if brk and brk.get("time_windows"):
+                a, b = brk["time_windows"][0]
+                self.pausa.append((float(a), float(b), float(brk.get("service", 0))))
+            else:
+                self.pausa.append(None)
+        self.serv = [float(j.get("service", 0)) for j in jobs]
+        self.qtd = [float((j.get("delivery") or [1])[0]) for j in jobs]
+        self.prio = [int(j.get("priority", 0)) for j in jobs]
+        janelas = [(j.get("time_windows") or [[0, math.inf]])[0] for j in jobs]
+        self.j_ini = [float(a) for a, _ in janelas]
+        self.j_fim = [float(b) for _, b in janelas]
+
+
+class SolverLocal:
+    """Mesma interface do VroomClient (route/route_multi), resolvido em processo."""
+
+    def __init__(
+        self, osrm=None, vel_kmh: float = VEL_KMH_PADRAO, max_pares: int = MAX_PARES,
+        retentar_osrm_s: float = RETENTAR_OSRM_S,
+    ):
+        self.osrm = osrm
+        self.vel_ms = vel_kmh / 3.6
+        self.max_pares = int(max_pares)
+        self.retentar_osrm_s = float(retentar_osrm_s)
+        self._pares: Dict[Tuple[int, int, int, int], Tuple[float, float]] = {}
+        self._osrm_fora = False
+        self._osrm_volta_em = 0.0  # time.monotonic() a partir do qual o /table é tentado de novo
+        self._lock = threading.Lock()
+
+    def route(self, vehicle: Dict, jobs: List[Dict]) -> Dict:
+        return self.route_multi([vehicle], jobs)
+
+    def route_multi(self, vehicles: List[Dict], jobs: List[Dict]) -> Dict:
+        coords = [v["start"] for v in vehicles] + [v.get("end") or v["start"] for v in vehicles]
+        coords += [j["location"] for j in jobs]
+        idx, dur, dist = self._matriz([(float(lon), float(lat)) for lon, lat in coords])
+
+        pb = _Problema(vehicles, jobs, idx)
+        rotas = self._inserir(pb, dur)
+        for v, seq in enumerate(rotas):
+            rotas[v] = self._dois_opt(pb, dur, v, seq)
+        return self._resposta(pb, vehicles, jobs, rotas, dur, dist)
+
+    # ---------------- matriz da chamada ----------------
+    def _matriz(self, coords: List[Tuple[float, float]]):
+        """(índice de cada coord, dur, dist) sobre os pontos distintos de `coords`."""
+        indice: Dict[Tuple[int, int], int] = {}
+        pontos: List[Tuple[float, float]] = []
+        idx = []
+        for lon, lat in coords:
+            chave = chave_ponto(lon, lat)
+            if chave not in indice:
+                indice[chave] = len(pontos)
+                pontos.append((lon, lat))
+            idx.append(indice[chave])
+        idx = np.asarray(idx, dtype=np.int64)
+
+        pts = np.asarray(pontos, dtype=np.float64)
+        dist = haversine_m(pts[:, 0][:, None], pts[:, 1][:, None], pts[None, :, 0], pts[None, :, 1])
+        dur = dist / self.vel_ms
+        if self.osrm is None:
+            return idx, dur, dist
+
+        chaves = list(indice)
+        pares = [a + b for a in chaves for b in chaves]
+        with self._lock:
+            achados = [self._pares.get(p) for p in pares]
+        if all(achados):
+            valores = np.asarray(achados, dtype=np.float64).reshape(len(chaves), len(chaves), 2)
+            return idx, valores[..., 0], valores[..., 1]
+        if time.monotonic() < self._osrm_volta_em:
+            return idx, dur, dist
+
+        try:
+            dur_o, dist_o = tabela_osrm(self.osrm, pontos, range(len(pontos)), range(len(pontos)))
+        except Exception as e:
+            if not self._osrm_fora:  # um aviso por queda
+                print(f"⚠️  Solver local: OSRM /table falhou ({type(e).__name__}); usando haversine", flush=True)
+                self._osrm_fora = True
+            self._osrm_volta_em = time.monotonic() + self.retentar_osrm_s
+            return idx, dur, dist  # haversine não entra no cache: o OSRM é tentado de novo depois da pausa
+        self._osrm_fora = False
+        ok = np.isfinite(dur_o) & np.isfinite(dist_o)
+        dur, dist = np.where(ok, dur_o, dur), np.where(ok, dist_o, dist)
+        with self._lock:
+            if len(self._pares) + len(pares) > self.max_pares:
+                self._pares.clear()
+            self._pares.update(
+                (p, v) for p, v, o in zip(pares, zip(dur.ravel().tolist(), dist.ravel().tolist()), ok.ravel().tolist()) if o
+            )
+        return idx, dur, dist
+
+    # ---------------- agenda ----------------
+    @staticmethod
+    def _agendar(pb: _Problema, dur: np.ndarray, v: int, seq: List[int]):
+        """
+        (chegadas, instante da pausa ou None, chegada ao fim) de `seq` no veículo v;
+        None se inviável. A pausa entra antes do primeiro job que terminaria
+        depois do fim da sua janela e começa em max(agora, início da janela);
+        se "agora" já passou do fim da janela, a sequência é inviável.
+        """
+        c = pb.v_ini[v]
+        atual = pb.ini[v]
+        pausa = pb.pausa[v]
+        pausa_em = None
+        chegadas = []
+        for j in seq:
+            desl = dur[atual, pb.loc[j]]
+            if pausa is not None and pausa_em is None and max(c + desl, pb.j_ini[j]) + pb.serv[j] > pausa[1]:
+                if c > pausa[1]:
+                    return None
+                pausa_em = max(c, pausa[0])
+                c = pausa_em + pausa[2]
+            chegada = max(c + desl, pb.j_ini[j])
+            if chegada > pb.j_fim[j]:
+                return None
+            chegadas.append(chegada)
+            c = chegada + pb.serv[j]
+            atual = pb.loc[j]
+        desl = dur[atual, pb.fim[v]]
+        if pausa is not None and pausa_em is None and seq:
+            if c > pausa[1]:
+                return None
+            pausa_em = max(c, pausa[0])
+            c = pausa_em + pausa[2]
+        c += desl
+        if c > pb.v_fim[v]:
+            return None
+        return chegadas, pausa_em, c
+
+    @staticmethod
+    def _custo(pb: _Problema, dur: np.ndarray, v: int, seq: List[int]) -> float:
+        trajeto = [pb.ini[v]] + [pb.loc[j] for j in seq] + [pb.fim[v]]
+        return float(dur[trajeto[:-1], trajeto[1:]].sum())
+
+    # ---------------- construção + melhoria ----------------
+    def _inserir(self, pb: _Problema, dur: np.ndarray) -> List[List[int]]:
+        """Inserção mais barata, por nível de priority (maior primeiro)."""
+        nv = len(pb.ini)
+        rotas: List[List[int]] = [[] for _ in range(nv)]
+        carga = [0.0] * nv
+        pendentes = set(range(len(pb.loc)))
+        while pendentes:
+            topo = max(pb.prio[j] for j in pendentes)
+            candidatos = np.array(sorted(j for j in pendentes if pb.prio[j] == topo), dtype=np.int64)
+            locs = pb.loc[candidatos]
+            melhor = None
+            for v in range(nv):
+                seq = rotas[v]
+                antes = np.array([pb.ini[v]] + [pb.loc[j] for j in seq], dtype=np.int64)
+                depois = np.array([pb.loc[j] for j in seq] + [pb.fim[v]], dtype=np.int64)
+                # acréscimo[c, p]: inserir o candidato c na posição p
+                acrescimo = dur[antes[None, :], locs[:, None]] + dur[locs[:, None], depois[None, :]] - dur[antes, depois][None, :]
+                for plano in np.argsort(acrescimo, axis=None, kind="stable").tolist():
+                    c, p = divmod(plano, acrescimo.shape[1])
+                    if melhor is not None and acrescimo[c, p] >= melhor[0]:
+                        break
+                    j = int(candidatos[c])
+                    if carga[v] + pb.qtd[j] > pb.cap[v]:
+                        continue
+                    if self._agendar(pb, dur, v, seq[:p] + [j] + seq[p:]) is not None:
+                        melhor = (float(acrescimo[c, p]), v, p, j)
+                        break
+            if melhor is None:
+                if len(candidatos) == len(pendentes):
+                    break  # nenhum job cabe em lugar nenhum
+                pendentes.difference_update(candidatos.tolist())  # nível sem vaga: tenta os de priority menor
+                continue
+            _, v, p, j = melhor
+            rotas[v].insert(p, j)
+            carga[v] += pb.qtd[j]
+            pendentes.discard(j)
+        return rotas
+
+    def _dois_opt(self, pb: _Problema, dur: np.ndarray, v: int, seq: List[int]) -> List[int]:
+        """Inverte trechos da rota enquanto houver ganho viável (primeira melhora)."""
+        custo = self._custo(pb, dur, v, seq)
+        melhorou = True
+        while melhorou and len(seq) > 2:
+            melhorou = False
+            for i in range(len(seq) - 1):
+                for k in range(i + 1, len(seq)):
+                    nova = seq[:i] + seq[i : k + 1][::-1] + seq[k + 1 :]
+                    c = self._custo(pb, dur, v, nova)
+                    if c < custo - 1e-9 and self._agendar(pb, dur, v, nova) is not None:
+                        seq, custo, melhorou = nova, c, True
+                        break
+                if melhorou:
+                    break
+        return seq
+
+    # ---------------- resposta no formato VROOM ----------------
+    def _resposta(self, pb, vehicles, jobs, rotas, dur, dist) -> Dict:
+        routes = []
+        atribuidos = set()
+        total = {"cost": 0, "service": 0, "duration": 0, "distance": 0}
+        for v, seq in enumerate(rotas):
+            if not seq:
+                continue
+            chegadas, pausa_em, fim = self._agendar(pb, dur, v, seq)
+            trajeto = [pb.ini[v]] + [pb.loc[j] for j in seq] + [pb.fim[v]]
+            acum_dur = np.concatenate([[0.0], np.cumsum(dur[trajeto[:-1], trajeto[1:]])])
+            acum_dist = np.concatenate([[0.0], np.cumsum(dist[trajeto[:-1], trajeto[1:]])])
+            steps = [{"type": "start", "location": vehicles[v]["start"], "arrival": int(pb.v_ini[v]),
+                      "duration": 0, "distance": 0}]
+            for n, (j, chegada) in enumerate(zip(seq, chegadas), 1):
+                if pausa_em is not None and pausa_em < chegada and not any(s["type"] == "break" for s in steps):
+                    steps.append(self._passo_pausa(vehicles[v], pausa_em, pb.pausa[v][2], acum_dur[n - 1], acum_dist[n - 1]))
+                steps.append({
+                    "type": "job", "id": jobs[j]["id"], "job": jobs[j]["id"], "location": jobs[j]["location"],
+                    "arrival": int(round(chegada)), "service": int(pb.serv[j]),
+                    "duration": int(round(acum_dur[n])), "distance": int(round(acum_dist[n])),
+                })
+                atribuidos.add(j)
+            if pausa_em is not None and not any(s["type"] == "break" for s in steps):
+                steps.append(self._passo_pausa(vehicles[v], pausa_em, pb.pausa[v][2], acum_dur[-2], acum_dist[-2]))
+            steps.append({"type": "end", "location": vehicles[v].get("end") or vehicles[v]["start"],
+                          "arrival": int(round(fim)), "duration": int(round(acum_dur[-1])),
+                          "distance": int(round(acum_dist[-1]))})
+            servico = int(sum(pb.serv[j] for j in seq))
+            routes.append({
+                "vehicle": vehicles[v]["id"], "cost": int(round(acum_dur[-1])), "service": servico,
+                "duration": int(round(acum_dur[-1])), "distance": int(round(acum_dist[-1])), "steps": steps,
+            })
+            total["cost"] += routes[-1]["cost"]
+            total["service"] += servico
+            total["duration"] += routes[-1]["duration"]
+            total["distance"] += routes[-1]["distance"]
+
+        unassigned = [{"id": jobs[j]["id"], "location": jobs[j]["location"]} for j in range(len(jobs)) if j not in atribuidos]
+        resumo = dict(total, routes=len(routes), unassigned=len(unassigned))
+        return {"code": 0, "summary": resumo, "unassigned": unassigned, "routes": routes}
+
+    @staticmethod
+    def _passo_pausa(vehicle: Dict, inicio: float, duracao: float, acum_dur: float, acum_dist: float) -> Dict:
+        brk = vehicle["breaks"][0]
+        return {"type": "break", "id": brk.get("id", 1), "arrival": int(round(inicio)), "service": int(duracao),
+                "duration": int(round(acum_dur)), "distance": int(round(acum_dist))}
+
+
+_SOLVER: Optional[SolverLocal] = None
+_SOLVER_LOCK = threading.Lock()
+
+
+def solver_local(osrm_url: Optional[str] = None) -> SolverLocal:
+    """
+    SolverLocal do processo (cache de pares reaproveitado entre chamadas) para
+    o OSRM de `osrm_url`; com o OSRM fora do ar resolve na haversine.
+    """
+    global _SOLVER
+    with _SOLVER_LOCK:
+        osrm = OSRMClient(base_url=osrm_url)
+        if _SOLVER is None or _SOLVER.osrm.base_url != osrm.base_url:
+            _SOLVER = SolverLocal(osrm)
+        return _SOLVER
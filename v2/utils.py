@@ -2,6 +2,8 @@ import pandas as pd
 import numpy as np
 from math import radians, sin, cos, asin, sqrt
 
+from v2.vroom_payload import jobs_payload, service_seconds
+
 def safe_number(x):
     try:
         v = float(x)
@@ -24,6 +26,17 @@ def _service_seconds_from_row(row) -> int:
         te_min = 0.0
     return int(max(0.0, te_min) * 60.0)
 
+def remover_numos(df: pd.DataFrame, numos) -> pd.DataFrame:
+    """
+    Remove do backlog as linhas cujo numos (int64) está em `numos`.
+    """
+    if df.empty or "numos" not in df.columns:
+        return df
+    ids = np.fromiter((int(n) for n in numos), dtype=np.int64)
+    if ids.size == 0:
+        return df
+    return df[~np.isin(df["numos"].to_numpy(dtype=np.int64), ids)]
+
 def _dedup_ids(int_ids):
     """
     Remove duplicados preservando ordem; se houver duplicados,
@@ -48,16 +61,22 @@ def gerar_jobs_com_ids(df_jobs: pd.DataFrame):
     df = df_jobs.copy()
     # id preferencial: NUMOS; se não houver, usa índice.
     if "numos" in df.columns and df["numos"].notna().any():
-        base_ids = df["numos"].fillna(-1).astype("int64").tolist()
+        base_ids = df["numos"].fillna(-1).to_numpy(dtype=np.int64)
     else:
-        base_ids = list(range(1, len(df) + 1))
+        base_ids = np.arange(1, len(df) + 1, dtype=np.int64)
 
-    job_ids = _dedup_ids(base_ids)
+    if len(np.unique(base_ids)) == len(base_ids):
+        job_ids = base_ids
+    else:
+        job_ids = np.asarray(_dedup_ids(base_ids.tolist()), dtype=np.int64)
     df["job_id_vroom"] = job_ids
 
-    jobs = []
-    for jid, (_, r) in zip(job_ids, df.iterrows()):
-        lon = float(r["longitude"]); lat = float(r["latitude"])
-        service = _service_seconds_from_row(r)  # segundos
-        jobs.append({"id": int(jid), "location": [lon, lat], "service": int(service)})
+    te_col = "TE" if "TE" in df.columns else "te"
+    te = df[te_col] if te_col in df.columns else np.zeros(len(df))
+    jobs = jobs_payload(
+        job_ids,
+        df["longitude"].to_numpy(dtype=np.float64),
+        df["latitude"].to_numpy(dtype=np.float64),
+        service_seconds(te),
+    )
     return jobs, df
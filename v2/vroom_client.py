@@ -1,6 +1,41 @@
-import json
+import asyncio
+from contextlib import ExitStack, asynccontextmanager
 import requests
 from v2 import config
+from v2.async_http import ClienteAssincrono
+from v2.vroom_payload import dumps
+
+# Semáforos que limitam as requisições simultâneas ao VROOM feitas por este
+# processo (ex.: um local por worker + um compartilhado entre os processos de
+# um sweep). Vazio = sem limite.
+_LIMITES_CONCORRENCIA = ()
+
+
+def definir_limite_concorrencia(*semaforos) -> None:
+    """
+    Define os semáforos (threading/multiprocessing) adquiridos em cada chamada
+    ao VROOM. Sem argumentos remove os limites.
+    """
+    global _LIMITES_CONCORRENCIA
+    _LIMITES_CONCORRENCIA = tuple(s for s in semaforos if s is not None)
+
+
+@asynccontextmanager
+async def _limites_async():
+    """
+    Adquire os semáforos de definir_limite_concorrencia a partir de código
+    assíncrono: a espera bloqueante roda numa thread, sem travar o loop.
+    """
+    adquiridos = []
+    try:
+        for sem in _LIMITES_CONCORRENCIA:
+            await asyncio.to_thread(sem.acquire)
+            adquiridos.append(sem)
+        yield
+    finally:
+        for sem in reversed(adquiridos):
+            sem.release()
+
 
 class VroomClient:
     def __init__(self, base_url: str = None, timeout: int = 30):
@@ -12,7 +47,10 @@ class VroomClient:
         if not url.endswith("/"):
             url += "/"
         headers = {"Content-Type": "application/json"}
-        resp = requests.post(url, headers=headers, data=json.dumps(payload), timeout=self.timeout)
+        with ExitStack() as stack:
+            for sem in _LIMITES_CONCORRENCIA:
+                stack.enter_context(sem)
+            resp = requests.post(url, headers=headers, data=dumps(payload), timeout=self.timeout)
         resp.raise_for_status()
         return resp.json()
 
@@ -39,3 +77,59 @@ class VroomClient:
             "options": {"g": False},
         }
         return self._post(payload)
+
+
+class AsyncVroomClient(ClienteAssincrono):
+    """
+    Versão assíncrona (httpx) do VroomClient, com no máximo
+    `max_concorrencia` requisições em voo por instância e os mesmos limites
+    de processo/sweep (definir_limite_concorrencia) do cliente síncrono.
+
+    Uso de biblioteca: V3/V4 resolvem os sub-grupos em sequência (cada um tira
+    as OS atribuídas do backlog antes do próximo), então não há fan-out
+    interno que o use; route_multi_many serve a quem tiver problemas
+    independentes (ex.: dias ou cenários distintos).
+    """
+
+    def __init__(self, base_url: str = None, timeout: int = 30, max_concorrencia: int = 4, client=None):
+        super().__init__(timeout=timeout, max_concorrencia=max_concorrencia, client=client)
+        self.base_url = base_url or config.VROOM_URL
+
+    def _limites(self):
+        return _limites_async()
+
+    async def _post(self, payload: dict):
+        url = f"{self.base_url}"
+        if not url.endswith("/"):
+            url += "/"
+        headers = {"Content-Type": "application/json"}
+        return await self._request("POST", url, headers=headers, content=dumps(payload))
+
+    async def route(self, vehicle: dict, jobs: list):
+        """Um único veículo + lista de jobs (ver VroomClient.route)."""
+        payload = {
+            "vehicles": [vehicle],
+            "jobs": jobs,
+            "options": {"g": False},
+        }
+        return await self._post(payload)
+
+    async def route_multi(self, vehicles: list, jobs: list):
+        """Múltiplos veículos + lista de jobs (ver VroomClient.route_multi)."""
+        payload = {
+            "vehicles": vehicles,
+            "jobs": jobs,
+            "options": {"g": False},
+        }
+        return await self._post(payload)
+
+    async def route_multi_many(self, problemas, return_exceptions: bool = True) -> list:
+        """
+        Resolve vários problemas independentes [(vehicles, jobs), ...] em
+        paralelo (limitado pelo semáforo); devolve as respostas na mesma ordem
+        (exceções no lugar das que falharem, se `return_exceptions`).
+        """
+        return await asyncio.gather(
+            *(self.route_multi(vehicles, jobs) for vehicles, jobs in problemas),
+            return_exceptions=return_exceptions,
+        )
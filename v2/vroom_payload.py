@@ -0,0 +1,174 @@
+# v2/vroom_payload.py
+"""
+Montagem colunar do payload VROOM (jobs/vehicles) a partir de arrays NumPy.
+
+Os arrays são validados/convertidos de uma vez e os dicts do JSON são criados
+numa única compreensão sobre listas Python nativas (sem iterrows / .at), e o
+payload é serializado com orjson quando disponível (fallback: json).
+
+Tempos (janelas de jobs, pausas dos veículos) usam a base relativa do VROOM:
+segundos desde o início do turno do grupo/equipe.
+"""
+import json
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+try:  # dependência opcional
+    import orjson
+except ImportError:  # pragma: no cover - depende do ambiente
+    orjson = None
+
+
+def dumps(payload: dict) -> bytes:
+    """Serializa o payload em JSON (bytes)."""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+def service_seconds(te_min) -> np.ndarray:
+    """TE (minutos; NaN/negativo = 0) → segundos inteiros."""
+    te = pd.to_numeric(pd.Series(te_min), errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    te = np.where(np.isfinite(te), np.maximum(te, 0.0), 0.0)
+    return (te * 60.0).astype(np.int64)
+
+
+def segundos_desde(instantes, inicio: pd.Timestamp) -> np.ndarray:
+    """Segundos de `inicio` até cada instante (float64; NaT → NaN)."""
+    ts = pd.to_datetime(pd.Series(instantes), errors="coerce")
+    delta = (ts - pd.Timestamp(inicio)).dt.total_seconds()
+    return delta.to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def quantizar_prioridade(valores, niveis: int = 10) -> np.ndarray:
+    """
+    `priority` VROOM (inteiro 0–100) a partir de um valor por job (maior =
+    mais importante), por faixas de percentil: `niveis` degraus igualmente
+    espaçados. Jobs do mesmo degrau empatam, e o VROOM escolhe entre eles
+    pelo custo de rota. NaN → 0; valores todos iguais → 0.
+    """
+    v = np.asarray(valores, dtype=np.float64)
+    out = np.zeros(v.shape, dtype=np.int64)
+    ok = np.isfinite(v)
+    if niveis < 2 or ok.sum() < 2 or np.ptp(v[ok]) == 0:
+        return out
+    pct = pd.Series(v[ok]).rank(method="min", pct=True).to_numpy()
+    nivel = np.ceil(pct * niveis).astype(np.int64) - 1
+    out[ok] = np.rint(nivel * 100.0 / (niveis - 1)).astype(np.int64)
+    return out
+
+
+def janelas_prazo(prazo_s, service, horizonte: int) -> List[Optional[List[List[int]]]]:
+    """
+    time_windows [[0, prazo - service]] (término até o prazo) para jobs cujo
+    prazo cai dentro do horizonte e ainda é alcançável; None para os demais
+    (sem prazo, já vencidos ou além do turno não restringem o VROOM).
+    """
+    prazo = np.asarray(prazo_s, dtype=np.float64)
+    limite = prazo - np.asarray(service, dtype=np.float64)
+    ok = np.isfinite(limite) & (limite >= 0) & (prazo < horizonte)
+    lim = np.where(ok, limite, 0).astype(np.int64).tolist()
+    return [[[0, l]] if o else None for o, l in zip(ok.tolist(), lim)]
+
+
+def breaks_pausa(pausa_ini_s, pausa_fim_s, horizonte) -> List[Optional[List[Dict]]]:
+    """
+    breaks VROOM (um por veículo) para a pausa [ini, fim) da equipe: início
+    fixo em `ini` e duração fim - ini. None se a pausa não couber no turno.
+    """
+    ini = np.asarray(pausa_ini_s, dtype=np.float64)
+    fim = np.asarray(pausa_fim_s, dtype=np.float64)
+    hor = np.broadcast_to(np.asarray(horizonte, dtype=np.float64), ini.shape)
+    ok = np.isfinite(ini) & np.isfinite(fim) & (ini >= 0) & (fim > ini) & (fim <= hor)
+    ini_l = np.where(ok, ini, 0).astype(np.int64).tolist()
+    dur_l = np.where(ok, fim - ini, 0).astype(np.int64).tolist()
+    return [
+        [{"id": 1, "time_windows": [[i, i]], "service": d}] if o else None
+        for o, i, d in zip(ok.tolist(), ini_l, dur_l)
+    ]
+
+
+def jobs_payload(
+    ids: Sequence[int],
+    lon: Sequence[float],
+    lat: Sequence[float],
+    service: Sequence[int],
+    delivery: Optional[Sequence[int]] = None,
+    priority: Optional[Sequence[int]] = None,
+    time_windows: Optional[Sequence[Optional[List[List[int]]]]] = None,
+) -> List[Dict]:
+    """
+    Lista de jobs VROOM: {"id", "location": [lon, lat], "service"} e, se
+    informados, "delivery": [q], "priority" e "time_windows" (None = sem janela).
+    """
+    ids_l = np.asarray(ids, dtype=np.int64).tolist()
+    locs = np.column_stack(
+        [np.asarray(lon, dtype=np.float64), np.asarray(lat, dtype=np.float64)]
+    ).tolist()
+    serv = np.asarray(service, dtype=np.int64).tolist()
+    jobs = [
+        {"id": i, "location": loc, "service": s}
+        for i, loc, s in zip(ids_l, locs, serv)
+    ]
+    if delivery is not None:
+        for job, q in zip(jobs, np.asarray(delivery, dtype=np.int64).tolist()):
+            job["delivery"] = [q]
+    if priority is not None:
+        for job, p in zip(jobs, np.asarray(priority, dtype=np.int64).tolist()):
+            job["priority"] = p
+    if time_windows is not None:
+        for job, tw in zip(jobs, time_windows):
+            if tw:
+                job["time_windows"] = tw
+    return jobs
+
+
+def vehicles_payload(
+    ids: Sequence[int],
+    lon: Sequence[float],
+    lat: Sequence[float],
+    tw_fim: Sequence[int],
+    capacity: Optional[Sequence[int]] = None,
+    tw_inicio: Optional[Sequence[int]] = None,
+    breaks: Optional[Sequence[Optional[List[Dict]]]] = None,
+    steps: Optional[Sequence[Optional[List[Dict]]]] = None,
+    lon_fim: Optional[Sequence[float]] = None,
+    lat_fim: Optional[Sequence[float]] = None,
+) -> List[Dict]:
+    """
+    Lista de veículos VROOM saindo de (lon, lat) e voltando para (lon_fim,
+    lat_fim) (padrão: o próprio ponto de saída), com time_window
+    [tw_inicio (padrão 0), tw_fim] e, se informados, capacity [c], breaks
+    (None = sem pausa) e steps iniciais (warm start; None = sem seed).
+    """
+    ids_l = np.asarray(ids, dtype=np.int64).tolist()
+    locs = np.column_stack(
+        [np.asarray(lon, dtype=np.float64), np.asarray(lat, dtype=np.float64)]
+    ).tolist()
+    if lon_fim is None or lat_fim is None:
+        fins = [list(loc) for loc in locs]
+    else:
+        fins = np.column_stack(
+            [np.asarray(lon_fim, dtype=np.float64), np.asarray(lat_fim, dtype=np.float64)]
+        ).tolist()
+    fim = np.asarray(tw_fim, dtype=np.int64)
+    ini = np.zeros_like(fim) if tw_inicio is None else np.asarray(tw_inicio, dtype=np.int64)
+    janelas = np.column_stack([ini, fim]).tolist()
+    vehicles = [
+        {"id": i, "start": loc, "end": fim_loc, "time_window": tw}
+        for i, loc, fim_loc, tw in zip(ids_l, locs, fins, janelas)
+    ]
+    if capacity is not None:
+        for veh, c in zip(vehicles, np.asarray(capacity, dtype=np.int64).tolist()):
+            veh["capacity"] = [c]
+    if breaks is not None:
+        for veh, brk in zip(vehicles, breaks):
+            if brk:
+                veh["breaks"] = brk
+    if steps is not None:
+        for veh, seq in zip(vehicles, steps):
+            if seq:
+                veh["steps"] = seq
+    return vehicles
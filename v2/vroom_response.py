@@ -0,0 +1,131 @@
+# v2/vroom_response.py
+"""
+Decodificação colunar da resposta do VROOM.
+
+`routes[].steps[]` é achatado numa única passada em arrays NumPy (um
+elemento por step do tipo "job"), sem dicts intermediários por job; o
+resultado é um DataFrame que se junta ao pool por `job_id_vroom` e às
+equipes por `vehicle` com merges simples.
+
+Os steps trazem distance/duration acumulados; a diferença entre steps
+consecutivos dá o trecho real percorrido até cada job (leg_*), e o trecho
+do último job de volta à base fica em retorno_*.
+"""
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+PASSO_COLS = [
+    "vehicle",           # id do veículo VROOM
+    "job",               # id do job VROOM (job_id_vroom)
+    "arrival",           # chegada no job (s desde o início relativo)
+    "distance",          # distância acumulada na chegada (m)
+    "duration",          # tempo de deslocamento acumulado na chegada (s)
+    "leg_distance",      # distância do step anterior até o job (m)
+    "leg_duration",      # deslocamento do step anterior até o job (s)
+    "retorno_distance",  # último job da rota → base (m); 0 nos demais
+    "retorno_duration",  # último job da rota → base (s); 0 nos demais
+    "rota_arrival",      # chegada no fim da rota (s)
+    "rota_distance",     # distância total da rota (m)
+    "rota_duration",     # deslocamento total da rota (s)
+    "rota_jobs",         # nº de jobs da rota
+]
+
+
+def _num(v) -> float:
+    return np.nan if v is None else float(v)
+
+
+def decodificar_rotas(resp: Dict) -> pd.DataFrame:
+    """
+    Um registro por job atendido (na ordem das rotas), com as colunas de
+    PASSO_COLS. Steps sem `arrival` são ignorados; se a rota não trouxer
+    `arrival`, usa a chegada do step "end". Sem distance/duration nos steps
+    os trechos ficam NaN.
+    """
+    veh, job, arr, dist, dur = [], [], [], [], []
+    leg_dist, leg_dur, ret_dist, ret_dur = [], [], [], []
+    r_arr, r_dist, r_dur, r_n = [], [], [], []
+
+    for route in resp.get("routes", []) or []:
+        v_id = route.get("vehicle")
+        steps = route.get("steps", []) or []
+        fim = route.get("arrival")
+        fim_dist = fim_dur = np.nan
+        prev_dist = prev_dur = 0.0
+        n0 = len(job)
+        for st in steps:
+            tipo = st.get("type")
+            if tipo == "job":
+                a = st.get("arrival")
+                if a is None:
+                    continue
+                d, t = _num(st.get("distance")), _num(st.get("duration"))
+                veh.append(v_id)
+                job.append(st.get("job", st.get("id")))
+                arr.append(a)
+                dist.append(d)
+                dur.append(t)
+                leg_dist.append(d - prev_dist)
+                leg_dur.append(t - prev_dur)
+                prev_dist, prev_dur = d, t
+            elif tipo == "start":
+                prev_dist = _num(st.get("distance", 0))
+                prev_dur = _num(st.get("duration", 0))
+            elif tipo == "end":
+                fim_dist, fim_dur = _num(st.get("distance")), _num(st.get("duration"))
+                if fim is None:
+                    fim = st.get("arrival")
+        n = len(job) - n0
+        if n:
+            # trecho de volta à base: do último job até o step "end" (ou total da rota)
+            if np.isnan(fim_dist):
+                fim_dist = _num(route.get("distance"))
+            if np.isnan(fim_dur):
+                fim_dur = _num(route.get("duration"))
+            ret_dist.extend([0.0] * (n - 1) + [fim_dist - prev_dist])
+            ret_dur.extend([0.0] * (n - 1) + [fim_dur - prev_dur])
+        r_arr.extend([_num(fim)] * n)
+        r_dist.extend([_num(route.get("distance", 0))] * n)
+        r_dur.extend([_num(route.get("duration", 0))] * n)
+        r_n.extend([n] * n)
+
+    return pd.DataFrame(
+        {
+            "vehicle": np.asarray(veh, dtype=np.int64),
+            "job": np.asarray(job, dtype=np.int64),
+            "arrival": np.asarray(arr, dtype=np.float64),
+            "distance": np.asarray(dist, dtype=np.float64),
+            "duration": np.asarray(dur, dtype=np.float64),
+            "leg_distance": np.asarray(leg_dist, dtype=np.float64),
+            "leg_duration": np.asarray(leg_dur, dtype=np.float64),
+            "retorno_distance": np.asarray(ret_dist, dtype=np.float64),
+            "retorno_duration": np.asarray(ret_dur, dtype=np.float64),
+            "rota_arrival": np.asarray(r_arr, dtype=np.float64),
+            "rota_distance": np.asarray(r_dist, dtype=np.float64),
+            "rota_duration": np.asarray(r_dur, dtype=np.float64),
+            "rota_jobs": np.asarray(r_n, dtype=np.int64),
+        },
+        columns=PASSO_COLS,
+    )
+
+
+def trechos_por_job(passos: pd.DataFrame, incluir_retorno: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (km, minutos) de deslocamento atribuídos a cada job de `passos`: o trecho
+    real até o job e, com `incluir_retorno`, a volta à base somada ao último
+    job da rota (assim a soma por rota bate com o total do VROOM). Rotas sem
+    distance/duration por step caem na divisão igual do total da rota.
+    """
+    dist = passos["leg_distance"].to_numpy(dtype=np.float64)
+    dur = passos["leg_duration"].to_numpy(dtype=np.float64)
+    if incluir_retorno:
+        dist = dist + passos["retorno_distance"].to_numpy(dtype=np.float64)
+        dur = dur + passos["retorno_duration"].to_numpy(dtype=np.float64)
+
+    n_rota = np.maximum(passos["rota_jobs"].to_numpy(), 1)
+    dist = np.where(np.isnan(dist), passos["rota_distance"].to_numpy() / n_rota, dist)
+    dur = np.where(np.isnan(dur), passos["rota_duration"].to_numpy() / n_rota, dur)
+    return dist / 1000.0, dur / 60.0
@@ -0,0 +1,80 @@
+# v2/warm_start.py
+"""
+Warm start do VROOM: reaproveita a rota planejada para cada equipe como
+solução inicial (`steps` do veículo) ao resolver o grupo dela.
+
+As rotas vêm do horizonte rolante do V4: no dia D a equipe do dia D+1 entra
+como veículo extra e a rota dela é descartada (jobs voltam ao backlog), mas
+fica registrada aqui. Só entram no seed os jobs dessa rota que ainda estão
+pendentes e presentes no payload atual (cada job em no máximo um veículo,
+respeitando a capacidade); o VROOM parte dessa rota em vez de do zero, o que
+reduz o tempo de otimização e mantém as rotas estáveis entre os dias.
+Cada rota guarda o dia para o qual foi planejada e é descartada quando esse
+dia fica para trás (`descartar_ate`), então equipes que somem da escala não
+acumulam rotas velhas.
+"""
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+class RotasAnteriores:
+    """Última sequência de numos (ordem de chegada) planejada para cada equipe."""
+
+    def __init__(self):
+        self._rotas: Dict[str, np.ndarray] = {}
+        self._dias: Dict[str, Optional[pd.Timestamp]] = {}
+
+    def __len__(self) -> int:
+        return len(self._rotas)
+
+    def registrar(self, df_atrib: pd.DataFrame, dia=None) -> None:
+        """
+        Guarda as rotas de `df_atrib` (colunas equipe, numos, dth_chegada_estimada),
+        planejadas para `dia` (None: sem validade).
+        """
+        if df_atrib.empty:
+            return
+        ordenado = df_atrib.sort_values(["equipe", "dth_chegada_estimada"], kind="stable")
+        equipes = ordenado["equipe"].astype(str).to_numpy()
+        numos = ordenado["numos"].to_numpy(dtype=np.int64)
+        cortes = np.flatnonzero(equipes[1:] != equipes[:-1]) + 1
+        dia = None if dia is None else pd.Timestamp(dia).normalize()
+        for nomes, ids in zip(np.split(equipes, cortes), np.split(numos, cortes)):
+            self._rotas[nomes[0]] = ids
+            self._dias[nomes[0]] = dia
+
+    def descartar_ate(self, dia) -> int:
+        """Remove as rotas planejadas para dias anteriores a `dia`; devolve quantas saíram."""
+        dia = pd.Timestamp(dia).normalize()
+        velhas = [nome for nome, d in self._dias.items() if d is not None and d < dia]
+        for nome in velhas:
+            del self._rotas[nome], self._dias[nome]
+        return len(velhas)
+
+    def steps(
+        self,
+        equipes: Sequence[str],
+        numos_para_job: Dict[int, int],
+        capacidade: Optional[int] = None,
+    ) -> List[Optional[List[Dict]]]:
+        """
+        `steps` iniciais por veículo (na ordem de `equipes`), com os jobs da
+        rota anterior ainda presentes em `numos_para_job` (numos → id do job
+        no payload atual). None quando a equipe não tem rota aproveitável.
+        """
+        usados = set()
+        out: List[Optional[List[Dict]]] = []
+        for nome in equipes:
+            seq = []
+            for n in self._rotas.get(str(nome), ()):
+                jid = numos_para_job.get(int(n))
+                if jid is None or jid in usados:
+                    continue
+                if capacidade is not None and len(seq) >= capacidade:
+                    break
+                usados.add(jid)
+                seq.append({"type": "job", "id": int(jid)})
+            out.append([{"type": "start"}, *seq, {"type": "end"}] if seq else None)
+        return out
@@ -2,13 +2,30 @@
 from pathlib import Path
 import pandas as pd
 
-from v2.data_loader import _read_parquet_any, _prep_tecnicos, _prep_comercial
+from v2.data_loader import (
+    _read_parquet_any,
+    _prep_tecnicos,
+    _prep_comercial,
+    _filtrar_janela,
+    _window_filters,
+)
+from v2.cache import cached_frame
+from v2.osrm_client import OSRMClient
+from v2.snap_cache import arquivo_snap, cache_snap, snapar_coordenadas, tag_osrm
 
 
 DATA_DIRS = [Path("data"), Path("/data")]
 
+# Colunas de Equipes.parquet usadas pelo V3/V4 (projeção case-insensitive)
+EQUIPES_COLUMNS = [
+    "tip_equipe", "tipo_equipe", "equipe", "dt_ref", "dthaps_ini", "dthaps_fim",
+    "data_inicio_turno", "data_fim_turno", "dthaps_fim_ajustado",
+    "dthpausa_ini", "dthpausa_fim", "base_lon", "base_lat",
+]
+EQUIPES_DATE_COLS = ("dt_ref", "data_inicio_turno")
 
-def prepare_equipes_v3() -> pd.DataFrame:
+
+def prepare_equipes_v3(data_ini=None, data_fim=None, usar_cache: bool = True) -> pd.DataFrame:
     """Carrega Equipes.parquet mantendo colunas de pausa e base da equipe.
 
     Campos principais padronizados:
@@ -22,8 +39,26 @@ def prepare_equipes_v3() -> pd.DataFrame:
     - dthpausa_ini
     - dthpausa_fim
     - base_lon, base_lat (base específica da equipe)
+
+    data_ini/data_fim (opcionais) restringem a leitura aos dias da janela.
+    O resultado normalizado fica em cache (ver v2.cache) até Equipes.parquet mudar.
     """
-    df = _read_parquet_any("Equipes.parquet").copy()
+    return cached_frame(
+        "equipes",
+        ["Equipes.parquet"],
+        lambda: _build_equipes(data_ini, data_fim),
+        usar_cache=usar_cache,
+        data_ini=data_ini,
+        data_fim=data_fim,
+    )
+
+
+def _build_equipes(data_ini=None, data_fim=None) -> pd.DataFrame:
+    df = _read_parquet_any(
+        "Equipes.parquet",
+        columns=EQUIPES_COLUMNS,
+        filters=_window_filters(EQUIPES_DATE_COLS, data_ini, data_fim),
+    )
     df.columns = df.columns.str.lower()
 
     rename = {
@@ -62,6 +97,7 @@ def prepare_equipes_v3() -> pd.DataFrame:
         df["dt_ref"] = pd.to_datetime(df["dt_ref"], errors="coerce").dt.normalize()
     else:
         df["dt_ref"] = pd.to_datetime(df["data_inicio_turno"], errors="coerce").dt.normalize()
+    df = _filtrar_janela(df, "dt_ref", data_ini, data_fim)
 
     # chaves de turno consolidadas
     df["inicio_turno"] = pd.to_datetime(df.get("data_inicio_turno"), errors="coerce")
@@ -95,26 +131,61 @@ def prepare_equipes_v3() -> pd.DataFrame:
     return df[keep].copy()
 
 
-def prepare_pendencias_v3():
+def _finalizar_pendencias(d: pd.DataFrame) -> pd.DataFrame:
+    # coordenadas já vêm numéricas (float32) do _prep_*; remover linhas sem coordenadas válidas
+    d = d.dropna(subset=["latitude", "longitude"])
+    # descartar equipe histórica
+    if "equipe" in d.columns:
+        d = d.drop(columns=["equipe"])
+    return d.reset_index(drop=True)
+
+
+def prepare_pendencias_v3(data_ini=None, data_fim=None, usar_cache: bool = True, snap: bool = False, osrm_url=None):
     """Carrega pendências técnicas e comerciais para o V3.
 
     - Reutiliza o pré-processamento do V2.
+    - data_fim (opcional): só OS solicitadas até o fim da janela (filtro no parquet);
+      as solicitadas antes de data_ini ficam, pois são o backlog herdado.
     - Normaliza coordenadas.
     - Remove linhas sem latitude/longitude.
     - Descarta coluna "equipe" das bases técnicas e comerciais.
+    - Layout compacto: numos int64, tipo_serv categórico, coordenadas/TE/TD float32.
+    - O dataset normalizado fica em cache (data/cache/*.arrow) até os parquets de origem mudarem.
+    - snap=True: coordenadas dos jobs snapadas à via (OSRM /nearest, uma vez por
+      ponto distinto, cache persistente em data/cache/snap-*.arrow) e gravadas no
+      dataset normalizado; originais em longitude_bruta/latitude_bruta.
     """
-    tec = _prep_tecnicos()
-    com = _prep_comercial()
-    com.to_parquet("E:/Rotas-Inteligentes/data/BaseCom.parquet")
-    tec.to_parquet("E:/Rotas-Inteligentes/data/BaseTec.parquet")
-
-    for d in (tec, com):
-        for c in ["latitude", "longitude"]:
-            d[c] = pd.to_numeric(d[c], errors="coerce")
-        # remover linhas sem coordenadas válidas
-        d.dropna(subset=["latitude", "longitude"], inplace=True)
-        # descartar equipe histórica
-        if "equipe" in d.columns:
-            d.drop(columns=["equipe"], inplace=True)
-
-    return tec.reset_index(drop=True), com.reset_index(drop=True)
\ No newline at end of file
+    osrm = OSRMClient(base_url=osrm_url) if snap else None
+    arquivo = arquivo_snap(osrm) if snap else None
+    if snap:
+        cache_snap().carregar(arquivo)
+    consultas = cache_snap().consultas
+
+    def _build(prep):
+        df = _finalizar_pendencias(prep(data_ini, data_fim))
+        return snapar_coordenadas(df, osrm) if snap else df
+
+    tec = cached_frame(
+        "pend_tec",
+        ["atendTec.parquet"],
+        lambda: _build(_prep_tecnicos),
+        usar_cache=usar_cache,
+        data_fim=data_fim,  # data_ini não muda as pendências carregadas
+        snap=tag_osrm(osrm) if snap else None,
+    )
+    com = cached_frame(
+        "pend_com",
+        ["ServCom.parquet"],
+        lambda: _build(_prep_comercial),
+        usar_cache=usar_cache,
+        data_fim=data_fim,
+        snap=tag_osrm(osrm) if snap else None,
+    )
+    if snap:
+        # pontos que falharam na carga (OSRM indisponível) são re-tentados a cada carga
+        tec = snapar_coordenadas(tec, osrm)
+        com = snapar_coordenadas(com, osrm)
+        if cache_snap().consultas > consultas:
+            cache_snap().salvar(arquivo)
+    # numos não numéricos: tabela lateral id -> texto em df.attrs["numos_side"] (preservada no cache)
+    return tec, com
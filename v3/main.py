@@ -2,21 +2,29 @@
 import sys
 import os
 import argparse
+import tracemalloc
 from pathlib import Path
 from datetime import datetime
+import multiprocessing as mp
+from contextlib import nullcontext
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from typing import List, Dict
 
+import numpy as np
 import pandas as pd
 
 # permitir rodar de qualquer pasta
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 from v3.data_loader import prepare_equipes_v3, prepare_pendencias_v3
-from v3.optimization import MetaHeuristicaV3
+from v3.optimization import BacklogV3, MetaHeuristicaV3, snap_bases
+from v2.osrm_client import OSRMClient
+from v2.data_loader import tabela_numos
+from v2.result_writer import ResultDatasetWriter, contagem_valores
+from v2.snap_cache import arquivo_snap, cache_snap
 
 
 RESULTS_DIR = Path("results_v3")
-RESULTS_DIR.mkdir(exist_ok=True)
 
 # colunas mínimas que queremos garantir no resultado
 REQUIRED_COLS = [
@@ -80,21 +88,110 @@ def _ensure_result_schema(df: pd.DataFrame) -> pd.DataFrame:
     return df[ordered + extras]
 
 
-def _tem_pendencias_atendiveis(
-    pend_tec_global: pd.DataFrame,
-    pend_com_global: pd.DataFrame,
-    ini_turno_min: pd.Timestamp,
-) -> bool:
-    """Retorna True se ainda existem OS com datasol <= menor início de turno do dia."""
-    if not pend_tec_global.empty:
-        ds_tec = pd.to_datetime(pend_tec_global["datasol"], errors="coerce")
-        if (ds_tec <= ini_turno_min).any():
-            return True
-    if not pend_com_global.empty:
-        ds_com = pd.to_datetime(pend_com_global["datasol"], errors="coerce")
-        if (ds_com <= ini_turno_min).any():
-            return True
-    return False
+def _otimizar_equipe(
+    equipe_row: pd.Series, pool: pd.DataFrame, capacidade_restante: int, solver_local: int = 0,
+    so_sequenciar: bool = False,
+):
+    """
+    Roda a meta-heurística para uma equipe; devolve o DataFrame da rota ou None.
+    `so_sequenciar`: o pool já é a rota, só sequencia (MetaHeuristicaV3.resequenciar).
+    """
+    nome_eq = str(equipe_row.get("nome", "N/D"))
+    mh = MetaHeuristicaV3(
+        equipe_row, limite_por_equipe=capacidade_restante, pool=pool, solver_local_max_jobs=solver_local
+    )
+    try:
+        sol = mh.resequenciar(pool) if so_sequenciar else mh.otimizar_para_equipe()
+    except Exception as e:
+        log(f"💥 Falha na equipe {nome_eq}: {e}")
+        return None
+
+    if not sol or not isinstance(sol.get("resp"), pd.DataFrame) or sol["resp"].empty:
+        return None
+    return sol["resp"]
+
+
+def _iniciar_worker(snaps: dict) -> None:
+    # processos não herdam o cache de snapping do processo principal
+    cache_snap().atualizar(snaps)
+
+
+def _criar_executor(modo: str, workers: int) -> Executor:
+    """
+    Pool da otimização paralela: "thread" quando o tempo é dominado pelas
+    chamadas VROOM/OSRM; "process" quando AG/SA/ACO (CPU) pesam mais.
+    """
+    if modo == "process":
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=mp.get_context("spawn"),
+            initializer=_iniciar_worker,
+            initargs=(cache_snap().itens(),),
+        )
+    return ThreadPoolExecutor(max_workers=workers)
+
+
+def _log_memoria(rotulo: str) -> None:
+    """Memória Python alocada (atual/pico) desde o último log, com --perfil-memoria."""
+    if not tracemalloc.is_tracing():
+        return
+    atual, pico = tracemalloc.get_traced_memory()
+    log(f"🧠 {rotulo}: memória atual={atual / 2**20:.1f} MB | pico={pico / 2**20:.1f} MB")
+    tracemalloc.reset_peak()
+
+
+def _pool_da_equipe(backlog: BacklogV3, equipe_row: pd.Series, capacidade: int) -> pd.DataFrame:
+    ini_turno_eq = pd.to_datetime(equipe_row.get("inicio_turno"), errors="coerce")
+    if pd.isna(ini_turno_eq):
+        return pd.DataFrame()
+    return backlog.pool_equipe(ini_turno_eq, capacidade)
+
+
+def _otimizar_rodada_paralela(executor: Executor, candidatas, backlog: BacklogV3, solver_local: int = 0) -> list:
+    """
+    Otimiza todas as equipes da rodada em paralelo sobre o mesmo snapshot do
+    backlog (cada tarefa recebe só o pool da sua equipe). Conflitos de numos
+    ficam com a equipe de turno mais cedo (empate: nome, a ordem de
+    `candidatas`); a perdedora perde só as OS disputadas, que são repostas
+    pelas próximas livres do seu pool, e a rota é re-sequenciada
+    (MetaHeuristicaV3.resequenciar: uma chamada VROOM/solver local, sem AG/SA/ACO).
+    Resultados na ordem de `candidatas`.
+    """
+    pools = [_pool_da_equipe(backlog, equipe_row, capacidade) for equipe_row, capacidade in candidatas]
+    futuros = [
+        executor.submit(_otimizar_equipe, equipe_row, pool, capacidade, solver_local)
+        for (equipe_row, capacidade), pool in zip(candidatas, pools)
+    ]
+    resultados = [f.result() for f in futuros]
+
+    reservados = np.empty(0, dtype=np.int64)
+    refazer = {}
+    for i, ((equipe_row, capacidade), pool, df_resp) in enumerate(zip(candidatas, pools, resultados)):
+        if df_resp is None:
+            continue
+        ids = df_resp["numos"].dropna().to_numpy(dtype=np.int64)
+        disputadas = np.isin(ids, reservados)
+        if disputadas.any():
+            # mantidas + as próximas livres do pool da equipe até a capacidade
+            livres = pool[~pool["numos"].isin(reservados)]
+            mantida = livres["numos"].isin(ids[~disputadas])
+            novo_pool = pd.concat([livres[mantida], livres[~mantida].head(capacidade - int(mantida.sum()))])
+            log(
+                f"   ✂️  {equipe_row.get('nome', 'N/D')}: {int(disputadas.sum())} OS em conflito com equipe "
+                f"prioritária; re-sequenciando {len(novo_pool)}"
+            )
+            resultados[i] = None
+            ids = novo_pool["numos"].to_numpy(dtype=np.int64)
+            if len(ids):
+                refazer[i] = executor.submit(
+                    _otimizar_equipe, equipe_row, novo_pool, len(ids), solver_local, so_sequenciar=True
+                )
+        # reservadas já: a rota re-sequenciada é subconjunto do novo pool
+        reservados = np.concatenate([reservados, ids])
+
+    for i, futuro in refazer.items():
+        resultados[i] = futuro.result()
+    return resultados
 
 
 def simular_v3(
@@ -103,6 +200,10 @@ def simular_v3(
     df_co: pd.DataFrame,
     limite_por_equipe: int = 15,
     debug: bool = False,
+    writer: ResultDatasetWriter = None,
+    paralelo: int = 0,
+    modo_paralelo: str = "thread",
+    solver_local: int = 0,
 ) -> None:
     """Simulação V3:
     - Equipe inicia/termina na própria base (base_lon/base_lat).
@@ -110,6 +211,15 @@ def simular_v3(
     - Backlog: OS não atribuídas com datasol <= inicio_turno_min são herdadas para os próximos dias.
     - Enquanto houver OS atendíveis e alguma equipe tiver capacidade, o algoritmo tenta atribuir OS (rodadas).
     - Deslocamento prioritário via VROOM; fallback OSRM; último recurso Haversine.
+    - Resultados gravados no dataset particionado por dia (RESULTS_DIR/dia=AAAA-MM-DD).
+    - paralelo > 1: as equipes de cada rodada otimizam em paralelo sobre o mesmo
+      backlog; OS disputadas ficam com a equipe de turno mais cedo (empate: nome)
+      e as demais equipes do conflito re-sequenciam a rota sem elas (uma chamada
+      VROOM a mais por equipe em conflito: o sequencial faz menos chamadas; o
+      ganho vem de sobrepor AG/SA/ACO, em geral com modo_paralelo="process").
+      modo_paralelo: "thread" (padrão) ou "process".
+    - solver_local > 0: rotas com até esse número de jobs são resolvidas em
+      processo (inserção mais barata + 2-opt, v2.solver_local) sem chamar o VROOM.
     """
 
     dias = sorted(pd.to_datetime(df_eq["dt_ref"].dropna().unique()))
@@ -119,113 +229,74 @@ def simular_v3(
 
     log(f"\n📆 Simulação V3 de {len(dias)} dias ({dias[0].date()} → {dias[-1].date()})\n")
 
-    pend_tec_global = df_te.copy()
-    pend_com_global = df_co.copy()
-
-    # Normaliza dt_ref nas pendências para comparação com dia
-    pend_tec_global["dt_ref"] = pd.to_datetime(pend_tec_global["dt_ref"], errors="coerce").dt.normalize()
-    pend_com_global["dt_ref"] = pd.to_datetime(pend_com_global["dt_ref"], errors="coerce").dt.normalize()
-
-    for i, dia in enumerate(dias, 1):
-        log("=" * 120)
-        log(f"🗓️  Dia {i}/{len(dias)} — {dia.date()}")
-
-        eq_dia = df_eq[df_eq["dt_ref"] == dia].copy()
-        num_equipes = len(eq_dia)
-        log(f"👥 Equipes no dia: {num_equipes}")
-
-        if eq_dia.empty:
-            log("⚠️  Nenhuma equipe para este dia.")
-            continue
-
-        # ordenar equipes por início de turno para processar em ordem temporal
-        eq_dia = eq_dia.sort_values("inicio_turno")
-        ini_turno_min = pd.to_datetime(eq_dia["inicio_turno"], errors="coerce").min()
-
-        # --- Cálculo de pendências novas, backlog e total (para log) ---
-        if not pend_tec_global.empty:
-            ds_tec = pd.to_datetime(pend_tec_global["datasol"], errors="coerce")
-            mask_tec_elig = ds_tec <= ini_turno_min
-            mask_tec_new = mask_tec_elig & (pend_tec_global["dt_ref"] == dia)
-            mask_tec_backlog = mask_tec_elig & (pend_tec_global["dt_ref"] < dia)
-            pend_new_tec = mask_tec_new.sum()
-            pend_backlog_tec = mask_tec_backlog.sum()
-        else:
-            pend_new_tec = pend_backlog_tec = 0
-
-        if not pend_com_global.empty:
-            ds_com = pd.to_datetime(pend_com_global["datasol"], errors="coerce")
-            mask_com_elig = ds_com <= ini_turno_min
-            mask_com_new = mask_com_elig & (pend_com_global["dt_ref"] == dia)
-            mask_com_backlog = mask_com_elig & (pend_com_global["dt_ref"] < dia)
-            pend_new_com = mask_com_new.sum()
-            pend_backlog_com = mask_com_backlog.sum()
-        else:
-            pend_new_com = pend_backlog_com = 0
-
-        total_new = pend_new_tec + pend_new_com
-        total_backlog = pend_backlog_tec + pend_backlog_com
-        total_pend = total_new + total_backlog
-
-        log(
-            f"📦 Pendências no início do dia: total={total_new} "
-            f"(Tec={pend_new_tec} | Com={pend_new_com})"
-        )
-        log(
-            f"📦 Pendências backlog: total={total_backlog} "
-            f"(Tec={pend_backlog_tec} | Com={pend_backlog_com})"
-        )
-        log(
-            f"📦 Total Pendencias: total={total_pend} "
-            f"(Tec={pend_new_tec + pend_backlog_tec} | Com={pend_new_com + pend_backlog_com})"
-        )
-
-        atribs_dia: List[pd.DataFrame] = []
-
-        # mapa equipe -> OS já atribuídas (para respeitar limite diário)
-        atrib_por_equipe: Dict[str, int] = {
-            str(row["nome"]): 0 for _, row in eq_dia.iterrows()
-        }
-
-        rodada = 0
-        while True:
-            rodada += 1
-            any_assigned_this_round = False
-
-            # condição de parada: não há mais OS atendíveis para este dia
-            if not _tem_pendencias_atendiveis(pend_tec_global, pend_com_global, ini_turno_min):
-                break
-
-            # condição de parada: nenhuma equipe tem capacidade restante
-            if all(atrib_por_equipe[nome] >= limite_por_equipe for nome in atrib_por_equipe):
-                break
-
-            log(f"🔁 Rodada {rodada} de atribuição no dia {dia.date()}")
-
-            for _, equipe_row in eq_dia.iterrows():
+    if writer is None:
+        writer = ResultDatasetWriter(RESULTS_DIR)
+
+    # frames de entrada não são alterados: cada equipe recebe só o seu pool
+    # (índices sobre o backlog), sem cópias do backlog inteiro por equipe/rodada
+    backlog = BacklogV3(df_te, df_co)
+    numos_side = tabela_numos(df_te, df_co)  # numos não numéricos, restaurados na gravação
+
+    # bases distintas snapadas uma vez (as equipes/rodadas seguintes usam o cache)
+    consultas_antes = cache_snap().consultas
+    n_bases = snap_bases(df_eq)
+    log(f"📍 Bases distintas: {n_bases} | consultas /nearest: {cache_snap().consultas - consultas_antes}")
+
+    # pool criado uma vez e reaproveitado em todas as rodadas/dias
+    pool = _criar_executor(modo_paralelo, paralelo) if paralelo > 1 else nullcontext()
+    with pool as executor:
+        for i, dia in enumerate(dias, 1):
+            log("=" * 120)
+            log(f"🗓️  Dia {i}/{len(dias)} — {dia.date()}")
+
+            eq_dia = df_eq[df_eq["dt_ref"] == dia].copy()
+            num_equipes = len(eq_dia)
+            log(f"👥 Equipes no dia: {num_equipes}")
+
+            if eq_dia.empty:
+                log("⚠️  Nenhuma equipe para este dia.")
+                continue
+
+            # ordenar equipes por início de turno para processar em ordem temporal
+            eq_dia = eq_dia.sort_values(["inicio_turno", "nome"], kind="stable")
+            ini_turno_min = pd.to_datetime(eq_dia["inicio_turno"], errors="coerce").min()
+
+            # Pendências novas vs backlog (para log)
+            cont = backlog.contar(ini_turno_min, dia)
+            pend_new_tec, pend_backlog_tec = cont["tec_new"], cont["tec_backlog"]
+            pend_new_com, pend_backlog_com = cont["com_new"], cont["com_backlog"]
+
+            total_new = pend_new_tec + pend_new_com
+            total_backlog = pend_backlog_tec + pend_backlog_com
+            total_pend = total_new + total_backlog
+
+            log(
+                f"📦 Pendências no início do dia: total={total_new} "
+                f"(Tec={pend_new_tec} | Com={pend_new_com})"
+            )
+            log(
+                f"📦 Pendências backlog: total={total_backlog} "
+                f"(Tec={pend_backlog_tec} | Com={pend_backlog_com})"
+            )
+            log(
+                f"📦 Total Pendencias: total={total_pend} "
+                f"(Tec={pend_new_tec + pend_backlog_tec} | Com={pend_new_com + pend_backlog_com})"
+            )
+
+            atribs_dia: List[pd.DataFrame] = []
+
+            # mapa equipe -> OS já atribuídas (para respeitar limite diário)
+            atrib_por_equipe: Dict[str, int] = {
+                str(row["nome"]): 0 for _, row in eq_dia.iterrows()
+            }
+
+            def registrar(equipe_row: pd.Series, df_resp: pd.DataFrame) -> None:
+                """Aceita a rota da equipe: grava, consome capacidade e tira as OS do backlog."""
+                nonlocal any_assigned_this_round
                 nome_eq = str(equipe_row.get("nome", "N/D"))
                 ini_turno_eq = pd.to_datetime(equipe_row.get("inicio_turno"), errors="coerce")
-                ja_atribuidas = atrib_por_equipe.get(nome_eq, 0)
-                capacidade_restante = limite_por_equipe - ja_atribuidas
-
-                if capacidade_restante <= 0:
-                    continue
-
-                # snapshot atual das pendências globais para esta equipe
-                pend_tec_dia = pend_tec_global.copy()
-                pend_com_dia = pend_com_global.copy()
-
-                mh = MetaHeuristicaV3(equipe_row, pend_tec_dia, pend_com_dia, capacidade_restante)
-                try:
-                    sol = mh.otimizar_para_equipe()
-                except Exception as e:
-                    log(f"💥 Falha na equipe {nome_eq}: {e}")
-                    continue
 
-                if not sol or not isinstance(sol.get("resp"), pd.DataFrame) or sol["resp"].empty:
-                    continue
-
-                df_resp = sol["resp"].copy()
+                df_resp = df_resp.copy()
                 # chegada_base = fim_turno_estimado
                 if "fim_turno_estimado" in df_resp.columns:
                     df_resp["chegada_base"] = df_resp["fim_turno_estimado"]
@@ -247,39 +318,15 @@ def simular_v3(
 
                 atribs_dia.append(df_resp)
                 any_assigned_this_round = True
-                atrib_por_equipe[nome_eq] = ja_atribuidas + qtd
+                atrib_por_equipe[nome_eq] = atrib_por_equipe.get(nome_eq, 0) + qtd
 
-                # Remover OS atribuídas (numos) dos pools globais
+                # Remover OS atribuídas (numos) do backlog
                 if "numos" in df_resp.columns:
-                    atendidos = (
-                        df_resp["numos"]
-                        .dropna()
-                        .astype(str)
-                        .unique()
-                        .tolist()
-                    )
-
-                    if atendidos:
-                        if "numos" in pend_tec_global.columns:
-                            pend_tec_global = pend_tec_global[
-                                ~pend_tec_global["numos"].astype(str).isin(atendidos)
-                            ]
-                        if "numos" in pend_com_global.columns:
-                            pend_com_global = pend_com_global[
-                                ~pend_com_global["numos"].astype(str).isin(atendidos)
-                            ]
+                    backlog.remover(df_resp["numos"].dropna().astype("int64").unique())
 
                 # Contar APENAS as pendências atendíveis para esta equipe (datasol <= inicio_turno_eq)
-                rest_tec = rest_com = 0
-                if not pend_tec_global.empty:
-                    ds_tec_glob = pd.to_datetime(pend_tec_global["datasol"], errors="coerce")
-                    mask_tec_eq = ds_tec_glob <= ini_turno_eq
-                    rest_tec = mask_tec_eq.sum()
-                if not pend_com_global.empty:
-                    ds_com_glob = pd.to_datetime(pend_com_global["datasol"], errors="coerce")
-                    mask_com_eq = ds_com_glob <= ini_turno_eq
-                    rest_com = mask_com_eq.sum()
-
+                rest = backlog.contar(ini_turno_eq)
+                rest_tec, rest_com = rest["tec"], rest["com"]
                 rest_tot = rest_tec + rest_com
 
                 # LOG no formato solicitado:
@@ -290,51 +337,152 @@ def simular_v3(
                     f"📦→ {rest_tot} (Tec={rest_tec} | Com={rest_com})"
                 )
 
-            if not any_assigned_this_round:
-                break
-
-        if atribs_dia:
-            out = _ensure_result_schema(pd.concat(atribs_dia, ignore_index=True))
-            out_file = RESULTS_DIR / f"atribuicoes_{dia.date()}.parquet"
-            out.to_parquet(out_file, index=False)
-            log(f"📊 {len(out)} registros salvos → {out_file}")
-
-            if debug:
-                cols_chk = [
-                    "dth_chegada_estimada",
-                    "dth_final_estimada",
-                    "fim_turno_estimado",
-                    "chegada_base",
+            rodada = 0
+            while True:
+                rodada += 1
+                any_assigned_this_round = False
+
+                # condição de parada: não há mais OS atendíveis para este dia
+                restantes = backlog.contar(ini_turno_min)
+                if restantes["tec"] + restantes["com"] == 0:
+                    break
+
+                # condição de parada: nenhuma equipe tem capacidade restante
+                if all(atrib_por_equipe[nome] >= limite_por_equipe for nome in atrib_por_equipe):
+                    break
+
+                log(f"🔁 Rodada {rodada} de atribuição no dia {dia.date()}")
+
+                # equipes com capacidade, na ordem de prioridade (inicio_turno, nome)
+                candidatas = [
+                    (equipe_row, limite_por_equipe - atrib_por_equipe.get(str(equipe_row.get("nome", "N/D")), 0))
+                    for _, equipe_row in eq_dia.iterrows()
                 ]
-                log(
-                    "   • "
-                    + " | ".join(
-                        [f"{c}: {out[c].notna().sum()} preenchidas" for c in cols_chk if c in out.columns]
+                candidatas = [(row, cap) for row, cap in candidatas if cap > 0]
+
+                if paralelo > 1:
+                    # todas as equipes otimizam sobre o mesmo snapshot (conflitos resolvidos
+                    # em _otimizar_rodada_paralela, sem descartar rotas inteiras)
+                    resultados = _otimizar_rodada_paralela(executor, candidatas, backlog, solver_local)
+                    for (equipe_row, _), df_resp in zip(candidatas, resultados):
+                        if df_resp is not None:
+                            registrar(equipe_row, df_resp)
+                else:
+                    for equipe_row, capacidade_restante in candidatas:
+                        pool = _pool_da_equipe(backlog, equipe_row, capacidade_restante)
+                        df_resp = _otimizar_equipe(equipe_row, pool, capacidade_restante, solver_local)
+                        if df_resp is not None:
+                            registrar(equipe_row, df_resp)
+
+                if not any_assigned_this_round:
+                    break
+
+            _log_memoria(f"Dia {dia.date()}")
+
+            if atribs_dia:
+                out_file, out = writer.write_day(dia, atribs_dia, numos_side)
+                log(f"📊 {out.num_rows} registros salvos → {out_file}")
+
+                if debug:
+                    cols_chk = [
+                        "dth_chegada_estimada",
+                        "dth_final_estimada",
+                        "fim_turno_estimado",
+                        "chegada_base",
+                    ]
+                    log(
+                        "   • "
+                        + " | ".join(
+                            [
+                                f"{c}: {out.num_rows - out.column(c).null_count} preenchidas"
+                                for c in cols_chk
+                                if c in out.column_names
+                            ]
+                        )
                     )
-                )
-                if "eta_source" in out.columns:
-                    log(f"   • eta_source: {dict(out['eta_source'].value_counts(dropna=False))}")
-        else:
-            log("⚠️ Nenhum registro atribuído neste dia.")
+                    if "eta_source" in out.column_names:
+                        log(f"   • eta_source: {contagem_valores(out, 'eta_source')}")
+            else:
+                log("⚠️ Nenhum registro atribuído neste dia.")
 
 
 def main() -> None:
     parser = argparse.ArgumentParser()
     parser.add_argument("--limite", type=int, default=15, help="Limite máximo de OS por equipe")
     parser.add_argument("--debug", action="store_true", help="Imprimir estatísticas adicionais")
+    parser.add_argument("--inicio", default=None, help="Primeiro dia simulado (AAAA-MM-DD)")
+    parser.add_argument("--fim", default=None, help="Último dia simulado (AAAA-MM-DD, inclusivo)")
+    parser.add_argument("--sem-cache", action="store_true", help="Ignorar o cache normalizado (data/cache)")
+    parser.add_argument("--compressao", default="zstd", help="Codec parquet dos resultados (zstd, snappy, gzip, none)")
+    parser.add_argument("--row-group", type=int, default=64_000, help="Máximo de linhas por row group")
+    parser.add_argument(
+        "--paralelo",
+        type=int,
+        default=0,
+        help="Equipes otimizadas em paralelo por rodada (0/1 = sequencial, menos chamadas VROOM)",
+    )
+    parser.add_argument(
+        "--paralelo-modo",
+        choices=["thread", "process"],
+        default="thread",
+        help="Pool da otimização paralela (process para AG/SA/ACO pesados)",
+    )
+    parser.add_argument(
+        "--solver-local",
+        type=int,
+        default=0,
+        help="Resolver em processo (inserção + 2-opt) as rotas com até N jobs, sem VROOM (0 = desligado)",
+    )
+    parser.add_argument(
+        "--snap-jobs",
+        action="store_true",
+        help="Snapar as coordenadas dos jobs à via (OSRM /nearest) na carga, com cache em disco",
+    )
+    parser.add_argument(
+        "--cache-snap",
+        action="store_true",
+        help="Persistir o snapping das bases (/nearest) no CACHE_DIR entre execuções",
+    )
+    parser.add_argument(
+        "--perfil-memoria",
+        action="store_true",
+        help="Medir a memória da simulação (tracemalloc) e logar o pico por dia",
+    )
     args = parser.parse_args()
     inicio_simulacao = datetime.now()
     log("=" * 120)
     log(f"🚀 Simulação V3 iniciada às {inicio_simulacao:%H:%M:%S}")
 
     try:
-        df_eq = prepare_equipes_v3()
-        df_te, df_co = prepare_pendencias_v3()
+        df_eq = prepare_equipes_v3(args.inicio, args.fim, usar_cache=not args.sem_cache)
+        df_te, df_co = prepare_pendencias_v3(
+            args.inicio, args.fim, usar_cache=not args.sem_cache, snap=args.snap_jobs
+        )
     except Exception as e:
         log(f"💥 Erro ao carregar dataframes: {e}")
         raise
 
-    simular_v3(df_eq, df_te, df_co, limite_por_equipe=args.limite, debug=args.debug)
+    writer = ResultDatasetWriter(RESULTS_DIR, compression=args.compressao, row_group_size=args.row_group)
+    arquivo_snaps = arquivo_snap(OSRMClient()) if args.cache_snap else None
+    if arquivo_snaps is not None:
+        log(f"📍 Cache de snapping: {cache_snap().carregar(arquivo_snaps)} pontos ({arquivo_snaps})")
+    if args.perfil_memoria:
+        tracemalloc.start()
+    simular_v3(
+        df_eq,
+        df_te,
+        df_co,
+        limite_por_equipe=args.limite,
+        debug=args.debug,
+        writer=writer,
+        paralelo=args.paralelo,
+        modo_paralelo=args.paralelo_modo,
+        solver_local=args.solver_local,
+    )
+    if args.perfil_memoria:
+        tracemalloc.stop()
+    if arquivo_snaps is not None:
+        cache_snap().salvar(arquivo_snaps)
     final_simulacao = datetime.now()
     tempoProcessamento = (final_simulacao - inicio_simulacao).total_seconds()/60
     log(f"\n✅ PROCESSO V3 FINALIZADO COM SUCESSO!")
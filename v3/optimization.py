@@ -8,18 +8,125 @@ from math import exp
 from v2.vroom_client import VroomClient
 from v2.osrm_client import OSRMClient
 from v2.utils import gerar_jobs_com_ids, _service_seconds_from_row
+from v2.vroom_payload import breaks_pausa, janelas_prazo, segundos_desde, service_seconds
+from v2.vroom_response import decodificar_rotas, trechos_por_job
 from v2 import config
+from v2.backlog import Backlog
+from v2.snap_cache import cache_snap
+from v2.solver_local import solver_local
+
+# pool do AG/SA/ACO: até limite_por_equipe * FATOR_POOL pendências por equipe
+FATOR_POOL = 4
+
+_NAT_FIM = np.iinfo(np.int64).max  # NaT ordena por último (como no sort_values)
+
+
+def _ns(valores) -> np.ndarray:
+    """datetime → int64 ns com NaT = +inf, para ordenar com np.lexsort."""
+    ns = pd.to_datetime(pd.Series(valores), errors="coerce").to_numpy(dtype="datetime64[ns]").view(np.int64)
+    return np.where(ns == np.iinfo(np.int64).min, _NAT_FIM, ns)
+
+
+def _chaves_prefiltro(df: pd.DataFrame) -> list:
+    """
+    Chaves do pré-filtro (vencimento, tempo pendente, EUSD) por linha de `df`,
+    no formato de np.lexsort (última chave = primária): comerciais primeiro,
+    depois dataven e datasol mais antigos e maior EUSD.
+    """
+    n = len(df)
+    is_com = (df["tipo_serv"] == "comercial").to_numpy(dtype=bool, na_value=False) if n else np.zeros(0, bool)
+    dataven = _ns(df["dataven"]) if "dataven" in df.columns else np.full(n, _NAT_FIM)
+    datasol = _ns(df["datasol"])
+    eusd_col = df.get("EUSD", df.get("eusd", df.get("EUSD_FIO_B", 0)))
+    eusd = pd.to_numeric(pd.Series(eusd_col, index=df.index), errors="coerce").fillna(0.0).to_numpy(dtype=np.float64)
+    return [-eusd, datasol, dataven, ~is_com]
+
+
+def ordem_prefiltro(df: pd.DataFrame, max_pool: int) -> np.ndarray:
+    """Posições (iloc) das `max_pool` pendências prioritárias de `df`, em ordem."""
+    return np.lexsort(_chaves_prefiltro(df))[:max_pool]
+
+
+class BacklogV3(Backlog):
+    """
+    Backlog do V3 com as chaves do pré-filtro calculadas uma única vez.
+
+    pool_equipe() seleciona as pendências de cada equipe por índices sobre os
+    frames somente-leitura e materializa só as linhas do pool (no máximo
+    limite * FATOR_POOL), em vez de copiar/concatenar o backlog inteiro a cada
+    equipe e rodada.
+    """
+
+    def __init__(self, df_te: pd.DataFrame, df_co: pd.DataFrame):
+        super().__init__(df_te, df_co)
+        chaves = [_chaves_prefiltro(p.df) for p in self._partes()]
+        self._chaves = [np.concatenate(c) for c in zip(*chaves)]
+
+    def pool_equipe(self, turno_ini: pd.Timestamp, limite_por_equipe: int) -> pd.DataFrame:
+        """
+        Pendentes com datasol < turno_ini (e dt_ref válido), técnicas antes de
+        comerciais; acima de limite * FATOR_POOL, só as prioritárias do
+        pré-filtro, na ordem do ranking.
+        """
+        ini = np.datetime64(pd.Timestamp(turno_ini))
+        idx = np.flatnonzero(
+            np.concatenate([p.pendente & (p.datasol < ini) & ~np.isnat(p.dt_ref) for p in self._partes()])
+        )
+        max_pool = limite_por_equipe * FATOR_POOL
+        if len(idx) > max_pool:
+            idx = idx[np.lexsort([c[idx] for c in self._chaves])[:max_pool]]
+
+        n_tec = len(self.tec.df)
+        eh_tec = idx < n_tec
+        pool = pd.concat(
+            [self.tec.df.iloc[idx[eh_tec]], self.com.df.iloc[idx[~eh_tec] - n_tec]],
+            ignore_index=True,
+        )
+        # posição de cada índice no concat (técnicas primeiro) → ordem de idx
+        pos = np.empty(len(idx), dtype=np.int64)
+        pos[eh_tec] = np.arange(eh_tec.sum())
+        pos[~eh_tec] = eh_tec.sum() + np.arange((~eh_tec).sum())
+        return pool.iloc[pos].reset_index(drop=True)
+
+
+def snap_bases(df_eq: pd.DataFrame) -> int:
+    """
+    Snapping em lote das bases distintas de `df_eq` (com o fallback da base
+    global, como em MetaHeuristicaV3), aquecendo o cache do processo.
+    Devolve quantas bases distintas foram consideradas.
+    """
+    def _coord(col):
+        if col not in df_eq.columns:
+            return np.full(len(df_eq), np.nan)
+        return pd.to_numeric(df_eq[col], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+
+    lon, lat = _coord("base_lon"), _coord("base_lat")
+    ok = ~np.isnan(lon) & ~np.isnan(lat)
+    bases = set(zip(lon[ok].tolist(), lat[ok].tolist()))
+    if not ok.all():
+        bases.add((float(config.BASE_LON), float(config.BASE_LAT)))
+    if bases:
+        cache_snap().snap_many(OSRMClient(), sorted(bases))
+    return len(bases)
 
 
 class MetaHeuristicaV3:
-    def __init__(self, equipe_row, pend_tec, pend_com, limite_por_equipe: int = 15):
+    def __init__(
+        self, equipe_row, pend_tec=None, pend_com=None, limite_por_equipe: int = 15, pool=None,
+        solver_local_max_jobs: int = 0,
+    ):
+        """
+        `pool`: pendências já selecionadas para a equipe (ex.: BacklogV3.pool_equipe),
+        usadas sem cópia; sem ele, o pool vem de pend_tec + pend_com.
+        `solver_local_max_jobs`: rotas com até esse número de jobs são resolvidas
+        em processo (v2.solver_local) em vez do VROOM; 0 = sempre VROOM.
+        """
         self.equipe = equipe_row
-        self.pool_base = (
-            pd.concat([pend_tec, pend_com], ignore_index=True)
-            .dropna(subset=["dt_ref"])
-            .reset_index(drop=True)
-        )
+        if pool is None:
+            pool = pd.concat([pend_tec, pend_com], ignore_index=True).dropna(subset=["dt_ref"])
+        self.pool_base = pool.reset_index(drop=True)
         self.limite_por_equipe = int(limite_por_equipe)
+        self.solver_local_max_jobs = int(solver_local_max_jobs)
         self.vroom = VroomClient()
         self.osrm = OSRMClient()
 
@@ -34,9 +141,9 @@ class MetaHeuristicaV3:
             self.base_lon = float(config.BASE_LON)
             self.base_lat = float(config.BASE_LAT)
 
-        # Snap da base para via mais próxima
+        # Snap da base para via mais próxima (cache do processo: /nearest só na 1ª vez)
         try:
-            self.base_lon, self.base_lat = self.osrm.nearest(self.base_lon, self.base_lat)
+            self.base_lon, self.base_lat = cache_snap().snap(self.osrm, self.base_lon, self.base_lat)
         except Exception:
             pass
 
@@ -239,7 +346,11 @@ class MetaHeuristicaV3:
 
     # ---------------- VROOM + fallbacks ----------------
     def _vroom(self, df_jobs: pd.DataFrame):
-        """Calcula ETA/ETD com prioridade VROOM; fallback OSRM, último recurso Haversine."""
+        """
+        Calcula ETA/ETD com prioridade VROOM (pausa como break e dataven como
+        janela do job); fallback OSRM, último recurso Haversine. Com poucos jobs
+        (solver_local_max_jobs) o mesmo payload vai ao solver local.
+        """
         lon_e = self.base_lon
         lat_e = self.base_lat
 
@@ -256,89 +367,59 @@ class MetaHeuristicaV3:
 
         t0 = self.turno_ini
 
+        horizonte = int((pd.to_datetime(self.equipe["fim_turno"]) - t0).total_seconds())
         vehicle = {
             "id": 1,
             "start": [lon_e, lat_e],
             "end": [lon_e, lat_e],
-            "time_window": [
-                0,
-                int((pd.to_datetime(self.equipe["fim_turno"]) - t0).total_seconds()),
-            ],
+            "time_window": [0, horizonte],
         }
 
-        # --- TENTATIVA 1: VROOM (ordem + tempos) ---
+        # Pausa e vencimento comercial nativos no VROOM (base relativa = início do turno)
+        pausa = breaks_pausa(
+            segundos_desde([self.equipe.get("dthpausa_ini")], t0),
+            segundos_desde([self.equipe.get("dthpausa_fim")], t0),
+            horizonte,
+        )[0]
+        if pausa:
+            vehicle["breaks"] = pausa
+        if "dataven" in df_jobs_tagged.columns:
+            janelas = janelas_prazo(
+                segundos_desde(df_jobs_tagged["dataven"], t0),
+                [job["service"] for job in jobs],
+                horizonte,
+            )
+            for job, tw in zip(jobs, janelas):
+                if tw:
+                    job["time_windows"] = tw
+
+        # --- TENTATIVA 1: VROOM (ordem + tempos), ou solver local se a rota for pequena ---
+        local = len(jobs) <= self.solver_local_max_jobs
         try:
-            resp = self.vroom.route(vehicle, jobs)
+            resp = solver_local(self.osrm.base_url).route(vehicle, jobs) if local else self.vroom.route(vehicle, jobs)
         except Exception:
             resp = None
 
         if resp and resp.get("routes"):
-            route = resp["routes"][0]
-            steps = route.get("steps", [])
-
-            eta_map = {}
-            end_arrival_s = None
-            for st in steps:
-                st_type = st.get("type")
-                arr_s = st.get("arrival")
-                if arr_s is None:
-                    continue
-                arr_s = int(arr_s)
-                if st_type == "job":
-                    jid = int(st.get("job"))
-                    eta_map[jid] = t0 + pd.to_timedelta(arr_s, unit="s")
-                elif st_type == "end":
-                    end_arrival_s = arr_s
-
-            if eta_map and "job_id_vroom" in df_jobs_tagged.columns:
-                df_jobs_tagged["dth_chegada_estimada"] = (
-                    df_jobs_tagged["job_id_vroom"].map(eta_map).astype("datetime64[ns]")
-                )
-
-            te_sec = df_jobs_tagged.apply(_service_seconds_from_row, axis=1)
-            mask_eta = df_jobs_tagged["dth_chegada_estimada"].notna()
-            df_jobs_tagged.loc[mask_eta, "dth_final_estimada"] = pd.to_datetime(
-                df_jobs_tagged.loc[mask_eta, "dth_chegada_estimada"], errors="coerce"
-            ) + pd.to_timedelta(te_sec[mask_eta].values, unit="s")
-
-            if end_arrival_s is not None:
-                df_jobs_tagged["fim_turno_estimado"] = t0 + pd.to_timedelta(end_arrival_s, unit="s")
-
-            # Se algum job ficou sem chegada (NaT), refazemos TODAS as ETAs via OSRM/Haversine
-            if df_jobs_tagged["dth_chegada_estimada"].isna().any():
-                pausa_ini = (
-                    pd.to_datetime(self.equipe.get("dthpausa_ini"), errors="coerce")
-                    if "dthpausa_ini" in self.equipe.index
-                    else pd.NaT
-                )
-                pausa_fim = (
-                    pd.to_datetime(self.equipe.get("dthpausa_fim"), errors="coerce")
-                    if "dthpausa_fim" in self.equipe.index
-                    else pd.NaT
-                )
-                try:
-                    df_jobs_tagged = _osrm_eta_etd(
-                        self.osrm,
-                        df_jobs_tagged,
-                        self.turno_ini,
-                        lon_e,
-                        lat_e,
-                        pausa_ini=pausa_ini,
-                        pausa_fim=pausa_fim,
-                    )
-                except Exception:
-                    df_jobs_tagged = _haversine_eta_etd(
-                        df_jobs_tagged,
-                        self.turno_ini,
-                        lon_e,
-                        lat_e,
-                        pausa_ini=pausa_ini,
-                        pausa_fim=pausa_fim,
-                    )
-            else:
-                df_jobs_tagged["eta_source"] = "VROOM"
-
-            df_jobs_tagged["eta_source"] = df_jobs_tagged["eta_source"].astype("string")
+            passos = decodificar_rotas(resp).drop_duplicates("job").set_index("job")
+
+            # Jobs que o VROOM não encaixou no turno ficam de fora (voltam ao
+            # backlog) em vez de re-roteirizar a rota inteira via OSRM/Haversine.
+            em_rota = df_jobs_tagged["job_id_vroom"].isin(passos.index).to_numpy()
+            df_jobs_tagged = df_jobs_tagged[em_rota].copy()
+            p = passos.loc[df_jobs_tagged["job_id_vroom"].to_numpy()]
+
+            df_jobs_tagged["dth_chegada_estimada"] = t0 + pd.to_timedelta(p["arrival"].to_numpy(), unit="s")
+            te_min = df_jobs_tagged.get("TE", df_jobs_tagged.get("te", pd.Series(0.0, index=df_jobs_tagged.index)))
+            te_sec = service_seconds(te_min)
+            df_jobs_tagged["dth_final_estimada"] = df_jobs_tagged["dth_chegada_estimada"] + pd.to_timedelta(
+                te_sec, unit="s"
+            )
+            df_jobs_tagged["fim_turno_estimado"] = t0 + pd.to_timedelta(p["rota_arrival"].to_numpy(), unit="s")
+            df_jobs_tagged["distancia_vroom"], df_jobs_tagged["duracao_vroom"] = trechos_por_job(p)
+            df_jobs_tagged["eta_source"] = pd.Series(
+                "LOCAL" if local else "VROOM", index=df_jobs_tagged.index, dtype="string"
+            )
             return resp, df_jobs_tagged
 
         # pausa da equipe (usada no fallback)
@@ -389,24 +470,9 @@ class MetaHeuristicaV3:
             return None
 
         # ==== PRÉ-FILTRO DE PERFORMANCE COM PRIORIDADE (vencimento, tempo pendente, EUSD) ====
-        fator_pool = 4
-        max_pool = min(self.limite_por_equipe * fator_pool, len(pool))
-
+        max_pool = self.limite_por_equipe * FATOR_POOL
         if len(pool) > max_pool:
-            pool = pool.copy()
-            pool["__is_com"] = (pool["tipo_serv"] == "comercial").astype(int)
-            pool["__datasol"] = pd.to_datetime(pool["datasol"], errors="coerce")
-            pool["__dataven"] = pd.to_datetime(pool.get("dataven", pd.NaT), errors="coerce")
-            eusd_col = pool.get("EUSD", pool.get("eusd", pool.get("EUSD_FIO_B", 0)))
-            pool["__eusd"] = pd.to_numeric(eusd_col, errors="coerce").fillna(0.0)
-
-            pool = pool.sort_values(
-                by=["__is_com", "__dataven", "__datasol", "__eusd"],
-                ascending=[False, True, True, False],
-            ).head(max_pool)
-
-            pool = pool.drop(columns=["__is_com", "__datasol", "__dataven", "__eusd"], errors="ignore")\
-                       .reset_index(drop=True)
+            pool = pool.iloc[ordem_prefiltro(pool, max_pool)].reset_index(drop=True)
         # ====== FIM DO PRÉ-FILTRO ======
 
         k = self.limite_por_equipe
@@ -421,12 +487,22 @@ class MetaHeuristicaV3:
         if cand_aco.empty:
             return None
 
-        resp, cand = self._vroom(cand_aco)
+        return self._roteirizar(cand_aco)
 
-        if resp and resp.get("routes"):
-            r0 = resp["routes"][0]
-            cand["distancia_vroom"] = r0.get("distance")
-            cand["duracao_vroom"] = r0.get("duration")
+    def resequenciar(self, pool: pd.DataFrame):
+        """
+        Só sequencia `pool` (já escolhido para a equipe): uma chamada VROOM ou
+        solver local, sem pré-filtro nem AG/SA/ACO. Usado quando a rota perde
+        OS para outra equipe na otimização paralela.
+        """
+        if pool is None or pool.empty:
+            return None
+        return self._roteirizar(pool.reset_index(drop=True))
+
+    def _roteirizar(self, cand_aco: pd.DataFrame):
+        resp, cand = self._vroom(cand_aco)
+        if cand.empty:
+            return None
 
         cand["equipe"] = self.equipe.get("nome", "N/D")
         for meta_col in [
@@ -520,16 +596,14 @@ def _osrm_eta_etd(osrm_client, df_jobs_tagged, inicio_turno_pvh, lon_e, lat_e, p
     coords.append((lon_e, lat_e))
 
     leg_durs, _ = osrm_client.route_legs_durations(coords)
+    if len(leg_durs) < len(coords) - 1 or np.isnan(leg_durs).any():
+        # perna sem rota no OSRM: a rota inteira cai no Haversine (sem misturar fontes)
+        raise ValueError("OSRM sem rota para alguma perna")
     t_cursor = pd.to_datetime(inicio_turno_pvh, errors="coerce")
 
     leg_idx = 0
     for i, r in df_jobs_tagged.iterrows():
-        travel_s = int(leg_durs[leg_idx]) if leg_idx < len(leg_durs) else 0
-
-        lon1, lat1 = coords[leg_idx]
-        lon2, lat2 = coords[leg_idx + 1]
-        if travel_s <= 0 and (lon1, lat1) != (lon2, lat2):
-            travel_s = _haversine_travel_seconds(lon1, lat1, lon2, lat2)
+        travel_s = int(leg_durs[leg_idx])
 
         chegada = _apply_pause(t_cursor, travel_s, pausa_ini=pausa_ini, pausa_fim=pausa_fim)
         df_jobs_tagged.at[i, "dth_chegada_estimada"] = chegada
@@ -542,12 +616,7 @@ def _osrm_eta_etd(osrm_client, df_jobs_tagged, inicio_turno_pvh, lon_e, lat_e, p
         t_cursor = termino
         leg_idx += 1
 
-    back_s = int(leg_durs[leg_idx]) if leg_idx < len(leg_durs) else 0
-    lon1, lat1 = coords[leg_idx]
-    lon2, lat2 = coords[leg_idx + 1]
-    if back_s <= 0 and (lon1, lat1) != (lon2, lat2):
-        back_s = _haversine_travel_seconds(lon1, lat1, lon2, lat2)
-
+    back_s = int(leg_durs[leg_idx])
     chegada_base = _apply_pause(t_cursor, back_s, pausa_ini=pausa_ini, pausa_fim=pausa_fim)
     df_jobs_tagged["fim_turno_estimado"] = chegada_base
     df_jobs_tagged["eta_source"] = df_jobs_tagged["eta_source"].astype("string")
@@ -1,7 +1,14 @@
 # v4/config.py
 """
 Configurações ajustáveis do V4 para otimização de performance
+
+As constantes abaixo são os valores padrão de V4Config (fim do arquivo), que é
+o objeto efetivamente passado a simular_v4. Ajuste por execução via YAML
+(--config), variáveis ROTAS_* (ex.: ROTAS_MAX_JOBS_ABSOLUTO=200) ou CLI.
 """
+from dataclasses import dataclass
+
+from v2.config import RuntimeConfig
 
 # === LIMITES DE PAYLOAD VROOM ===
 # Limite absoluto de jobs por chamada ao VROOM (evita erro 500)
@@ -23,6 +30,55 @@ MIN_JOBS_POR_GRUPO = 2
 # Exibe warning quando pool de candidatos é maior que este valor
 POOL_WARNING_THRESHOLD = 80
 
+# === SAÍDA (dataset particionado por dia) ===
+# Codec do parquet de resultados (zstd, snappy, gzip, none)
+RESULTS_COMPRESSION = "zstd"
+
+# Máximo de linhas por row group nos arquivos de resultado
+RESULTS_ROW_GROUP_SIZE = 64_000
+
+# Pasta do dataset de resultados (criada só na primeira gravação)
+RESULTS_DIR = "results_v4"
+
+# Limite padrão de OS por equipe (capacity do veículo no VROOM)
+LIMITE_POR_EQUIPE = 15
+
+# Warm start: semear cada veículo com a rota que o horizonte rolante planejou
+# para a equipe no dia anterior (rota descartada; jobs ainda pendentes).
+# Só tem efeito com HORIZONTE_DIAS >= 2
+WARM_START = False
+
+# Critério de seleção dos jobs enviados ao VROOM:
+# "score" (prioridade heurística, _score_job) ou "penalidade" (compensação
+# regulatória evitada, v2.custo_regulatorio; também vira `priority` no VROOM)
+OBJETIVO = "score"
+
+# Seleção pelo VROOM: em vez de truncar o pool por score em MAX_JOBS_ABSOLUTO,
+# envia numa única chamada por grupo (sem sub-grupos) até MAX_JOBS_SELECAO
+# candidatos a até RAIO_CANDIDATOS_KM de alguma base do grupo, todos com
+# `priority` (0–100) quantizada do score; o VROOM troca um job distante de
+# score alto por um próximo de score um pouco menor.
+SELECAO_VROOM = False
+MAX_JOBS_SELECAO = 400
+RAIO_CANDIDATOS_KM = 60.0  # 0 = sem filtro espacial
+
+# Horizonte rolante (dias): com 2, cada grupo de turno do dia D é resolvido
+# junto com as equipes do mesmo turno em D+1 (veículos extras, rotas de D+1
+# descartadas), para o VROOM decidir o que pode esperar até amanhã. 1 = míope.
+HORIZONTE_DIAS = 1
+
+# Despacho intradiário: OS que chegam durante o turno (datasol > inicio_turno)
+# são inseridas nas rotas em andamento (inserção mais barata sobre matriz em
+# cache; VROOM só se a inserção falhar) em vez de esperar o próximo grupo/dia
+INTRADIA = False
+
+# Solver local (inserção mais barata + 2-opt em processo, v2.solver_local):
+# chamadas com até SOLVER_LOCAL_MAX_JOBS jobs não vão ao VROOM. 0 = desligado
+SOLVER_LOCAL_MAX_JOBS = 0
+
+# Snapping das coordenadas dos jobs à via (OSRM /nearest) na carga do dataset
+SNAP_JOBS = False
+
 # === AJUSTES RECOMENDADOS POR CENÁRIO ===
 """
 CENÁRIO 1: Poucos serviços, muitas equipes
@@ -45,3 +101,33 @@ CENÁRIO 4: Performance máxima (VROOM potente)
 - FATOR_POOL = 5
 - MAX_EQUIPES_POR_SUBGRUPO = 10
 """
+
+
+@dataclass(frozen=True)
+class V4Config(RuntimeConfig):
+    """Parâmetros de uma execução do V4 (imutável; use .com(...) para variantes)."""
+
+    limite_por_equipe: int = LIMITE_POR_EQUIPE
+    max_jobs_absoluto: int = MAX_JOBS_ABSOLUTO
+    fator_pool: int = FATOR_POOL
+    max_equipes_por_subgrupo: int = MAX_EQUIPES_POR_SUBGRUPO
+    min_jobs_por_grupo: int = MIN_JOBS_POR_GRUPO
+    pool_warning_threshold: int = POOL_WARNING_THRESHOLD
+    results_compression: str = RESULTS_COMPRESSION
+    results_row_group_size: int = RESULTS_ROW_GROUP_SIZE
+    results_dir: str = RESULTS_DIR
+    warm_start: bool = WARM_START
+    snap_jobs: bool = SNAP_JOBS
+    objetivo: str = OBJETIVO
+    selecao_vroom: bool = SELECAO_VROOM
+    max_jobs_selecao: int = MAX_JOBS_SELECAO
+    raio_candidatos_km: float = RAIO_CANDIDATOS_KM
+    horizonte_dias: int = HORIZONTE_DIAS
+    intradia: bool = INTRADIA
+    solver_local_max_jobs: int = SOLVER_LOCAL_MAX_JOBS
+
+    def __post_init__(self):
+        if self.objetivo not in ("score", "penalidade"):
+            raise ValueError(f"objetivo inválido: {self.objetivo!r} (use 'score' ou 'penalidade')")
+        if self.horizonte_dias < 1:
+            raise ValueError(f"horizonte_dias deve ser >= 1 (recebido {self.horizonte_dias})")
@@ -23,19 +23,40 @@ from pathlib import Path
 from datetime import datetime
 from typing import List, Dict, Tuple, Set
 import math  # necessário para log1p em _score_job
+import time
 
+import numpy as np
 import pandas as pd
+import pyarrow.compute as pc
 
 # permitir rodar de qualquer pasta
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 from v4.data_loader import prepare_equipes_v3, prepare_pendencias_v3
-from v4 import config as v4_config
+from v4.config import V4Config
 from v2.vroom_client import VroomClient
-from v2 import config
-
-RESULTS_DIR = Path("results_v4")
-RESULTS_DIR.mkdir(exist_ok=True)
+from v2.osrm_client import OSRMClient
+from v2.vroom_payload import (
+    breaks_pausa,
+    janelas_prazo,
+    jobs_payload,
+    quantizar_prioridade,
+    segundos_desde,
+    service_seconds,
+    vehicles_payload,
+)
+from v2.custo_regulatorio import eusd, penalidade_evitada
+from v2.vroom_response import decodificar_rotas, trechos_por_job
+from v2.data_loader import tabela_numos
+from v2.result_writer import ResultDatasetWriter, contagem_valores
+from v2.backlog import Backlog
+from v2.warm_start import RotasAnteriores
+from v2.despacho import DespachoIntradia
+from v2.matriz import MatrizDeslocamento
+from v2.solver_local import solver_local
+from v2.cache import cache_key
+from v2.snap_cache import tag_osrm
+from v2.shared_backlog import abrir_backlog, backlog_publicado, publicar_backlog
 
 REQUIRED_COLS = [
     "tipo_serv",
@@ -64,36 +85,6 @@ REQUIRED_COLS = [
 def log(msg: str) -> None:
     print(msg, flush=True)
 
-def _ensure_result_schema(df: pd.DataFrame) -> pd.DataFrame:
-    for c in REQUIRED_COLS:
-        if c not in df.columns:
-            df[c] = pd.NA
-
-    dt_cols = [
-        "datasol",
-        "dataven",
-        "datater_trab",
-        "dthaps_ini",
-        "dthaps_fim_ajustado",
-        "inicio_turno",
-        "fim_turno",
-        "dthpausa_ini",
-        "dthpausa_fim",
-        "dth_chegada_estimada",
-        "dth_final_estimada",
-        "fim_turno_estimado",
-        "chegada_base",
-    ]
-    for c in dt_cols:
-        if c in df.columns:
-            df[c] = pd.to_datetime(df[c], errors="coerce")
-
-    df["eta_source"] = df["eta_source"].astype("string")
-
-    ordered = [c for c in REQUIRED_COLS if c in df.columns]
-    extras = [c for c in df.columns if c not in ordered]
-    return df[ordered + extras]
-
 def _score_job(row: pd.Series, turno_ini: pd.Timestamp) -> float:
     """
     Score de prioridade semelhante ao V3 (tipo, vencimento, tempo pendente, EUSD).
@@ -162,16 +153,103 @@ def _score_job(row: pd.Series, turno_ini: pd.Timestamp) -> float:
     score += 0.001 * tempo_espera
     return float(score)
 
+def _scores_jobs(df: pd.DataFrame, turno_ini: pd.Timestamp) -> np.ndarray:
+    """
+    _score_job vetorizado sobre todo o pool (mesmos pesos e mesma ordem das
+    operações). prioridade/violacao/tempo_espera ausentes ou inválidos valem
+    1/0/0, em vez de NaN.
+    """
+    n = len(df)
+    tipo = (
+        df["tipo_serv"].astype("string").str.strip().str.lower().fillna("")
+        if "tipo_serv" in df.columns
+        else pd.Series("", index=df.index, dtype="string")
+    )
+    comercial = (tipo == "comercial").to_numpy(dtype=bool)
+    tecnico = (tipo == "técnico").to_numpy(dtype=bool)
+
+    def _num(col: str, padrao: float) -> np.ndarray:
+        valores = _coluna_float(df, col)
+        return np.where(np.isfinite(valores) & (valores != 0), valores, padrao)
+
+    def _dias(col: str) -> np.ndarray:
+        if col not in df.columns:
+            return np.full(n, np.nan)
+        dt = pd.to_datetime(df[col], errors="coerce")
+        return ((pd.Timestamp(turno_ini) - dt).dt.total_seconds() / 86400.0).to_numpy(dtype=np.float64, na_value=np.nan)
+
+    valor_eusd = eusd(df)
+    eusd_score = np.log1p(np.where(valor_eusd > 0, valor_eusd, 0.0))
+
+    pendente = _dias("datasol" if "datasol" in df.columns else "data_sol")
+    tempo_pendente_dias = np.where(np.isfinite(pendente), np.maximum(pendente, 0.0), 0.0)
+
+    vencido_dias = _dias("dataven" if "dataven" in df.columns else "data_venc")  # = -dias para o vencimento
+    urg_venc = np.where(comercial & np.isfinite(vencido_dias), vencido_dias, 0.0)
+
+    prioridade_base = _num("prioridade", 1.0)
+    violacao = _num("violacao", 0.0)
+
+    score = np.where(
+        comercial,
+        1.0 * prioridade_base + 3.0 * urg_venc + 0.5 * tempo_pendente_dias + 1.0 * eusd_score - 0.5 * violacao,
+        np.where(
+            tecnico,
+            1.0 * prioridade_base + 2.5 * tempo_pendente_dias + 1.0 * eusd_score - 0.5 * violacao,
+            1.0 * prioridade_base + 1.0 * tempo_pendente_dias + 0.8 * eusd_score - 0.5 * violacao,
+        ),
+    )
+    return score + 0.001 * _num("tempo_espera", 0.0)
+
+def _distancia_bases_km(lon, lat, base_lon, base_lat) -> np.ndarray:
+    """Distância (haversine, km) de cada ponto à base mais próxima."""
+    lon1, lat1 = np.radians(np.asarray(lon, dtype=np.float64))[:, None], np.radians(np.asarray(lat, dtype=np.float64))[:, None]
+    lon2, lat2 = np.radians(np.asarray(base_lon, dtype=np.float64))[None, :], np.radians(np.asarray(base_lat, dtype=np.float64))[None, :]
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return (2 * 6371.0 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))).min(axis=1)
+
+def _bases_grupo(eq_group: pd.DataFrame, cfg: V4Config) -> Tuple[np.ndarray, np.ndarray]:
+    """Base de cada equipe (base fixa da configuração quando ausente)."""
+    base_lon = _coluna_float(eq_group, "base_lon")
+    base_lat = _coluna_float(eq_group, "base_lat")
+    sem_base = np.isnan(base_lon) | np.isnan(base_lat)
+    return np.where(sem_base, cfg.base_lon, base_lon), np.where(sem_base, cfg.base_lat, base_lat)
+
+def _coluna_float(df: pd.DataFrame, col: str) -> np.ndarray:
+    """Coluna numérica como float64 (ausente/inválido → NaN)."""
+    if col not in df.columns:
+        return np.full(len(df), np.nan)
+    return pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+
+def _valor_jobs(pool: pd.DataFrame, eq_group: pd.DataFrame, group_ini: pd.Timestamp, cfg: V4Config) -> np.ndarray:
+    """
+    Valor de cada job do pool para o critério `cfg.objetivo`: score heurístico
+    ou compensação evitada atendendo no turno (conclusão prevista no fim do
+    turno do grupo, contra adiar para o dia seguinte).
+    """
+    if cfg.objetivo == "penalidade":
+        fim = pd.to_datetime(eq_group["fim_turno"], errors="coerce").max() if "fim_turno" in eq_group else pd.NaT
+        if pd.isna(fim):
+            fim = group_ini + pd.Timedelta(hours=8)
+        return penalidade_evitada(pool, fim)
+    return _scores_jobs(pool, group_ini)
+
 def _solve_group_vroom(
     eq_group: pd.DataFrame,
-    pend_tec_global: pd.DataFrame,
-    pend_com_global: pd.DataFrame,
-    limite_por_equipe: int,
-) -> Tuple[pd.DataFrame, Set[str]]:
+    backlog: Backlog,
+    cfg: V4Config,
+    rotas: RotasAnteriores = None,
+    eq_prox: pd.DataFrame = None,
+) -> Tuple[pd.DataFrame, Set[int]]:
     """
     Resolve um grupo de equipes que têm o MESMO inicio_turno usando VROOM multi-veículos.
     
-    Se o grupo for muito grande (>6 equipes), divide em sub-grupos para evitar sobrecarga do VROOM.
+    Se o grupo for muito grande (> cfg.max_equipes_por_subgrupo), divide em sub-grupos para evitar sobrecarga do VROOM.
+    Os numos atribuídos a cada sub-grupo são marcados como atendidos no backlog.
+    `eq_prox` (horizonte rolante) são equipes dos próximos dias resolvidas
+    junto como veículos extras; as rotas delas são descartadas.
+    Com `rotas` (warm start), a rota descartada de cada equipe do dia seguinte
+    é guardada e vira a solução inicial do veículo quando a equipe for resolvida.
 
     Retorna:
       df_result_group: DataFrame com atribuições desse grupo
@@ -185,32 +263,36 @@ def _solve_group_vroom(
         return pd.DataFrame(), set()
     
     # Se grupo muito grande, dividir em sub-grupos
-    if len(eq_group) > v4_config.MAX_EQUIPES_POR_SUBGRUPO:
-        log(f"   ⚙️  Grupo grande ({len(eq_group)} equipes) - Dividindo em sub-grupos de {v4_config.MAX_EQUIPES_POR_SUBGRUPO}")
+    # (com selecao_vroom o grupo inteiro vai numa chamada só)
+    tam_sub = cfg.max_equipes_por_subgrupo
+    if len(eq_group) > tam_sub and not cfg.selecao_vroom:
+        log(f"   ⚙️  Grupo grande ({len(eq_group)} equipes) - Dividindo em sub-grupos de {tam_sub}")
         all_results = []
         all_assigned = set()
+        n_sub = -(-len(eq_group) // tam_sub)
+        if eq_prox is not None:
+            # cada equipe do horizonte vai com o sub-grupo da equipe de mesmo nome;
+            # as que não trabalham hoje são distribuídas entre os sub-grupos
+            sem_par = ~eq_prox["nome"].isin(eq_group["nome"]).to_numpy()
+            sub_sem_par = np.zeros(len(eq_prox), dtype=np.int64)
+            sub_sem_par[sem_par] = np.arange(int(sem_par.sum())) % n_sub
         
-        for i in range(0, len(eq_group), v4_config.MAX_EQUIPES_POR_SUBGRUPO):
-            sub_group = eq_group.iloc[i:i+v4_config.MAX_EQUIPES_POR_SUBGRUPO]
-            log(f"      Sub-grupo {i//v4_config.MAX_EQUIPES_POR_SUBGRUPO + 1}: {len(sub_group)} equipes")
+        for i in range(0, len(eq_group), tam_sub):
+            sub_group = eq_group.iloc[i:i+tam_sub]
+            sub_prox = None
+            if eq_prox is not None:
+                no_sub = eq_prox["nome"].isin(sub_group["nome"]).to_numpy() | (sem_par & (sub_sem_par == i // tam_sub))
+                sub_prox = eq_prox[no_sub]
+            log(f"      Sub-grupo {i//tam_sub + 1}: {len(sub_group)} equipes")
             
-            df_sub_res, assigned_sub = _solve_group_vroom_single(
-                sub_group, pend_tec_global, pend_com_global, limite_por_equipe
-            )
+            df_sub_res, assigned_sub = _solve_group_vroom_single(sub_group, backlog, cfg, rotas, sub_prox)
             
             if not df_sub_res.empty:
                 all_results.append(df_sub_res)
                 all_assigned.update(assigned_sub)
                 
                 # Remove os atribuídos do backlog para os próximos sub-grupos
-                if "numos" in pend_tec_global.columns:
-                    pend_tec_global = pend_tec_global[
-                        ~pend_tec_global["numos"].astype(str).isin(assigned_sub)
-                    ]
-                if "numos" in pend_com_global.columns:
-                    pend_com_global = pend_com_global[
-                        ~pend_com_global["numos"].astype(str).isin(assigned_sub)
-                    ]
+                backlog.remover(assigned_sub)
         
         if all_results:
             return pd.concat(all_results, ignore_index=True), all_assigned
@@ -218,16 +300,34 @@ def _solve_group_vroom(
             return pd.DataFrame(), set()
     
     # Grupo pequeno - processar normalmente
-    return _solve_group_vroom_single(eq_group, pend_tec_global, pend_com_global, limite_por_equipe)
+    df_res, assigned = _solve_group_vroom_single(eq_group, backlog, cfg, rotas, eq_prox)
+    backlog.remover(assigned)
+    return df_res, assigned
+
+def _route_multi(vc: VroomClient, vehicles: List[Dict], jobs: List[Dict]) -> Dict:
+    """route_multi; se o VROOM rejeitar a solução inicial (steps), refaz sem ela."""
+    try:
+        return vc.route_multi(vehicles, jobs)
+    except Exception as e:
+        if not any("steps" in v for v in vehicles):
+            raise
+        log(f"   ♻️  Warm start rejeitado pelo VROOM ({e}); refazendo sem solução inicial")
+        sem_seed = [{k: v for k, v in veh.items() if k != "steps"} for veh in vehicles]
+        return vc.route_multi(sem_seed, jobs)
 
 def _solve_group_vroom_single(
     eq_group: pd.DataFrame,
-    pend_tec_global: pd.DataFrame,
-    pend_com_global: pd.DataFrame,
-    limite_por_equipe: int,
-) -> Tuple[pd.DataFrame, Set[str]]:
+    backlog: Backlog,
+    cfg: V4Config,
+    rotas: RotasAnteriores = None,
+    eq_prox: pd.DataFrame = None,
+) -> Tuple[pd.DataFrame, Set[int]]:
     """
     Resolve um sub-grupo de equipes usando VROOM multi-veículos (implementação interna).
+
+    As equipes de `eq_prox` entram como veículos extras (ids após os do grupo,
+    janela deslocada para o próprio turno); o que o VROOM lhes atribui fica no
+    backlog.
     """
     if eq_group.empty:
         return pd.DataFrame(), set()
@@ -236,109 +336,137 @@ def _solve_group_vroom_single(
     if pd.isna(group_ini):
         return pd.DataFrame(), set()
 
-    # Pendências elegíveis: datasol <= inicio_turno do grupo
-    pool_parts = []
-
-    if not pend_tec_global.empty:
-        ds_tec = pd.to_datetime(pend_tec_global["datasol"], errors="coerce")
-        pool_parts.append(pend_tec_global[ds_tec <= group_ini])
-
-    if not pend_com_global.empty:
-        ds_com = pd.to_datetime(pend_com_global["datasol"], errors="coerce")
-        pool_parts.append(pend_com_global[ds_com <= group_ini])
-
-    if not pool_parts:
+    # Pendências elegíveis: datasol <= inicio_turno do grupo (só essas linhas são materializadas)
+    pool = backlog.elegiveis(group_ini)
+    if pool.empty:
         return pd.DataFrame(), set()
 
-    pool = pd.concat(pool_parts, ignore_index=True)
     pool = pool.dropna(subset=["latitude", "longitude"])
     if pool.empty:
         return pd.DataFrame(), set()
 
-    # Pré-filtro de performance com limite absoluto para evitar sobrecarga do VROOM
+    limite_por_equipe = cfg.limite_por_equipe
     n_veic = len(eq_group)
-    max_jobs_calculado = limite_por_equipe * n_veic * v4_config.FATOR_POOL
-    max_jobs = min(max_jobs_calculado, v4_config.MAX_JOBS_ABSOLUTO, len(pool))
-
+    frota = eq_group
+    if eq_prox is not None and not eq_prox.empty:
+        frota = pd.concat([eq_group, eq_prox], ignore_index=True)
+        log(f"   🔭 Horizonte: +{len(eq_prox)} equipe(s) dos próximos dias (rotas descartadas)")
+    n_frota = len(frota)
+    base_lon, base_lat = _bases_grupo(frota, cfg)
+
+    if cfg.selecao_vroom:
+        # Candidatos próximos de alguma base; a seleção fica com o VROOM (priority)
+        if cfg.raio_candidatos_km > 0:
+            dist = _distancia_bases_km(_coluna_float(pool, "longitude"), _coluna_float(pool, "latitude"), base_lon, base_lat)
+            pool = pool[dist <= cfg.raio_candidatos_km]
+            if pool.empty:
+                return pd.DataFrame(), set()
+        max_jobs = min(cfg.max_jobs_selecao, len(pool))
+    else:
+        # Pré-filtro de performance com limite absoluto para evitar sobrecarga do VROOM
+        max_jobs_calculado = limite_por_equipe * n_frota * cfg.fator_pool
+        max_jobs = min(max_jobs_calculado, cfg.max_jobs_absoluto, len(pool))
+
+    com_prioridade = cfg.selecao_vroom or cfg.objetivo == "penalidade"
+    valor = None
+    if len(pool) > max_jobs or com_prioridade:
+        valor = _valor_jobs(pool, eq_group, group_ini, cfg)
     if len(pool) > max_jobs:
         pool = pool.copy()
-        pool["__score"] = pool.apply(lambda r: _score_job(r, group_ini), axis=1)
+        pool["__score"] = valor
         pool = pool.sort_values("__score", ascending=False).head(max_jobs)
-        pool = pool.drop(columns=["__score"])
+        valor = pool.pop("__score").to_numpy()
     
     # Log de debug para diagnóstico
-    if len(pool) > v4_config.POOL_WARNING_THRESHOLD:
-        log(f"   ⚠️  Pool grande: {len(pool)} jobs para {n_veic} veículos (limite: {v4_config.MAX_JOBS_ABSOLUTO})")
+    if len(pool) > cfg.pool_warning_threshold:
+        log(f"   ⚠️  Pool grande: {len(pool)} jobs para {n_veic} veículos (limite: {cfg.max_jobs_selecao if cfg.selecao_vroom else cfg.max_jobs_absoluto})")
 
     pool = pool.reset_index(drop=True)
-    pool["job_id_vroom"] = pool.index + 1
-
-    # Monta jobs VROOM com delivery=1 para controle de capacidade
-    jobs = []
-    for idx, row in pool.iterrows():
-        try:
-            lon = float(row["longitude"])
-            lat = float(row["latitude"])
-        except Exception:
-            continue
-        te_raw = row.get("TE", 0)
-        if pd.isna(te_raw):
-            te_min = 0.0
-        else:
-            te_min = float(te_raw)
-        service_sec = max(int(te_min * 60), 0)
-        jobs.append(
-            {
-                "id": int(pool.at[idx, "job_id_vroom"]),
-                "location": [lon, lat],
-                "service": service_sec,
-                "delivery": [1],  # Cada job consome 1 unidade de capacidade
-            }
-        )
+    pool["job_id_vroom"] = np.arange(1, len(pool) + 1, dtype=np.int64)
+
+    # Janela de cada veículo na base relativa do VROOM (segundos desde group_ini):
+    # [tw_ini, horizon]; tw_ini = 0 para o grupo, início do próprio turno para eq_prox
+    inicio = pd.to_datetime(frota["inicio_turno"], errors="coerce")
+    fim = pd.to_datetime(frota["fim_turno"], errors="coerce")
+    duracao = (fim - inicio).dt.total_seconds().to_numpy(dtype=np.float64, na_value=np.nan)
+    duracao = np.where(np.isnan(duracao), 8 * 3600, np.maximum(duracao, 0)).astype(np.int64)
+    tw_ini = np.nan_to_num(segundos_desde(inicio, group_ini)).astype(np.int64)
+    horizon = tw_ini + duracao
+
+    # Monta jobs VROOM (colunar) com delivery=1 para controle de capacidade e
+    # janela de término até o vencimento comercial (dataven) quando cair no turno
+    lon = _coluna_float(pool, "longitude")
+    lat = _coluna_float(pool, "latitude")
+    ok = np.isfinite(lon) & np.isfinite(lat)
+    service = service_seconds(_coluna_float(pool, "TE"))
+    prazo = segundos_desde(pool["dataven"], group_ini) if "dataven" in pool.columns else np.full(len(pool), np.nan)
+    janelas = janelas_prazo(prazo, service, int(horizon.max()))
+    # selecao_vroom / objetivo "penalidade": valor do job quantizado em priority (0–100)
+    prioridade = quantizar_prioridade(valor[ok]) if com_prioridade else None
+    jobs = jobs_payload(
+        pool["job_id_vroom"].to_numpy()[ok],
+        lon[ok],
+        lat[ok],
+        service[ok],
+        delivery=np.ones(int(ok.sum()), dtype=np.int64),  # Cada job consome 1 unidade de capacidade
+        priority=prioridade,
+        time_windows=[tw for tw, valido in zip(janelas, ok) if valido],
+    )
 
     if not jobs:
         return pd.DataFrame(), set()
     
-    # Validação: se muito poucos jobs para os veículos, pular
-    if len(jobs) < v4_config.MIN_JOBS_POR_GRUPO:
-        log(f"   ⏭️  Pulando: apenas {len(jobs)} job(s) para {n_veic} veículos (mínimo: {v4_config.MIN_JOBS_POR_GRUPO})")
+    # Chamadas pequenas resolvidas em processo (sem ida e volta HTTP ao VROOM)
+    local = len(jobs) <= cfg.solver_local_max_jobs
+
+    # Validação: se muito poucos jobs para os veículos, pular (o solver local aceita qualquer tamanho)
+    if not local and len(jobs) < cfg.min_jobs_por_grupo:
+        log(f"   ⏭️  Pulando: apenas {len(jobs)} job(s) para {n_veic} veículos (mínimo: {cfg.min_jobs_por_grupo})")
         return pd.DataFrame(), set()
 
-    # Monta veículos VROOM com capacidade limitada
-    vehicles = []
-    veh_id_to_nome: Dict[int, str] = {}
-
-    for v_id, (_, erow) in enumerate(eq_group.iterrows(), start=1):
-        base_lon = erow.get("base_lon")
-        base_lat = erow.get("base_lat")
-        if pd.isna(base_lon) or pd.isna(base_lat):
-            base_lon = config.BASE_LON
-            base_lat = config.BASE_LAT
-
-        inicio = pd.to_datetime(erow["inicio_turno"], errors="coerce")
-        fim = pd.to_datetime(erow["fim_turno"], errors="coerce")
-        if pd.isna(inicio) or pd.isna(fim):
-            horizon = 8 * 3600
+    # Pausa da equipe como break nativo do VROOM (ETAs já saem com a pausa aplicada)
+    sem_pausa = np.full(n_frota, pd.NaT)
+    pausas = breaks_pausa(
+        segundos_desde(frota.get("dthpausa_ini", sem_pausa), group_ini),
+        segundos_desde(frota.get("dthpausa_fim", sem_pausa), group_ini),
+        horizon,
+    )
+
+    # Warm start: rota anterior de cada equipe, só com jobs ainda pendentes neste payload
+    seeds = None
+    if rotas is not None and len(rotas):
+        numos_para_job = dict(
+            zip(pool["numos"].to_numpy(dtype=np.int64)[ok].tolist(), pool["job_id_vroom"].to_numpy()[ok].tolist())
+        )
+        seeds = rotas.steps(eq_group["nome"].astype(str).tolist(), numos_para_job, limite_por_equipe)
+        n_seed = sum(len(seq) - 2 for seq in seeds if seq)
+        if n_seed:
+            log(f"   ♻️  Warm start: {n_seed} jobs da rota anterior como solução inicial")
+            seeds = seeds + [None] * (n_frota - n_veic)
         else:
-            horizon = max(int((fim - inicio).total_seconds()), 0)
-
-        vehicle = {
-            "id": v_id,
-            "start": [float(base_lon), float(base_lat)],
-            "end": [float(base_lon), float(base_lat)],
-            "time_window": [0, horizon],
-            "capacity": [limite_por_equipe],  # Limite máximo de OS por equipe
-        }
-        vehicles.append(vehicle)
-        veh_id_to_nome[v_id] = str(erow["nome"])
+            seeds = None
+
+    veh_ids = np.arange(1, n_frota + 1, dtype=np.int64)
+    # Veículos VROOM com capacidade limitada, saindo da base da equipe (ou base fixa)
+    vehicles = vehicles_payload(
+        veh_ids,
+        base_lon,
+        base_lat,
+        horizon,
+        capacity=np.full(n_frota, limite_por_equipe),  # Limite máximo de OS por equipe
+        tw_inicio=tw_ini if n_frota > n_veic else None,
+        breaks=pausas,
+        steps=seeds,
+    )
 
     # Log de debug do payload
     jobs_por_veiculo = len(jobs) / len(vehicles) if vehicles else 0
-    log(f"   📤 Enviando ao VROOM: {len(vehicles)} veículos × {len(jobs)} jobs (~{jobs_por_veiculo:.1f} jobs/veículo, cap={limite_por_equipe})")
+    destino = "solver local" if local else "VROOM"
+    log(f"   📤 Enviando ao {destino}: {len(vehicles)} veículos × {len(jobs)} jobs (~{jobs_por_veiculo:.1f} jobs/veículo, cap={limite_por_equipe})")
     
-    vc = VroomClient()
+    vc = VroomClient(base_url=cfg.vroom_url)
     try:
-        resp = vc.route_multi(vehicles, jobs)
+        resp = solver_local(cfg.osrm_url).route_multi(vehicles, jobs) if local else _route_multi(vc, vehicles, jobs)
     except Exception as e:
         error_msg = str(e)
         if "500" in error_msg:
@@ -353,122 +481,176 @@ def _solve_group_vroom_single(
         log(f"⚠️ VROOM não retornou rotas para grupo {group_ini}")
         return pd.DataFrame(), set()
 
-    job_to_equipe: Dict[int, str] = {}
-    job_to_arrival: Dict[int, pd.Timestamp] = {}
-    job_to_fim_turno: Dict[int, pd.Timestamp] = {}
-    job_to_distance: Dict[int, float] = {}
-    job_to_duration: Dict[int, float] = {}
-
-    for route in routes:
-        v_id = route.get("vehicle")
-        equipe_nome = veh_id_to_nome.get(v_id, "N/D")
-        steps = route.get("steps", [])
-        route_end_arr_s = route.get("arrival")
-        route_distance = route.get("distance", 0)  # metros
-        route_duration = route.get("duration", 0)  # segundos
-        
-        end_dt = (
-            group_ini + pd.to_timedelta(int(route_end_arr_s), unit="s")
-            if route_end_arr_s is not None
-            else pd.NaT
-        )
-        
-        # Distribuir distância e duração proporcionalmente aos jobs
-        job_count_in_route = sum(1 for st in steps if st.get("type") == "job")
-        dist_per_job = route_distance / job_count_in_route if job_count_in_route > 0 else 0
-        dur_per_job = route_duration / job_count_in_route if job_count_in_route > 0 else 0
-        
-        for st in steps:
-            if st.get("type") == "job":
-                jid = int(st.get("job"))
-                arr_s = st.get("arrival")
-                if arr_s is None:
-                    continue
-                arr_dt = group_ini + pd.to_timedelta(int(arr_s), unit="s")
-                job_to_equipe[jid] = equipe_nome
-                job_to_arrival[jid] = arr_dt
-                job_to_fim_turno[jid] = end_dt
-                job_to_distance[jid] = dist_per_job / 1000.0  # converter para km
-                job_to_duration[jid] = dur_per_job / 60.0  # converter para minutos
-
-    if not job_to_equipe:
+    passos = decodificar_rotas(resp)
+    if passos.empty:
         return pd.DataFrame(), set()
 
-    assigned_ids = set(job_to_equipe.keys())
-    df_assigned = pool[pool["job_id_vroom"].isin(assigned_ids)].copy()
+    # Deslocamento real até cada job (km / minutos); volta à base no último job da rota
+    passos["distancia_vroom"], passos["duracao_vroom"] = trechos_por_job(passos)
+    # Warm start: rota planejada para as equipes do dia seguinte (não gravada)
+    if rotas is not None and n_frota > n_veic:
+        _registrar_planejadas(rotas, passos, frota, n_veic, pool["numos"].to_numpy(dtype=np.int64))
 
-    df_assigned["equipe"] = df_assigned["job_id_vroom"].map(job_to_equipe)
-    df_assigned["dth_chegada_estimada"] = df_assigned["job_id_vroom"].map(job_to_arrival)
+    # Só as rotas das equipes do grupo valem; o que foi para eq_prox volta ao backlog
+    passos = passos[passos["vehicle"].to_numpy() <= n_veic]
+    if passos.empty:
+        return pd.DataFrame(), set()
+    passos["dth_chegada_estimada"] = group_ini + pd.to_timedelta(passos["arrival"].to_numpy(), unit="s")
+    passos["fim_turno_estimado"] = group_ini + pd.to_timedelta(passos["rota_arrival"].to_numpy(), unit="s")
+
+    # Informações da equipe (turno, pausas, base) por veículo
+    equipe_info = pd.DataFrame(
+        {
+            "vehicle": veh_ids[:n_veic],
+            "equipe": eq_group["nome"].astype(str).to_numpy(),
+            "base_lon": base_lon[:n_veic],
+            "base_lat": base_lat[:n_veic],
+        }
+    )
+    for col in ["inicio_turno", "fim_turno", "dthpausa_ini", "dthpausa_fim", "dthaps_ini", "dthaps_fim_ajustado"]:
+        valores = eq_group[col] if col in eq_group.columns else pd.Series(pd.NaT, index=eq_group.index)
+        equipe_info[col] = pd.to_datetime(valores, errors="coerce").to_numpy()
+
+    atrib = passos[
+        ["vehicle", "job", "dth_chegada_estimada", "fim_turno_estimado", "distancia_vroom", "duracao_vroom"]
+    ].merge(equipe_info, on="vehicle", how="left")
+
+    substituidas = [c for c in atrib.columns if c in pool.columns]
+    df_assigned = pool.drop(columns=substituidas).merge(
+        atrib.drop(columns=["vehicle"]), left_on="job_id_vroom", right_on="job", how="inner"
+    ).drop(columns=["job"])
+    if df_assigned.empty:
+        return pd.DataFrame(), set()
 
     te_series = pd.to_numeric(df_assigned["TE"], errors="coerce").fillna(0.0)
-    df_assigned["dth_final_estimada"] = pd.to_datetime(
-        df_assigned["dth_chegada_estimada"], errors="coerce"
-    ) + pd.to_timedelta(te_series.values, unit="m")
+    df_assigned["dth_final_estimada"] = df_assigned["dth_chegada_estimada"] + pd.to_timedelta(
+        te_series.values, unit="m"
+    )
+    df_assigned["eta_source"] = "LOCAL" if local else "VROOM"
 
-    df_assigned["fim_turno_estimado"] = df_assigned["job_id_vroom"].map(job_to_fim_turno)
-    df_assigned["eta_source"] = "VROOM"
-    
-    # Preencher informações da equipe (inicio_turno, fim_turno, pausas, base)
-    equipe_to_info = {}
-    for _, erow in eq_group.iterrows():
-        equipe_nome = str(erow["nome"])
-        equipe_to_info[equipe_nome] = {
-            "inicio_turno": pd.to_datetime(erow["inicio_turno"], errors="coerce"),
-            "fim_turno": pd.to_datetime(erow["fim_turno"], errors="coerce"),
-            "dthpausa_ini": pd.to_datetime(erow.get("dthpausa_ini"), errors="coerce"),
-            "dthpausa_fim": pd.to_datetime(erow.get("dthpausa_fim"), errors="coerce"),
-            "base_lon": erow.get("base_lon") if pd.notna(erow.get("base_lon")) else config.BASE_LON,
-            "base_lat": erow.get("base_lat") if pd.notna(erow.get("base_lat")) else config.BASE_LAT,
-            "dthaps_ini": pd.to_datetime(erow.get("dthaps_ini"), errors="coerce"),
-            "dthaps_fim_ajustado": pd.to_datetime(erow.get("dthaps_fim_ajustado"), errors="coerce"),
-        }
-    
-    # Aplicar informações da equipe a cada linha
-    for col in ["inicio_turno", "fim_turno", "dthpausa_ini", "dthpausa_fim", 
-                "base_lon", "base_lat", "dthaps_ini", "dthaps_fim_ajustado"]:
-        df_assigned[col] = df_assigned["equipe"].map(lambda eq: equipe_to_info.get(eq, {}).get(col))
-    
     # Calcular chegada_base (fim do último serviço + tempo de volta à base)
     # Usa fim_turno_estimado como proxy
     df_assigned["chegada_base"] = df_assigned["fim_turno_estimado"]
-    
-    # Aplicar distância e duração do VROOM
-    df_assigned["distancia_vroom"] = df_assigned["job_id_vroom"].map(job_to_distance)
-    df_assigned["duracao_vroom"] = df_assigned["job_id_vroom"].map(job_to_duration)
 
-    return df_assigned, set(df_assigned["numos"].astype(str))
+    return df_assigned, set(df_assigned["numos"].astype("int64").tolist())
+
+def _registrar_planejadas(
+    rotas: RotasAnteriores, passos: pd.DataFrame, frota: pd.DataFrame, n_veic: int, numos_pool: np.ndarray
+) -> None:
+    """
+    Guarda em `rotas` a sequência que o VROOM planejou para as equipes do
+    primeiro dia seguinte da frota (veículos após n_veic). Esses jobs voltam
+    ao backlog e seguem pendentes quando a equipe for resolvida no seu dia.
+    """
+    prox = frota.iloc[n_veic:]
+    ini = pd.to_datetime(prox["inicio_turno"], errors="coerce")
+    # com horizonte > 2 a mesma equipe aparece em vários dias: vale o mais próximo
+    veic_prox = np.flatnonzero((ini == ini.min()).to_numpy(dtype=bool, na_value=False)) + n_veic + 1
+    dia_prox = ini.min().normalize()
+    planejado = passos[np.isin(passos["vehicle"].to_numpy(), veic_prox)]
+    if planejado.empty:
+        return
+    veiculo = planejado["vehicle"].to_numpy(dtype=np.int64)
+    rotas.registrar(
+        pd.DataFrame(
+            {
+                "equipe": frota["nome"].astype(str).to_numpy()[veiculo - 1],
+                "numos": numos_pool[planejado["job"].to_numpy(dtype=np.int64) - 1],
+                "dth_chegada_estimada": planejado["arrival"].to_numpy(),
+            }
+        ),
+        dia=dia_prox,
+    )
+
+def _equipes_horizonte(df_eq: pd.DataFrame, dias_prox: List[pd.Timestamp], inicio_turno) -> pd.DataFrame:
+    """Equipes dos dias `dias_prox` com o mesmo horário de início de turno que `inicio_turno`."""
+    if not dias_prox:
+        return None
+    eq = df_eq[df_eq["dt_ref"].isin(dias_prox)]
+    ini = pd.to_datetime(eq["inicio_turno"], errors="coerce")
+    t = pd.Timestamp(inicio_turno)
+    mesmo_turno = (ini - ini.dt.normalize()) == (t - t.normalize())
+    return eq[mesmo_turno.to_numpy(dtype=bool, na_value=False)].sort_values(["dt_ref", "inicio_turno"])
+
+def _despachar_chegadas(despacho: DespachoIntradia, backlog: Backlog, de, ate) -> None:
+    """Eventos de chegada (de, ate]: cada OS é inserida/reotimizada nas rotas em andamento ou fica no backlog."""
+    chegadas = backlog.chegadas(de, ate)
+    if chegadas.empty:
+        return
+    chegadas = chegadas.dropna(subset=["latitude", "longitude"])
+    for linha in chegadas.to_dict("records"):
+        if despacho.evento(linha) is not None:
+            backlog.remover([linha["numos"]])
 
 def simular_v4(
     df_eq: pd.DataFrame,
     df_te: pd.DataFrame,
     df_co: pd.DataFrame,
-    limite_por_equipe: int = 15,
+    limite_por_equipe: int = None,
     debug: bool = False,
-) -> None:
+    results_dir: Path = None,
+    cfg: V4Config = None,
+) -> Dict[str, float]:
     """
     V4:
     - Usa VROOM multi-veículos para cada grupo de equipes com o MESMO inicio_turno.
     - Mantém backlog entre dias.
     - Mantém regra datasol <= inicio_turno para elegibilidade.
     - Cada numos só é atendida uma vez.
+    - Resultados gravados no dataset particionado por dia (cfg.results_dir/dia=AAAA-MM-DD).
+    - Com cfg.horizonte_dias > 1 (horizonte rolante), cada grupo do dia também
+      "vê" as equipes do mesmo turno nos próximos dias; só as rotas do dia valem.
+    - Com cfg.intradia, as OS que chegam durante o dia são despachadas como
+      eventos nas rotas já em andamento (v2.despacho).
+
+    `cfg` traz os limites da execução (padrão: V4Config()); `limite_por_equipe`
+    e `results_dir`, se informados, têm precedência sobre ele.
+
+    Retorna um resumo da execução (dias, OS atendidas, backlog restante, km,
+    tempo total e tempo somado das resoluções diárias).
     """
+    t_inicio = time.perf_counter()
+    cfg = (cfg or V4Config()).com(
+        limite_por_equipe=limite_por_equipe,
+        results_dir=str(results_dir) if results_dir is not None else None,
+    )
+    resumo: Dict[str, float] = {
+        "dias": 0,
+        "os_atendidas": 0,
+        "backlog_restante": 0,
+        "km_total": 0.0,
+        "tempo_s": 0.0,
+        "tempo_resolucao_s": 0.0,
+        "eventos_intradia": 0,
+        "insercoes_intradia": 0,
+        "reotimizacoes_intradia": 0,
+    }
 
     dias = sorted(pd.to_datetime(df_eq["dt_ref"].dropna().unique()))
     if not dias:
         log("⚠️  Nenhum dia encontrado em Equipes.")
-        return
+        return resumo
 
     log(f"\n📆 Simulação V4 de {len(dias)} dias ({dias[0].date()} → {dias[-1].date()})\n")
 
-    pend_tec_global = df_te.copy()
-    pend_com_global = df_co.copy()
+    writer = ResultDatasetWriter(
+        cfg.results_dir,
+        compression=cfg.results_compression,
+        row_group_size=cfg.results_row_group_size,
+    )
 
-    pend_tec_global["dt_ref"] = pd.to_datetime(pend_tec_global["dt_ref"], errors="coerce").dt.normalize()
-    pend_com_global["dt_ref"] = pd.to_datetime(pend_com_global["dt_ref"], errors="coerce").dt.normalize()
+    # frames de entrada não são alterados (podem ser visões de um Arrow mapeado)
+    backlog = Backlog(df_te, df_co)
+    numos_side = tabela_numos(df_te, df_co)  # numos não numéricos, restaurados na gravação
+    rotas = RotasAnteriores() if cfg.warm_start else None
+    if cfg.warm_start and cfg.horizonte_dias < 2:
+        log("⚠️  Warm start sem horizonte (horizonte_dias=1): não há rotas planejadas para semear")
 
     for i, dia in enumerate(dias, 1):
         log("=" * 120)
         log(f"🗓️  Dia {i}/{len(dias)} — {dia.date()}")
+        if rotas is not None:
+            rotas.descartar_ate(dia)  # rotas de dias que já passaram (equipe fora da escala)
 
         eq_dia = df_eq[df_eq["dt_ref"] == dia].copy()
         num_equipes = len(eq_dia)
@@ -482,25 +664,9 @@ def simular_v4(
         ini_turno_min = pd.to_datetime(eq_dia["inicio_turno"], errors="coerce").min()
 
         # Pendências novas vs backlog (para log)
-        if not pend_tec_global.empty:
-            ds_tec = pd.to_datetime(pend_tec_global["datasol"], errors="coerce")
-            mask_tec_elig = ds_tec <= ini_turno_min
-            mask_tec_new = mask_tec_elig & (pend_tec_global["dt_ref"] == dia)
-            mask_tec_backlog = mask_tec_elig & (pend_tec_global["dt_ref"] < dia)
-            pend_new_tec = mask_tec_new.sum()
-            pend_backlog_tec = mask_tec_backlog.sum()
-        else:
-            pend_new_tec = pend_backlog_tec = 0
-
-        if not pend_com_global.empty:
-            ds_com = pd.to_datetime(pend_com_global["datasol"], errors="coerce")
-            mask_com_elig = ds_com <= ini_turno_min
-            mask_com_new = mask_com_elig & (pend_com_global["dt_ref"] == dia)
-            mask_com_backlog = mask_com_elig & (pend_com_global["dt_ref"] < dia)
-            pend_new_com = mask_com_new.sum()
-            pend_backlog_com = mask_com_backlog.sum()
-        else:
-            pend_new_com = pend_backlog_com = 0
+        cont = backlog.contar(ini_turno_min, dia)
+        pend_new_tec, pend_backlog_tec = cont["tec_new"], cont["tec_backlog"]
+        pend_new_com, pend_backlog_com = cont["com_new"], cont["com_backlog"]
 
         total_new = pend_new_tec + pend_new_com
         total_backlog = pend_backlog_tec + pend_backlog_com
@@ -520,33 +686,38 @@ def simular_v4(
         )
 
         atribs_dia: List[pd.DataFrame] = []
+        dias_prox = dias[i : i + cfg.horizonte_dias - 1]
+        t_dia = time.perf_counter()
+
+        despacho = None
+        if cfg.intradia:
+            despacho = DespachoIntradia(
+                ini_turno_min,
+                MatrizDeslocamento(OSRMClient(base_url=cfg.osrm_url)),
+                vroom=VroomClient(base_url=cfg.vroom_url),
+                capacidade=cfg.limite_por_equipe,
+            )
+        t_evento = ini_turno_min
 
         # Agrupa equipes por inicio_turno
         for inicio_turno_val, eq_group in eq_dia.groupby("inicio_turno"):
             eq_group = eq_group.copy()
+            if despacho is not None:
+                # OS chegadas desde o último grupo vão primeiro para as rotas em andamento
+                _despachar_chegadas(despacho, backlog, t_evento, inicio_turno_val)
+                t_evento = inicio_turno_val
             log(f"🔁 Grupo inicio_turno = {inicio_turno_val} com {len(eq_group)} equipes")
 
-            df_group_res, assigned_nums = _solve_group_vroom(
-                eq_group,
-                pend_tec_global,
-                pend_com_global,
-                limite_por_equipe,
-            )
+            # numos atribuídos já saem do backlog dentro de _solve_group_vroom
+            eq_prox = _equipes_horizonte(df_eq, dias_prox, inicio_turno_val)
+            df_group_res, assigned_nums = _solve_group_vroom(eq_group, backlog, cfg, rotas, eq_prox)
+            if despacho is not None:
+                despacho.adicionar_grupo(eq_group, df_group_res, *_bases_grupo(eq_group, cfg))
 
             if df_group_res.empty or not assigned_nums:
                 log(f"⚠️ Nenhuma OS atribuída para grupo {inicio_turno_val}")
                 continue
 
-            # Atualiza backlog global removendo numos atribuídos
-            if "numos" in pend_tec_global.columns:
-                pend_tec_global = pend_tec_global[
-                    ~pend_tec_global["numos"].astype(str).isin(assigned_nums)
-                ]
-            if "numos" in pend_com_global.columns:
-                pend_com_global = pend_com_global[
-                    ~pend_com_global["numos"].astype(str).isin(assigned_nums)
-                ]
-
             # Log de distribuição por equipe no grupo
             distribuicao = df_group_res.groupby("equipe").size().to_dict()
             total_grupo = len(df_group_res)
@@ -563,13 +734,8 @@ def simular_v4(
                 num_com_eq = (df_eq_res["tipo_serv"] == "comercial").sum()
 
                 # Pendências restantes atendíveis para essa equipe
-                rest_tec = rest_com = 0
-                if not pend_tec_global.empty:
-                    ds_tec_glob = pd.to_datetime(pend_tec_global["datasol"], errors="coerce")
-                    rest_tec = (ds_tec_glob <= ini_turno_eq).sum()
-                if not pend_com_global.empty:
-                    ds_com_glob = pd.to_datetime(pend_com_global["datasol"], errors="coerce")
-                    rest_com = (ds_com_glob <= ini_turno_eq).sum()
+                rest = backlog.contar(ini_turno_eq)
+                rest_tec, rest_com = rest["tec"], rest["com"]
                 rest_tot = rest_tec + rest_com
 
                 log(
@@ -580,12 +746,32 @@ def simular_v4(
 
             atribs_dia.append(df_group_res)
 
+        if despacho is not None:
+            fim_dia = pd.to_datetime(eq_dia["fim_turno"], errors="coerce").max()
+            if pd.notna(fim_dia):
+                _despachar_chegadas(despacho, backlog, t_evento, fim_dia)
+            st = despacho.stats
+            if st["eventos"]:
+                log(
+                    f"⚡ Intradia: {st['eventos']} eventos | {st['insercoes']} inserções | "
+                    f"{st['reotimizacoes']} reotimizações | {st['aguardando']} aguardando | "
+                    f"{1000 * st['tempo_s'] / st['eventos']:.1f} ms/evento"
+                )
+            resumo["eventos_intradia"] += st["eventos"]
+            resumo["insercoes_intradia"] += st["insercoes"]
+            resumo["reotimizacoes_intradia"] += st["reotimizacoes"]
+            atribs_dia = despacho.resultado()
+
+        tempo_dia = time.perf_counter() - t_dia
+        resumo["tempo_resolucao_s"] += tempo_dia
+        janela = f"{dia.date()} → {dias_prox[-1].date()}" if dias_prox else f"{dia.date()}"
+        log(f"⏱️  Horizonte {janela} resolvido em {tempo_dia:.2f}s")
+
         if atribs_dia:
-            out = _ensure_result_schema(pd.concat(atribs_dia, ignore_index=True))
-            RESULTS_DIR.mkdir(exist_ok=True)
-            out_file = RESULTS_DIR / f"atribuicoes_{dia.date()}.parquet"
-            out.to_parquet(out_file, index=False)
-            log(f"📊 {len(out)} registros salvos → {out_file}")
+            out_file, out = writer.write_day(dia, atribs_dia, numos_side)
+            log(f"📊 {out.num_rows} registros salvos → {out_file}")
+            resumo["os_atendidas"] += out.num_rows
+            resumo["km_total"] += float(pc.sum(out.column("distancia_vroom")).as_py() or 0.0)
 
             if debug:
                 cols_chk = [
@@ -597,30 +783,151 @@ def simular_v4(
                 log(
                     "   • "
                     + " | ".join(
-                        [f"{c}: {out[c].notna().sum()} preenchidas" for c in cols_chk if c in out.columns]
+                        [
+                            f"{c}: {out.num_rows - out.column(c).null_count} preenchidas"
+                            for c in cols_chk
+                            if c in out.column_names
+                        ]
                     )
                 )
-                if "eta_source" in out.columns:
-                    log(f"   • eta_source: {dict(out['eta_source'].value_counts(dropna=False))}")
+                if "eta_source" in out.column_names:
+                    log(f"   • eta_source: {contagem_valores(out, 'eta_source')}")
         else:
             log("⚠️ Nenhum registro atribuído neste dia.")
 
+    ultimo_turno = pd.to_datetime(df_eq["inicio_turno"], errors="coerce").max()
+    restante = backlog.contar(ultimo_turno)
+    resumo["dias"] = len(dias)
+    resumo["backlog_restante"] = restante["tec"] + restante["com"]
+    resumo["tempo_s"] = round(time.perf_counter() - t_inicio, 2)
+    resumo["tempo_resolucao_s"] = round(resumo["tempo_resolucao_s"], 2)
+    return resumo
+
+def carregar_dados(data_ini=None, data_fim=None, usar_cache: bool = True, backlog_dir=None,
+                   snap: bool = False, osrm_url=None):
+    """
+    Carrega equipes e pendências. Com `backlog_dir`, abre o backlog publicado
+    (memory-map, compartilhado entre processos), publicando-o antes se preciso:
+    a publicação só é reaproveitada se foi feita com a mesma janela, snap e
+    arquivos de origem (chave no manifesto); senão é refeita.
+    Com `snap`, as coordenadas dos jobs vêm snapadas à via (ver prepare_pendencias_v3).
+    """
+    chave = None
+    if backlog_dir:
+        chave = cache_key(
+            ["Equipes.parquet", "atendTec.parquet", "ServCom.parquet"],
+            data_ini=data_ini,
+            data_fim=data_fim,
+            snap=tag_osrm(OSRMClient(base_url=osrm_url)) if snap else None,
+        )
+        if backlog_publicado(backlog_dir, chave):
+            log(f"🗂️  Abrindo backlog compartilhado em {backlog_dir}")
+            return abrir_backlog(backlog_dir)
+        if backlog_publicado(backlog_dir):
+            log(f"🗂️  Backlog em {backlog_dir} foi publicado com outra janela/origem; republicando")
+
+    df_eq = prepare_equipes_v3(data_ini, data_fim, usar_cache=usar_cache)
+    df_te, df_co = prepare_pendencias_v3(data_ini, data_fim, usar_cache=usar_cache, snap=snap, osrm_url=osrm_url)
+    if backlog_dir:
+        publicar_backlog(backlog_dir, df_eq, df_te, df_co, chave)
+        log(f"🗂️  Backlog publicado em {backlog_dir}")
+        return abrir_backlog(backlog_dir)
+    return df_eq, df_te, df_co
+
 def main() -> None:
     parser = argparse.ArgumentParser()
-    parser.add_argument("--limite", type=int, default=15, help="Limite máximo de OS por equipe")
+    parser.add_argument("--config", default=None, help="Arquivo YAML com parâmetros do V4 (ver v4/config.py)")
+    parser.add_argument("--limite", type=int, default=None, help="Limite máximo de OS por equipe")
+    parser.add_argument("--max-jobs", type=int, default=None, help="Máximo de jobs por chamada ao VROOM")
+    parser.add_argument("--fator-pool", type=int, default=None, help="Candidatos por veículo = limite × fator")
+    parser.add_argument("--max-equipes", type=int, default=None, help="Máximo de equipes por sub-grupo")
+    parser.add_argument("--vroom-url", default=None, help="Endpoint do VROOM")
+    parser.add_argument("--saida", default=None, help="Pasta do dataset de resultados")
+    parser.add_argument(
+        "--warm-start",
+        action="store_true",
+        default=None,
+        help="Semear o VROOM com a rota planejada para cada equipe no dia anterior (requer --horizonte >= 2)",
+    )
+    parser.add_argument(
+        "--objetivo",
+        choices=["score", "penalidade"],
+        default=None,
+        help="Seleção/prioridade dos jobs: score heurístico ou compensação regulatória evitada",
+    )
+    parser.add_argument(
+        "--selecao-vroom",
+        action="store_true",
+        default=None,
+        help="Enviar um pool maior (raio das bases) com priority do score e deixar o VROOM selecionar, sem sub-grupos",
+    )
+    parser.add_argument(
+        "--horizonte",
+        type=int,
+        default=None,
+        help="Dias do horizonte rolante (2 = resolve D junto com as equipes de D+1, descartando D+1)",
+    )
+    parser.add_argument(
+        "--intradia",
+        action="store_true",
+        default=None,
+        help="Despachar as OS que chegam durante o turno nas rotas em andamento (inserção + VROOM de fallback)",
+    )
+    parser.add_argument(
+        "--solver-local",
+        type=int,
+        default=None,
+        help="Resolver em processo (inserção + 2-opt) as chamadas com até N jobs, sem VROOM (0 = desligado)",
+    )
+    parser.add_argument(
+        "--snap-jobs",
+        action="store_true",
+        default=None,
+        help="Snapar as coordenadas dos jobs à via (OSRM /nearest) na carga, com cache em disco",
+    )
     parser.add_argument("--debug", action="store_true", help="Imprimir estatísticas adicionais")
+    parser.add_argument("--inicio", default=None, help="Primeiro dia simulado (AAAA-MM-DD)")
+    parser.add_argument("--fim", default=None, help="Último dia simulado (AAAA-MM-DD, inclusivo)")
+    parser.add_argument("--sem-cache", action="store_true", help="Ignorar o cache normalizado (data/cache)")
+    parser.add_argument(
+        "--backlog-compartilhado",
+        default=None,
+        help="Pasta com equipes/pendências em Arrow IPC (memory-map); publicada na 1ª execução",
+    )
     args = parser.parse_args()
 
+    cfg = V4Config.carregar(
+        args.config,
+        limite_por_equipe=args.limite,
+        max_jobs_absoluto=args.max_jobs,
+        fator_pool=args.fator_pool,
+        max_equipes_por_subgrupo=args.max_equipes,
+        vroom_url=args.vroom_url,
+        results_dir=args.saida,
+        warm_start=args.warm_start,
+        snap_jobs=args.snap_jobs,
+        objetivo=args.objetivo,
+        selecao_vroom=args.selecao_vroom,
+        horizonte_dias=args.horizonte,
+        intradia=args.intradia,
+        solver_local_max_jobs=args.solver_local,
+    )
+
     log("=" * 120)
     log(f"🚀 Simulação V4 iniciada às {datetime.now():%H:%M:%S}")
 
-    df_eq = prepare_equipes_v3()
-    df_te, df_co = prepare_pendencias_v3()
-
-    simular_v4(df_eq, df_te, df_co, limite_por_equipe=args.limite, debug=args.debug)
+    df_eq, df_te, df_co = carregar_dados(
+        args.inicio,
+        args.fim,
+        not args.sem_cache,
+        args.backlog_compartilhado,
+        snap=cfg.snap_jobs,
+        osrm_url=cfg.osrm_url,
+    )
+    simular_v4(df_eq, df_te, df_co, debug=args.debug, cfg=cfg)
 
     log("\n✅ PROCESSO V4 FINALIZADO COM SUCESSO!")
-    log(f"📂 Resultados em: {RESULTS_DIR.resolve()}")
+    log(f"📂 Resultados em: {Path(cfg.results_dir).resolve()}")
 
 if __name__ == "__main__":
     main()
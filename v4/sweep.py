@@ -0,0 +1,216 @@
+# v4/sweep.py
+"""
+Varredura (grid) de parâmetros do V4 em um pool de processos.
+
+Cada combinação de limite_por_equipe / fator_pool / max_jobs_absoluto /
+max_equipes_por_subgrupo (campos de V4Config) roda um simular_v4 completo em
+um worker. O backlog é publicado uma vez como Arrow IPC (com a mesma chave
+de v4.main.carregar_dados: uma publicação anterior da mesma janela/origem é
+reaproveitada) e aberto via memory-map por todos os workers (ver
+v2.shared_backlog), e as chamadas ao VROOM passam por semáforos:
+- --vroom-por-worker: máximo de requisições simultâneas por processo
+- --vroom-total: máximo de requisições simultâneas somando todos os processos
+
+Saída: results_sweep/comparativo.csv com OS atendidas, backlog restante, km e
+tempo de parede por variante, marcando as variantes da fronteira
+(atendidas ↑ × tempo ↓ não dominadas).
+
+Exemplo:
+    python -m v4.sweep --limite 10 15 20 --fator-pool 2 4 --max-jobs 100 200 \\
+        --max-equipes 3 6 --workers 4 --vroom-total 4
+"""
+import sys
+import os
+import argparse
+import itertools
+import multiprocessing as mp
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+import pandas as pd
+
+# permitir rodar de qualquer pasta
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from v2.shared_backlog import abrir_backlog
+from v2.vroom_client import definir_limite_concorrencia
+from v4.config import V4Config
+
+SWEEP_DIR = Path("results_sweep")
+
+# parâmetro do grid -> campo de V4Config
+PARAMS_CONFIG = {
+    "limite": "limite_por_equipe",
+    "fator_pool": "fator_pool",
+    "max_jobs": "max_jobs_absoluto",
+    "max_equipes": "max_equipes_por_subgrupo",
+}
+
+_BACKLOG = None
+
+
+def log(msg: str) -> None:
+    print(msg, flush=True)
+
+
+def _init_worker(backlog_dir: str, vroom_por_worker: int, sem_total) -> None:
+    """Abre o backlog compartilhado e configura os limites de VROOM do processo."""
+    global _BACKLOG
+    _BACKLOG = abrir_backlog(backlog_dir)
+    sem_local = threading.BoundedSemaphore(vroom_por_worker) if vroom_por_worker else None
+    definir_limite_concorrencia(sem_local, sem_total)
+
+
+def _tag(variante: Dict[str, int]) -> str:
+    return "_".join(f"{k}={v}" for k, v in variante.items())
+
+
+def _rodar_variante(variante: Dict[str, int], base: V4Config, saida: str) -> Dict[str, object]:
+    from v4.main import simular_v4
+
+    cfg = base.com(
+        results_dir=str(Path(saida) / _tag(variante)),
+        **{PARAMS_CONFIG[k]: v for k, v in variante.items()},
+    )
+
+    df_eq, df_te, df_co = _BACKLOG
+    linha: Dict[str, object] = dict(variante)
+    try:
+        resumo = simular_v4(df_eq, df_te, df_co, cfg=cfg)
+        linha.update(resumo)
+        linha["status"] = "ok"
+    except Exception as e:
+        linha["status"] = f"erro: {e}"
+    return linha
+
+
+def _marcar_fronteira(df: pd.DataFrame) -> pd.DataFrame:
+    """Marca variantes não dominadas em (os_atendidas maior, tempo_s menor)."""
+    ok = df["status"] == "ok"
+    fronteira = []
+    for idx, row in df.iterrows():
+        if not ok[idx]:
+            fronteira.append(False)
+            continue
+        outras = df[ok & (df.index != idx)]
+        dominada = (
+            (outras["os_atendidas"] >= row["os_atendidas"])
+            & (outras["tempo_s"] <= row["tempo_s"])
+            & ((outras["os_atendidas"] > row["os_atendidas"]) | (outras["tempo_s"] < row["tempo_s"]))
+        ).any()
+        fronteira.append(not dominada)
+    df["fronteira"] = fronteira
+    return df
+
+
+def rodar_sweep(
+    grid: Dict[str, List[int]],
+    backlog_dir: str,
+    workers: int = 2,
+    vroom_por_worker: int = 1,
+    vroom_total: int = 0,
+    saida: Path = SWEEP_DIR,
+    base: V4Config = None,
+) -> pd.DataFrame:
+    """
+    Executa todas as combinações do grid (sobre a configuração `base`) e
+    devolve a tabela comparativa.
+    """
+    base = base or V4Config()
+    nomes = list(grid)
+    variantes = [dict(zip(nomes, valores)) for valores in itertools.product(*grid.values())]
+    log(f"🧪 Sweep V4: {len(variantes)} variantes em {workers} processos")
+
+    ctx = mp.get_context("spawn")
+    sem_total = ctx.BoundedSemaphore(vroom_total) if vroom_total else None
+
+    linhas = []
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=ctx,
+        initializer=_init_worker,
+        initargs=(str(backlog_dir), vroom_por_worker, sem_total),
+    ) as pool:
+        futuros = {pool.submit(_rodar_variante, v, base, str(saida)): v for v in variantes}
+        for fut in as_completed(futuros):
+            linha = fut.result()
+            linhas.append(linha)
+            log(
+                f"   ✅ {_tag(futuros[fut])} → {linha.get('os_atendidas', 0)} OS, "
+                f"backlog {linha.get('backlog_restante', 0)}, "
+                f"{float(linha.get('km_total', 0.0)):.1f} km, {linha.get('tempo_s', 0)} s ({linha['status']})"
+            )
+
+    df = pd.DataFrame(linhas).sort_values(["os_atendidas", "tempo_s"], ascending=[False, True])
+    df = _marcar_fronteira(df.reset_index(drop=True))
+    saida.mkdir(parents=True, exist_ok=True)
+    df.to_csv(saida / "comparativo.csv", index=False)
+    return df
+
+
+def main() -> None:
+    from v4.main import carregar_dados
+
+    parser = argparse.ArgumentParser(description="Sweep de parâmetros do V4")
+    parser.add_argument("--config", default=None, help="YAML com a configuração base (ver v4/config.py)")
+    parser.add_argument("--limite", type=int, nargs="+", default=None, help="Valores de limite_por_equipe")
+    parser.add_argument("--fator-pool", type=int, nargs="+", default=None)
+    parser.add_argument("--max-jobs", type=int, nargs="+", default=None)
+    parser.add_argument("--max-equipes", type=int, nargs="+", default=None)
+    parser.add_argument("--workers", type=int, default=2, help="Processos simultâneos")
+    parser.add_argument("--vroom-por-worker", type=int, default=1, help="Requisições VROOM simultâneas por processo")
+    parser.add_argument("--vroom-total", type=int, default=0, help="Requisições VROOM simultâneas no total (0 = sem limite)")
+    parser.add_argument("--inicio", default=None, help="Primeiro dia simulado (AAAA-MM-DD)")
+    parser.add_argument("--fim", default=None, help="Último dia simulado (AAAA-MM-DD, inclusivo)")
+    parser.add_argument("--sem-cache", action="store_true", help="Ignorar o cache normalizado (data/cache)")
+    parser.add_argument(
+        "--snap-jobs",
+        action="store_true",
+        default=None,
+        help="Snapar as coordenadas dos jobs à via (OSRM /nearest) na carga, com cache em disco",
+    )
+    parser.add_argument("--backlog-compartilhado", default="data/shared", help="Pasta do backlog em Arrow IPC")
+    parser.add_argument("--saida", default=str(SWEEP_DIR), help="Pasta dos resultados do sweep")
+    args = parser.parse_args()
+    base = V4Config.carregar(args.config, snap_jobs=args.snap_jobs)
+
+    log("=" * 120)
+    log(f"🚀 Sweep V4 iniciado às {datetime.now():%H:%M:%S}")
+
+    # publica o backlog (da janela pedida) antes de subir os workers; com a
+    # mesma chave do v4.main, uma publicação anterior compatível é reaproveitada
+    carregar_dados(
+        args.inicio,
+        args.fim,
+        not args.sem_cache,
+        args.backlog_compartilhado,
+        snap=base.snap_jobs,
+        osrm_url=base.osrm_url,
+    )
+
+    # parâmetros não varridos ficam com o valor da configuração base
+    grid = {
+        "limite": args.limite or [base.limite_por_equipe],
+        "fator_pool": args.fator_pool or [base.fator_pool],
+        "max_jobs": args.max_jobs or [base.max_jobs_absoluto],
+        "max_equipes": args.max_equipes or [base.max_equipes_por_subgrupo],
+    }
+    df = rodar_sweep(
+        grid,
+        args.backlog_compartilhado,
+        workers=args.workers,
+        vroom_por_worker=args.vroom_por_worker,
+        vroom_total=args.vroom_total,
+        saida=Path(args.saida),
+        base=base,
+    )
+
+    log("\n" + df.to_string(index=False))
+    log(f"\n📂 Comparativo em: {(Path(args.saida) / 'comparativo.csv').resolve()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 # vroom_interface.py
 from __future__ import annotations
+import asyncio
+from contextlib import nullcontext
 from typing import List, Tuple, Dict, Optional
 import requests
 
@@ -8,6 +10,24 @@ VROOM_URL = "http://localhost:3000"
 OSRM_URL = "http://localhost:5000"
 
 
+def _payload_vroom(start, end, jobs) -> Dict:
+    vehicles = [
+        {
+            "id": 0,
+            "start": list(start),
+            **({"end": list(end)} if end is not None else {}),
+        }
+    ]
+    return {"vehicles": vehicles, "jobs": jobs, "options": {"g": False}}
+
+
+def _steps_rota(data: Dict) -> List[Dict]:
+    routes = data.get("routes") or []
+    if not routes:
+        return []
+    return routes[0].get("steps") or []
+
+
 def executar_vroom(
     *,
     start: Tuple[float, float],
@@ -21,23 +41,30 @@ def executar_vroom(
     if not jobs:
         return []
 
-    vehicles = [
-        {
-            "id": 0,
-            "start": list(start),
-            **({"end": list(end)} if end is not None else {}),
-        }
-    ]
-    payload = {"vehicles": vehicles, "jobs": jobs, "options": {"g": False}}
-    r = requests.post(VROOM_URL + "/", json=payload, timeout=30)
+    r = requests.post(VROOM_URL + "/", json=_payload_vroom(start, end, jobs), timeout=30)
     r.raise_for_status()
-    data = r.json()
+    return _steps_rota(r.json())
 
-    routes = data.get("routes") or []
-    if not routes:
+
+async def executar_vroom_async(
+    *,
+    start: Tuple[float, float],
+    end: Optional[Tuple[float, float]],
+    jobs: List[Dict],
+    client: "httpx.AsyncClient",
+    semaforo: Optional[asyncio.Semaphore] = None,
+) -> List[Dict]:
+    """
+    Variante assíncrona de executar_vroom usando um httpx.AsyncClient
+    compartilhado; `semaforo` limita as requisições em voo.
+    """
+    if not jobs:
         return []
-    steps = routes[0].get("steps") or []
-    return steps
+
+    async with semaforo or nullcontext():
+        r = await client.post(VROOM_URL + "/", json=_payload_vroom(start, end, jobs), timeout=30)
+    r.raise_for_status()
+    return _steps_rota(r.json())
 
 
 def osrm_table(coords: List[Tuple[float, float]]) -> Dict:
@@ -48,8 +75,26 @@ def osrm_table(coords: List[Tuple[float, float]]) -> Dict:
     if len(coords) < 2:
         return {"durations": [[0.0]]}
 
-    parts = ["{:.6f},{:.6f}".format(lon, lat) for lon, lat in coords]
-    url = f"{OSRM_URL}/table/v1/driving/" + ";".join(parts) + "?annotations=duration"
-    r = requests.get(url, timeout=30)
+    r = requests.get(_url_table(coords), timeout=30)
     r.raise_for_status()
     return r.json()
+
+
+async def osrm_table_async(
+    coords: List[Tuple[float, float]],
+    client: "httpx.AsyncClient",
+    semaforo: Optional[asyncio.Semaphore] = None,
+) -> Dict:
+    """Variante assíncrona de osrm_table (ver executar_vroom_async)."""
+    if len(coords) < 2:
+        return {"durations": [[0.0]]}
+
+    async with semaforo or nullcontext():
+        r = await client.get(_url_table(coords), timeout=30)
+    r.raise_for_status()
+    return r.json()
+
+
+def _url_table(coords: List[Tuple[float, float]]) -> str:
+    parts = ["{:.6f},{:.6f}".format(lon, lat) for lon, lat in coords]
+    return f"{OSRM_URL}/table/v1/driving/" + ";".join(parts) + "?annotations=duration"